@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed result cache shared by the green agents
+- package_versions(packages): installed versions of the packages that define env behaviour
+  (looked up once per tuple of package names)
+- ResultCache(max_entries, directory, namespace, packages): size-bounded LRU of JSON-able
+  results, keyed by hash(package versions, *parts); with a directory, entries are mirrored to
+  <directory>/<namespace>/<versions hash>/<key>.json. Version directories written under other
+  package versions are deleted on first use; nothing else under the directory is touched
+"""
+
+import collections
+import functools
+import hashlib
+import importlib.metadata
+import json
+import os
+import re
+import shutil
+import uuid
+
+_VERSIONS_DIR = re.compile(r"^[0-9a-f]{16}$")
+
+
+@functools.lru_cache(maxsize=None)
+def package_versions(packages):
+    """package -> installed version (None when missing); shared, do not mutate."""
+    versions = {}
+    for package in packages:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def content_hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU of JSON-able results with an optional on-disk backend."""
+
+    def __init__(self, max_entries, directory=None, namespace="result-cache", packages=()):
+        self.max_entries = max_entries
+        # entries live in their own subdirectory: the configured directory may hold other files
+        self.directory = os.path.join(directory, namespace) if directory else None
+        self.packages = tuple(packages)
+        self.entries = collections.OrderedDict()
+        self.disk_ready = False
+
+    def versions(self):
+        return package_versions(self.packages)
+
+    def _path(self, key):
+        if not self.directory:
+            return None
+        versions_hash = content_hash(self.versions())[:16]
+        versions_dir = os.path.join(self.directory, versions_hash)
+        if not self.disk_ready:
+            # packages changed since those entries were written: they can never be hit again; only
+            # this cache's own <versions hash> directories are deleted
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    stale = os.path.join(self.directory, name)
+                    if name != versions_hash and _VERSIONS_DIR.match(name) and os.path.isdir(stale):
+                        shutil.rmtree(stale, ignore_errors=True)
+            os.makedirs(versions_dir, exist_ok=True)
+            self.disk_ready = True
+        return os.path.join(versions_dir, f"{key}.json")
+
+    def key(self, *parts):
+        return content_hash([self.versions(), *parts])
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        path = self._path(key)
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            self._remember(key, value)
+            return value
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        path = self._path(key)
+        if path:
+            tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"  # processes may share the directory
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, separators=(",", ":"), default=str)
+            os.replace(tmp_path, path)
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from green_common.cache import ResultCache, content_hash, package_versions
+
+PACKAGES = ("pytest", "not-an-installed-package")
+
+
+def test_package_versions():
+    versions = package_versions(PACKAGES)
+    assert versions["pytest"] and versions["not-an-installed-package"] is None
+    assert package_versions(PACKAGES) is versions  # looked up once
+
+
+def test_result_cache_lru_and_disk(tmp_path):
+    cache = ResultCache(2, str(tmp_path), "test-cache", PACKAGES)
+    keys = [cache.key("miniwob", "click-test", seed, []) for seed in range(3)]
+    for seed, key in enumerate(keys):
+        cache.put(key, {"seed": seed})
+    assert list(cache.entries) == keys[1:]
+
+    # evicted from memory, still on disk; a fresh cache reads it back as well
+    assert cache.get(keys[0]) == {"seed": 0}
+    assert ResultCache(2, str(tmp_path), "test-cache", PACKAGES).get(keys[2]) == {"seed": 2}
+    assert ResultCache(2, packages=PACKAGES).get(keys[0]) is None
+    # another namespace or package list never sees these entries
+    assert ResultCache(2, str(tmp_path), "other-cache", PACKAGES).get(keys[0]) is None
+    assert ResultCache(2, str(tmp_path), "test-cache", ("pytest",)).key("miniwob", "click-test", 0, []) != keys[0]
+
+
+def test_result_cache_only_deletes_its_own_stale_entries(tmp_path):
+    (tmp_path / "unrelated").mkdir()
+    (tmp_path / "unrelated" / "keep.txt").write_text("x")
+    namespace = tmp_path / "test-cache"
+    (namespace / "0123456789abcdef").mkdir(parents=True)  # written under other package versions
+    (namespace / "notes").mkdir()
+
+    cache = ResultCache(2, str(tmp_path), "test-cache", PACKAGES)
+    key = cache.key("miniwob", "click-test", 0, [])
+    cache.put(key, {"seed": 0})
+
+    assert (tmp_path / "unrelated" / "keep.txt").exists()
+    assert sorted(p.name for p in namespace.iterdir()) == sorted(["notes", content_hash(package_versions(PACKAGES))[:16]])
+    assert [p.name for p in (namespace / content_hash(package_versions(PACKAGES))[:16]).iterdir()] == [f"{key}.json"]
@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from green_common import metrics
+from green_common.metrics import Histogram, LatencyMetrics, start_metrics_server
+
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for seconds in (0.0005, 0.003, 0.003, 0.2, 100.0):
+        histogram.observe(seconds)
+    assert histogram.count == 5
+    assert histogram.quantile(0.2) == 0.001
+    assert histogram.quantile(0.6) == 0.005
+    assert histogram.quantile(0.8) == 0.25
+    assert histogram.quantile(1.0) is None  # past the last bucket
+
+
+def test_json_and_prometheus():
+    latency = LatencyMetrics("miniwob", buckets=(0.01, 0.1), gauges=lambda: ["green_agent_processes 3"])
+    latency.observe("click-test", {"env": 0.05, "total": 0.2})
+    latency.observe("click-test", {"env": 0.005})
+    assert latency.json()["miniwob/click-test/env"] == {"count": 2, "mean": 0.0275, "p50": 0.01, "p90": 0.1,
+                                                        "p99": 0.1}
+    text = latency.prometheus().splitlines()
+    labels = 'scenario="miniwob",task="click-test",phase="env"'
+    assert f'green_agent_phase_seconds_bucket{{{labels},le="0.1"}} 2' in text
+    assert f'green_agent_phase_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f'green_agent_phase_seconds_count{{{labels}}} 2' in text
+    assert text[-1] == "green_agent_processes 3"
+
+
+def test_metrics_server_is_started_once(monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    assert start_metrics_server(LatencyMetrics("weblinx"), port=None) is None
+
+    latency = LatencyMetrics("weblinx")
+    latency.observe("click", {"total": 0.002})
+    server = start_metrics_server(latency, port=0)
+    try:
+        assert start_metrics_server(LatencyMetrics("other"), port=0) is server
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics.json"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert json.load(response) == latency.json()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+SOURCE = os.path.join(ROOT, "green_common")
+VENDORED = [os.path.join(ROOT, "scenario4WebLINX", "green_agent", "green_common")]
+MODULES = sorted(name for name in os.listdir(SOURCE) if name.endswith(".py"))
+
+
+@pytest.mark.parametrize("copy", VENDORED)
+def test_vendored_copies_match(copy):
+    assert sorted(name for name in os.listdir(copy) if name.endswith(".py")) == MODULES
+    for name in MODULES:
+        with open(os.path.join(SOURCE, name), "rb") as source, open(os.path.join(copy, name), "rb") as vendored:
+            assert vendored.read() == source.read(), f"{copy}/{name} is stale, copy green_common/{name} over it"
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+MiniWob episode replay (no AgentBeats / LLM in the loop)
+- re-runs traces recorded by the green agent (MINIWOB_TRACE_DIR/traces.jsonl) through the
+  same env worker as the tools (`tools._PooledEnv`), one action per step command
+- verify: checks every step's reward / terminated / truncated against the recorded ones
+- benchmark: times reset and step on the identical workload (optionally repeated), to compare
+  env-layer speed across BrowserGym / Playwright upgrades
+
+Usage:
+    python replay.py traces.jsonl --mode verify
+    python replay.py traces.jsonl --mode benchmark --repeat 3 --out bench.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+# replay drives its own _PooledEnv: tools must not warm the green agent's pool on import
+os.environ["MINIWOB_WARM_ON_LOAD"] = "0"
+import tools  # noqa: E402
+from green_common.metrics import percentiles  # noqa: E402
+
+ENV_TIMEOUT = 60
+
+
+def load_traces(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay_trace(pooled, trace):
+    """Run one trace; returns the observed reset time and per-step outcomes."""
+    profile = trace.get("observation_profile") or "full"
+
+    start = time.perf_counter()
+    pooled.submit("reset", (trace["task_id"], trace["seed"], profile)).result(ENV_TIMEOUT)
+    reset_time = time.perf_counter() - start
+
+    steps = []
+    for action in trace["actions"]:
+        start = time.perf_counter()
+        result = pooled.submit("step", action).result(ENV_TIMEOUT)
+        steps.append({"reward": float(result["reward"]), "terminated": bool(result["terminated"]),
+                      "truncated": bool(result["truncated"]), "step_time": time.perf_counter() - start})
+    return reset_time, steps
+
+
+def verify(pooled, traces):
+    mismatches = []
+    for index, trace in enumerate(traces):
+        try:
+            _, steps = replay_trace(pooled, trace)
+        except Exception as e:
+            mismatches.append({"trace": index, "task_id": trace["task_id"], "error": f"{type(e).__name__}: {e}"})
+            continue
+        for step_index, step in enumerate(steps):
+            expected = {"reward": trace["rewards"][step_index], "terminated": trace["terminated"][step_index],
+                        "truncated": trace["truncated"][step_index]}
+            observed = {k: step[k] for k in expected}
+            if observed != expected:
+                mismatches.append({"trace": index, "task_id": trace["task_id"], "seed": trace["seed"],
+                                   "step": step_index, "expected": expected, "observed": observed})
+                break
+
+    failed = {m["trace"] for m in mismatches}
+    return {"mode": "verify", "traces": len(traces), "matched": len(traces) - len(failed),
+            "mismatches": mismatches, "versions": tools._get_env_versions()}
+
+
+def benchmark(pooled, traces, repeat):
+    reset_times, step_times, errors = [], [], 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for trace in traces:
+            try:
+                reset_time, steps = replay_trace(pooled, trace)
+            except Exception:
+                errors += 1
+                continue
+            reset_times.append(reset_time)
+            step_times.extend(step["step_time"] for step in steps)
+    wall_time = time.perf_counter() - start
+
+    recorded_steps = [t for trace in traces for t in trace.get("step_times", [])]
+    return {
+        "mode": "benchmark",
+        "episodes": len(traces) * repeat,
+        "errors": errors,
+        "wall_time": round(wall_time, 2),
+        "episodes_per_sec": round(len(traces) * repeat / wall_time, 3) if wall_time else 0.0,
+        "reset_latency": percentiles(reset_times),
+        "step_latency": percentiles(step_times),
+        "recorded_step_latency": percentiles(recorded_steps),
+        "versions": tools._get_env_versions(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded MiniWob episodes")
+    parser.add_argument("traces", help="traces.jsonl written by the green agent")
+    parser.add_argument("--mode", choices=["verify", "benchmark"], default="verify")
+    parser.add_argument("--repeat", type=int, default=1, help="benchmark: replay the whole file N times")
+    parser.add_argument("--out", default=None, help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    traces = load_traces(args.traces)
+    pooled = tools._PooledEnv(0)
+    try:
+        if args.mode == "verify":
+            report = verify(pooled, traces)
+        else:
+            report = benchmark(pooled, traces, args.repeat)
+    finally:
+        tools._stop_env(pooled, ENV_TIMEOUT)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.mode == "verify" and report["mismatches"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Headless MiniWob sweep runner (no AgentBeats / LLM in the loop)
+- runs a scripted or replayed policy over every `browsergym/miniwob.*` task and many seeds
+- N worker processes, each driving its own browser through the same worker
+  reset/step protocol as the green agent (`tools._PooledEnv`)
+- reports episodes/sec, reset and step latency distributions and per-task success rate,
+  and writes one JSONL record per episode plus a per-task CSV summary
+
+Usage:
+    python sweep.py --workers 4 --seeds 5 --out sweep.jsonl --summary sweep.csv
+    python sweep.py --tasks click-button,click-test --policy replay --traces traces.jsonl
+"""
+
+import argparse
+import csv
+import fnmatch
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import time
+
+from green_common.metrics import percentiles
+
+# each worker drives its own _PooledEnv: tools must not warm the green agent's pool on import
+os.environ["MINIWOB_WARM_ON_LOAD"] = "0"
+
+SUBMIT_ACTION = 'page.get_by_role("button", name="Submit").click()'
+ENV_TIMEOUT = 60
+
+_pooled = None
+_policy = None
+_observation_profile = None
+
+
+def _list_tasks(pattern):
+    import gymnasium as gym
+    import browsergym.miniwob  # noqa: F401  (registers the tasks)
+
+    task_ids = sorted(env_id.split("browsergym/miniwob.", 1)[1]
+                      for env_id in gym.envs.registry if env_id.startswith("browsergym/miniwob."))
+    if not pattern:
+        return task_ids
+    patterns = [p.strip() for p in pattern.split(",") if p.strip()]
+    return [t for t in task_ids if any(fnmatch.fnmatch(t, p) for p in patterns)]
+
+
+def _load_policy(name, traces_path):
+    """Scripted policies map a task to a list of actions; `replay` reads them from a trace file."""
+    if name == "noop":
+        return {}
+    if name == "submit":
+        return {"*": [SUBMIT_ACTION]}
+    if name == "replay":
+        policy = {}
+        with open(traces_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    trace = json.loads(line)
+                    policy[(trace["task_id"], trace.get("seed"))] = trace["actions"]
+                    policy.setdefault(trace["task_id"], trace["actions"])
+        return policy
+    raise ValueError(f"Unknown policy: {name}")
+
+
+def _init_worker(policy, observation_profile):
+    global _pooled, _policy, _observation_profile
+    import tools
+
+    _pooled = tools._PooledEnv(os.getpid())
+    # pool workers skip atexit; their finalizers run when the pool is closed (not terminated)
+    multiprocessing.util.Finalize(_pooled, tools._stop_env, args=(_pooled, ENV_TIMEOUT), exitpriority=10)
+    _policy = policy
+    _observation_profile = observation_profile
+
+
+def _run_episode(job):
+    task_id, seed = job
+    actions = _policy.get((task_id, seed)) or _policy.get(task_id) or _policy.get("*") or []
+    record = {"task_id": task_id, "seed": seed, "reward": 0.0, "success": False,
+              "reset_time": None, "step_times": [], "num_steps": 0, "error": ""}
+
+    try:
+        start = time.perf_counter()
+        _pooled.submit("reset", (task_id, seed, _observation_profile)).result(ENV_TIMEOUT)
+        record["reset_time"] = round(time.perf_counter() - start, 4)
+
+        if actions:
+            result = _pooled.submit("step_batch", actions).result(ENV_TIMEOUT * len(actions))
+            steps = result["steps"]
+            record["step_times"] = [step["step_time"] for step in steps]
+            record["num_steps"] = len(steps)
+            record["reward"] = float(sum(step["reward"] for step in steps))
+            record["success"] = any(step["reward"] > 0 for step in steps)
+            record["error"] = result.get("error") or ""
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    return record
+
+
+def _summarize(records, wall_time):
+    per_task = {}
+    for r in records:
+        stats = per_task.setdefault(r["task_id"], {"episodes": 0, "successes": 0, "errors": 0,
+                                                   "reward_sum": 0.0, "reset_times": [], "step_times": []})
+        stats["episodes"] += 1
+        stats["successes"] += r["success"]
+        stats["errors"] += bool(r["error"])
+        stats["reward_sum"] += r["reward"]
+        if r["reset_time"] is not None:
+            stats["reset_times"].append(r["reset_time"])
+        stats["step_times"].extend(r["step_times"])
+
+    report = {
+        "episodes": len(records),
+        "wall_time": round(wall_time, 2),
+        "episodes_per_sec": round(len(records) / wall_time, 3) if wall_time else 0.0,
+        "success_rate": round(sum(r["success"] for r in records) / len(records), 3) if records else 0.0,
+        "reset_latency": percentiles([r["reset_time"] for r in records if r["reset_time"] is not None]),
+        "step_latency": percentiles([t for r in records for t in r["step_times"]]),
+    }
+    return report, per_task
+
+
+def _write_summary(path, per_task):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["task_id", "episodes", "success_rate", "mean_reward", "errors",
+                         "reset_p50", "reset_p90", "step_p50", "step_p90"])
+        for task_id in sorted(per_task):
+            stats = per_task[task_id]
+            reset, step = percentiles(stats["reset_times"]), percentiles(stats["step_times"])
+            writer.writerow([task_id, stats["episodes"],
+                             round(stats["successes"] / stats["episodes"], 3),
+                             round(stats["reward_sum"] / stats["episodes"], 3), stats["errors"],
+                             reset.get("p50", ""), reset.get("p90", ""), step.get("p50", ""), step.get("p90", "")])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless MiniWob sweep runner")
+    parser.add_argument("--tasks", default="", help="comma separated task ids or globs (default: all)")
+    parser.add_argument("--seeds", type=int, default=3, help="number of seeds per task")
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--policy", choices=["submit", "noop", "replay"], default="submit")
+    parser.add_argument("--traces", default=None, help="JSONL of {task_id, seed, actions} for --policy replay")
+    parser.add_argument("--observation-profile", choices=["text-only", "axtree+screenshot", "full"], default="full")
+    parser.add_argument("--out", default="sweep.jsonl", help="per-episode JSONL output")
+    parser.add_argument("--summary", default="sweep.csv", help="per-task CSV summary")
+    args = parser.parse_args()
+
+    if args.policy == "replay" and not args.traces:
+        parser.error("--policy replay needs --traces")
+
+    policy = _load_policy(args.policy, args.traces)
+    tasks = _list_tasks(args.tasks)
+    jobs = [(task_id, seed) for task_id in tasks for seed in range(args.seed_start, args.seed_start + args.seeds)]
+    print(f"🚀 {len(jobs)} episodes ({len(tasks)} tasks x {args.seeds} seeds) on {args.workers} workers")
+
+    records = []
+    start = time.perf_counter()
+    with open(args.out, "w", encoding="utf-8") as out, \
+            multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(policy, args.observation_profile)) as pool:
+        for record in pool.imap_unordered(_run_episode, jobs):
+            records.append(record)
+            out.write(json.dumps(record, separators=(",", ":")) + "\n")
+        # let every worker stop its env and exit; leaving the block would terminate them instead
+        pool.close()
+        pool.join()
+    wall_time = time.perf_counter() - start
+
+    report, per_task = _summarize(records, wall_time)
+    _write_summary(args.summary, per_task)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
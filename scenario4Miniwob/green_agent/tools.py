@@ -1,9 +1,20 @@
 # -*- coding: utf-8 -*-
 """
 BrowserGym MiniWob Green Agent Toolset (dynamic, non-hardcoded)
-- reset_miniwob_env(task_id): create env and store latest obs/info
+- reset_miniwob_env(task_id, battle_id): check out an env and store latest obs/info
+  in the battle's session (tools are keyed by battle_id, several battles can run at once)
+- get_task_description(fields): compact JSON of the goal and the interactive elements
+  (table extracted once per observation, `fields` projects e.g. "bid,role,name",
+  `delta=True` only returns elements added/removed/changed since the last description)
 - get_miniwob_task(): parse obs and return a detailed, actionable task description
   (includes options list, target, and suggested Playwright action template)
+- execute_white_agent_actions(playwright_actions): run a JSON list of actions in one env
+  round trip, with per-step rewards, errors and timings
+- Actions are validated before dispatch (Python syntax, a Playwright call on `page`, and the
+  role/name or bid target against the current element table); rejected ones return a
+  structured error without an env step (MINIWOB_VALIDATE_ACTIONS=0 turns this off)
+- run_miniwob_episodes(white_agent_url, task_ids, episodes_per_task): K tasks/seeds in one
+  battle, talking to the white agent directly; returns per-task and overall mean/variance
 - evaluate_miniwob_result(agent_actions): execute white agent-provided Playwright actions
   in the MiniWob env, return structured evaluation (reward, terminated, details)
 
@@ -13,138 +24,751 @@ Notes:
 - It generates Playwright action templates but does not hardcode option lists:
   it reads them directly from `obs`.
 - Execution of actions uses `env.step(action_str)` (the BrowserGym convention).
+- Every tool call is split into timed phases (pool_wait, queue_wait, env, observation,
+  serialize, total) kept as histograms per task; see get_latency_metrics() and
+  GREEN_AGENT_METRICS_PORT for a Prometheus/JSON endpoint (served from the first reset on).
+- gymnasium / browsergym are imported lazily by the env worker threads; get_startup_report()
+  returns import times, time to first warm env and time to first request served.
+- evaluate_action_sequence(task_id, seed, actions) scores a whole action list outside a battle;
+  results are memoized by hash(task, seed, package versions, actions) in an LRU
+  (RESULT_CACHE_SIZE) with an optional on-disk backend (MINIWOB_RESULT_CACHE_DIR).
+- With MINIWOB_TRACE_DIR set, every episode (task, seed, actions, per-step reward /
+  terminated flags and timings) is appended to traces.jsonl; replay.py re-runs them.
+- Observation profiles (text-only / axtree+screenshot / full, default MINIWOB_OBSERVATION_PROFILE)
+  skip the screenshot and DOM snapshot capture that the green agent does not read.
+- A pool of MINIWOB_POOL_SIZE envs starts warming up in the background when this module is
+  loaded (Chromium launched, MINIWOB_WARMUP_TASK loaded; MINIWOB_WARM_ON_LOAD=0 defers it to the
+  first reset); a reset checks out an idle env and only switches task/seed. A reset that reaches
+  an env still warming up gets MINIWOB_WARMUP_TIMEOUT on top of the usual env timeout.
+- Pooled envs are closed and relaunched after MINIWOB_RECYCLE_EPISODES resets or once their own
+  browser is above MINIWOB_RECYCLE_RSS_MB of resident memory (only that env is recycled), and
+  closed on "stop" (sent to every pooled env at interpreter exit, which also joins the workers);
+  see get_resource_report().
+- A battle's env goes back to the pool when its reset fails, when it is evaluated, or once the
+  battle has been idle for MINIWOB_SESSION_TTL seconds (checked on every reset).
 """
 
+import time
+_module_load_start = time.perf_counter()
+
 import os
 import random
-import gymnasium as gym
-import browsergym.miniwob
 import agentbeats as ab
 import asyncio
+import atexit
 import re
+import ast
 import json
 import threading
 import queue
+import concurrent.futures
 
 from dotenv import load_dotenv
 load_dotenv()
 
-miniwob_env = None
-current_task = None
-current_obs = None
-current_info = None
+# shared green agent code: pip install ./green_common (from the repository root)
+from green_common.cache import ResultCache, package_versions
+from green_common.metrics import LatencyMetrics, start_metrics_server
+from green_common.observation import OBSERVATION_PROFILES, get_obs
 
-reward_history = []
-action_execution_count = 0
 MAX_ACTION_EXECUTIONS = 10
 
-env_thread = None
-env_queue = queue.Queue()
-result_queue = queue.Queue()
+# gymnasium / browsergym are heavy: they are imported by the env workers in the background,
+# so the card can be served before they are loaded
+gym = None
+_import_lock = threading.Lock()
+startup_timings = {}
 
 
-def _env_worker():
-    """thread for BrowserGym --- because the greenlet MiniWob use is not compatible with async operations in agentbeats"""
-    global miniwob_env
+def _import_browsergym():
+    """Import gymnasium and register the MiniWob tasks on first use, timing each module."""
+    global gym
+    with _import_lock:
+        if gym is None:
+            start = time.perf_counter()
+            import gymnasium
+            startup_timings["import_gymnasium"] = round(time.perf_counter() - start, 4)
+
+            start = time.perf_counter()
+            import browsergym.miniwob  # noqa: F401  (registers the tasks)
+            startup_timings["import_browsergym_miniwob"] = round(time.perf_counter() - start, 4)
+
+            gym = gymnasium
+    return gym
+
+
+# Warm env pool: Chromium and the MiniWob page are launched once per pooled env while the green
+# agent starts (sweep.py / replay.py / tests set MINIWOB_WARM_ON_LOAD=0), a reset only switches
+# the task URL / seed on an idle env.
+MINIWOB_POOL_SIZE = int(os.getenv("MINIWOB_POOL_SIZE", "2"))
+MINIWOB_WARMUP_TASK = os.getenv("MINIWOB_WARMUP_TASK", "click-test")
+MINIWOB_WARM_ON_LOAD = os.getenv("MINIWOB_WARM_ON_LOAD", "1") != "0"
+# import + Chromium launch + warmup reset, waited for by a reset queued behind the warmup
+MINIWOB_WARMUP_TIMEOUT = float(os.getenv("MINIWOB_WARMUP_TIMEOUT", "180"))
+ENV_TIMEOUT = 30
+env_pool = asyncio.Queue()
+pooled_envs = []
+_pool_started = False
+_pool_lock = threading.Lock()
+
+# Env lifecycle: a pooled browser is closed and relaunched after MINIWOB_RECYCLE_EPISODES resets,
+# or when its own Chromium process subtree passes MINIWOB_RECYCLE_RSS_MB of resident memory
+# (0 disables the memory watermark)
+MINIWOB_RECYCLE_EPISODES = int(os.getenv("MINIWOB_RECYCLE_EPISODES", "200"))
+MINIWOB_RECYCLE_RSS_MB = float(os.getenv("MINIWOB_RECYCLE_RSS_MB", "0"))
+lifecycle_stats = {"envs_created": 0, "envs_closed": 0, "close_errors": 0,
+                   "recycled_episodes": 0, "recycled_rss": 0, "peak_rss_mb": 0.0}
+_lifecycle_lock = threading.Lock()  # every pooled env's worker thread updates lifecycle_stats
+
+
+def _count(event):
+    with _lifecycle_lock:
+        lifecycle_stats[event] += 1
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _process_table():
+    """(ppid -> child pids, pid -> name) of every process, read from /proc; None where /proc is
+    not available."""
+    if not os.path.isdir("/proc"):
+        return None
+    children = {}
+    names = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue  # exited while we were scanning
+        # "pid (comm) state ppid ...", comm may itself contain spaces or parentheses
+        name = stat[stat.find("(") + 1:stat.rfind(")")]
+        ppid = int(stat[stat.rfind(")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+        names[int(entry)] = name
+    return children, names
+
+
+def _subtree_memory(table, roots):
+    """RSS in bytes and process count per name of the processes under roots (roots included)."""
+    children, names = table
+    rss = 0
+    by_name = {}
+    stack = list(roots)
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                rss += int(f.read().split()[1]) * _PAGE_SIZE
+        except OSError:
+            continue
+        name = names.get(pid, "?")
+        by_name[name] = by_name.get(name, 0) + 1
+        stack.extend(children.get(pid, ()))
+    return rss, by_name
+
+
+def _process_tree_memory():
+    """RSS and process count of this process and all its descendants, read from /proc.
+    Returns None where /proc is not available."""
+    table = _process_table()
+    if table is None:
+        return None
+    rss, by_name = _subtree_memory(table, [os.getpid()])
+    rss_mb = round(rss / 2**20, 1)
+    with _lifecycle_lock:
+        lifecycle_stats["peak_rss_mb"] = max(lifecycle_stats["peak_rss_mb"], rss_mb)
+    return {"rss_mb": rss_mb, "processes": sum(by_name.values()), "by_name": by_name}
+
+
+# Per-env browser memory, for the MINIWOB_RECYCLE_RSS_MB watermark: the processes an env's first
+# reset starts are its browser. Launches are serialized while the watermark is on, so two envs
+# never start browsers at once; each env's subtree is measured at most every
+# MINIWOB_RSS_CHECK_INTERVAL seconds.
+MINIWOB_RSS_CHECK_INTERVAL = float(os.getenv("MINIWOB_RSS_CHECK_INTERVAL", "10"))
+_launch_lock = threading.Lock()
+
+
+def _browser_roots(before, after, known_roots=()):
+    """Top processes of the browser started between two process tables: new processes whose
+    parent is not new, looking through a new direct child of this process (the Playwright driver,
+    shared by every env) and skipping processes started meanwhile by another env's browser."""
+    parents = {pid: ppid for ppid, pids in after[0].items() for pid in pids}
+    new = set(after[1]) - set(before[1])
+    known = set(known_roots)
+
+    def owned_by_other_env(pid):
+        while pid in parents and pid != os.getpid():
+            if pid in known:
+                return True
+            pid = parents[pid]
+        return False
+
+    roots = []
+    stack = [pid for pid in new if parents.get(pid) not in new]
+    while stack:
+        pid = stack.pop()
+        if parents.get(pid) == os.getpid():
+            stack.extend(child for child in after[0].get(pid, ()) if child in new)
+        elif not owned_by_other_env(pid):
+            roots.append(pid)
+    return sorted(roots)
+
+
+def _launch_browser(pooled, reset):
+    """Run an env's first reset (which launches its browser) and remember the browser's processes."""
+    if not MINIWOB_RECYCLE_RSS_MB:
+        return reset()
+    with _launch_lock:
+        before = _process_table()
+        result = reset()
+        after = _process_table()
+    if before is not None and after is not None:
+        others = [pid for p in pooled_envs if p is not pooled for pid in p.browser_pids]
+        pooled.browser_pids = _browser_roots(before, after, others)
+    return result
+
+
+def _browser_memory_mb(pooled):
+    """Resident memory of the env's own browser subtree, re-measured at most every
+    MINIWOB_RSS_CHECK_INTERVAL seconds; None when unknown."""
+    if not pooled.browser_pids:
+        return None
+    now = time.monotonic()
+    if pooled.rss_mb is None or now - pooled.rss_checked >= MINIWOB_RSS_CHECK_INTERVAL:
+        table = _process_table()
+        if table is None:
+            return None
+        pooled.rss_mb = round(_subtree_memory(table, pooled.browser_pids)[0] / 2**20, 1)
+        pooled.rss_checked = now
+    return pooled.rss_mb
+
+# ============ latency metrics ============
+# Fixed-bucket histograms per (scenario, task, phase), see green_common.metrics.
+# Phases: queue_wait, env (env.step / reset), observation (element table), serialize, total.
+
+
+def _resource_gauges():
+    memory = _process_tree_memory()
+    if not memory:
+        return []
+    return ["# TYPE green_agent_resident_memory_bytes gauge",
+            f'green_agent_resident_memory_bytes{{scenario="miniwob"}} {int(memory["rss_mb"] * 2**20)}',
+            "# TYPE green_agent_processes gauge",
+            f'green_agent_processes{{scenario="miniwob"}} {memory["processes"]}']
+
+
+latency_metrics = LatencyMetrics("miniwob", gauges=_resource_gauges)
+
+
+class _PooledEnv:
+    """One MiniWob env with its own worker thread and command queue."""
 
+    def __init__(self, index):
+        self.index = index
+        self.env = None
+        self.task_id = None
+        self.episodes = 0  # resets since this env's browser was launched
+        self.warm = False  # set by the worker once its warmup (or a first reset) has completed
+        self.browser_pids = []  # top processes of this env's browser (tracked for the RSS watermark)
+        self.rss_mb = None  # last measured RSS of that browser subtree
+        self.rss_checked = 0.0
+        self.env_queue = queue.Queue()
+        self.thread = threading.Thread(target=_env_worker, args=(self,), daemon=True,
+                                       name=f"miniwob-env-{index}")
+        self.thread.start()
+
+    def submit(self, command, args=None):
+        """Queue a command for the worker; its result comes back on the returned future only."""
+        future = concurrent.futures.Future()
+        self.env_queue.put((command, args, future, time.perf_counter()))
+        return future
+
+
+async def _call_env(pooled, command, args=None, timeout=ENV_TIMEOUT):
+    """Await the worker's result for one command. On timeout the command is cancelled
+    if it has not started yet, a late result lands on its own (abandoned) future."""
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(pooled.submit(command, args)), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"env {command} timed out after {timeout}s")
+
+
+# Observation profiles (green_common.observation): which parts of the BrowserGym observation get
+# captured on reset/step. Skipped parts are empty placeholders, the obs keys never change.
+DEFAULT_OBSERVATION_PROFILE = os.getenv("MINIWOB_OBSERVATION_PROFILE", "full")
+observation_timings = {}  # profile -> {"count": n, "total": seconds}
+_timings_lock = threading.Lock()
+
+
+def _record_observation_time(profile, seconds):
+    with _timings_lock:
+        timing = observation_timings.setdefault(profile, {"count": 0, "total": 0.0})
+        timing["count"] += 1
+        timing["total"] += seconds
+
+
+def _profiled_get_obs(base, profile):
+    """BrowserEnv._get_obs, skipping the screenshot / DOM snapshot the profile does not ask for."""
+    start = time.perf_counter()
+    obs = get_obs(base, OBSERVATION_PROFILES[profile])
+    _record_observation_time(profile, time.perf_counter() - start)
+    return obs
+
+
+def _apply_observation_profile(env, profile):
+    base = env.unwrapped
+    base._get_obs = lambda: _profiled_get_obs(base, profile)
+
+
+def _switch_task(pooled, task_id, seed=None):
+    """Point a warm env at another MiniWob task without relaunching Chromium."""
+    base = pooled.env.unwrapped
+    if base.task is None:
+        return _launch_browser(pooled, lambda: pooled.env.reset(seed=seed))
+
+    if task_id != pooled.task_id:
+        # gym.make only builds the BrowserEnv wrapper, the browser is launched on reset()
+        base.task_entrypoint = gym.make(f"browsergym/miniwob.{task_id}", action_mapping=None).unwrapped.task_entrypoint
+
+    base.task.teardown()
+    base.task = base.task_entrypoint(seed=seed, **base.task_kwargs)
+    task_goal, task_info = base.task.setup(page=base.page)
+    base.goal_object = [{"type": "text", "text": task_goal}] if isinstance(task_goal, str) else list(task_goal or [])
+
+    base.chat.messages = []
+    base.chat.add_message(role="assistant",
+                          msg="Hi! I am your UI assistant, I can perform web tasks for you. What can I help you with?")
+    for message in base.goal_object:
+        if message["type"] == "text":
+            base.chat.add_message(role="user", msg=message["text"])
+
+    base._wait_dom_loaded()
+    base._active_page_check()
+    base.start_time = time.time()
+    base.last_action = ""
+    base.last_action_error = ""
+    base.infeasible_message_received = False
+
+    return base._get_obs(), {"task_info": task_info}
+
+
+def _make_env(pooled, task_id):
+    pooled.env = gym.make(f"browsergym/miniwob.{task_id}", action_mapping=None)
+    pooled.task_id = task_id
+    pooled.episodes = 0
+    _count("envs_created")
+
+
+def _close_env(pooled):
+    """Close the env and its browsers; the next reset launches a fresh one."""
+    if pooled.env is None:
+        return
+    try:
+        pooled.env.close()
+    except Exception as e:
+        _count("close_errors")
+        print(f"⚠️ MiniWob env {pooled.index} close failed: {e}")
+    pooled.env = None
+    pooled.task_id = None
+    pooled.episodes = 0
+    pooled.browser_pids = []
+    pooled.rss_mb = None
+    _count("envs_closed")
+
+
+def _maybe_recycle(pooled):
+    """Close the env before a reset once it has served its episodes or its own browser is over the
+    memory watermark; the other pooled envs are left alone."""
+    if pooled.env is None:
+        return
+    if MINIWOB_RECYCLE_EPISODES and pooled.episodes >= MINIWOB_RECYCLE_EPISODES:
+        _count("recycled_episodes")
+        print(f"♻️ MiniWob env {pooled.index} recycled after {pooled.episodes} episodes")
+        _close_env(pooled)
+    elif MINIWOB_RECYCLE_RSS_MB:
+        rss_mb = _browser_memory_mb(pooled)
+        if rss_mb is not None and rss_mb > MINIWOB_RECYCLE_RSS_MB:
+            _count("recycled_rss")
+            print(f"♻️ MiniWob env {pooled.index} recycled at {rss_mb} MB browser RSS")
+            _close_env(pooled)
+
+
+def _worker_timings(enqueued, picked):
+    return {"queue_wait": picked - enqueued, "env": time.perf_counter() - picked}
+
+
+def _env_worker(pooled):
+    """thread for BrowserGym --- because the greenlet MiniWob use is not compatible with async operations in agentbeats"""
     while True:
+        command, args, future, enqueued = pooled.env_queue.get()
+        # the caller gave up before the worker got to it
+        if not future.set_running_or_notify_cancel():
+            continue
+        picked = time.perf_counter()
+
         try:
-            command, args = env_queue.get()
+            if command not in ("close", "stop"):  # stopping must work even if the import failed
+                _import_browsergym()
+
+            if command == "warmup":
+                # launch Chromium and load the MiniWob assets before any battle asks for it
+                _make_env(pooled, args)
+                _launch_browser(pooled, pooled.env.reset)
+                startup_timings.setdefault("first_env_warm", round(time.perf_counter() - _module_load_start, 4))
+                print(f"🔥 MiniWob env {pooled.index} warmed up on {args}")
+                pooled.warm = True
+                future.set_result(None)
 
-            if command == "reset":
-                task_id = args
-                miniwob_env = gym.make(f"browsergym/miniwob.{task_id}", action_mapping=None)
-                obs, info = miniwob_env.reset()
-                result_queue.put(("success", {"obs": obs, "info": info}))
+            elif command == "reset":
+                task_id, seed, profile = args
+                _maybe_recycle(pooled)
+                if pooled.env is None:
+                    _make_env(pooled, task_id)
+                    _apply_observation_profile(pooled.env, profile)
+                    obs, info = _launch_browser(pooled, lambda: pooled.env.reset(seed=seed))
+                else:
+                    _apply_observation_profile(pooled.env, profile)
+                    obs, info = _switch_task(pooled, task_id, seed)
+                pooled.task_id = task_id
+                pooled.episodes += 1
+                pooled.warm = True
+                future.set_result({"obs": obs, "info": info, "timings": _worker_timings(enqueued, picked)})
 
             elif command == "step":
                 action = args
-                obs, reward, terminated, truncated, info = miniwob_env.step(action)
-                result_queue.put(("success", {
+                obs, reward, terminated, truncated, info = pooled.env.step(action)
+                future.set_result({
                     "obs": obs,
                     "reward": reward,
                     "terminated": terminated,
                     "truncated": truncated,
-                    "info": info
-                }))
+                    "info": info,
+                    "timings": _worker_timings(enqueued, picked)
+                })
+
+            elif command == "step_batch":
+                # run the actions back-to-back, stopping as soon as the episode ends; a step that
+                # raises ends the batch too, the steps before it are still reported
+                steps = []
+                obs = info = error = None
+                for action in args:
+                    step_start = time.perf_counter()
+                    try:
+                        obs, reward, terminated, truncated, info = pooled.env.step(action)
+                    except Exception as e:
+                        error = f"{type(e).__name__}: {e}"
+                        break
+                    steps.append({
+                        "action": action,
+                        "reward": reward,
+                        "terminated": terminated,
+                        "truncated": truncated,
+                        "error": obs.get("last_action_error", ""),
+                        "step_time": round(time.perf_counter() - step_start, 4)
+                    })
+                    if terminated or truncated:
+                        break
+                future.set_result({"obs": obs, "info": info, "steps": steps, "error": error,
+                                   "timings": _worker_timings(enqueued, picked)})
+
+            elif command == "close":
+                _close_env(pooled)
+                future.set_result(None)
 
             elif command == "stop":
+                _close_env(pooled)
+                future.set_result(None)
                 break
 
         except Exception as e:
-            result_queue.put(("error", str(e)))
+            if command in ("warmup", "reset"):
+                # a half-initialised or crashed browser: drop it, the next reset launches a fresh one
+                print(f"⚠️ MiniWob env {pooled.index} {command} failed: {e}")
+                _close_env(pooled)
+            future.set_exception(e)
 
 
-@ab.tool
-async def reset_miniwob_env(task_id: str = "click-scroll-list") -> str:
-    """reset MiniWob env"""
-    global env_thread, reward_history, current_task_id, current_obs, current_info, action_execution_count   # 🔥 新增: 更新全局变量
+def _start_env_pool():
+    """Launch and warm the pooled envs and start the metrics endpoint, once: when the module is
+    loaded, or with MINIWOB_WARM_ON_LOAD=0 (sweep.py / replay.py workers, tests) on the first reset /
+    evaluation. Only starts the worker threads, the warmup itself runs on them."""
+    global _pool_started
+    with _pool_lock:
+        if _pool_started:
+            return
+        _pool_started = True
+        start_metrics_server(latency_metrics)
+        for index in range(MINIWOB_POOL_SIZE):
+            pooled = _PooledEnv(index)
+            pooled_envs.append(pooled)
+            pooled.submit("warmup", MINIWOB_WARMUP_TASK)
+            # available right away: a reset queued behind the warmup simply waits for it
+            env_pool.put_nowait(pooled)
+        atexit.register(_stop_env_pool)
+
+
+def _reset_timeout(pooled):
+    """Timeout of a reset: an env still warming up first finishes its warmup, which has its own budget."""
+    return ENV_TIMEOUT if pooled.warm else ENV_TIMEOUT + MINIWOB_WARMUP_TIMEOUT
+
+
+def _join_env(pooled, future, timeout):
+    """Wait for a "stop" sent to the env's worker, then join the worker thread."""
+    try:
+        future.result(timeout)
+    except Exception as e:
+        print(f"⚠️ MiniWob env {pooled.index} stop failed: {e}")
+    pooled.thread.join(timeout)
+
+
+def _stop_env(pooled, timeout=ENV_TIMEOUT):
+    """Close the env's browsers and join its worker (replay.py and sweep.py workers own one env)."""
+    _join_env(pooled, pooled.submit("stop"), timeout)
+
+
+def _stop_env_pool(timeout=ENV_TIMEOUT):
+    """Send "stop" to every pooled env (closing its browsers) and join the workers; runs at exit."""
+    stopping = [(pooled, pooled.submit("stop")) for pooled in pooled_envs]
+    for pooled, future in stopping:
+        _join_env(pooled, future, timeout)
+    pooled_envs.clear()
+
+
+startup_timings["tools_module_load"] = round(time.perf_counter() - _module_load_start, 4)
+
+
+def _mark_request_served():
+    startup_timings.setdefault("first_request_served", round(time.perf_counter() - _module_load_start, 4))
+
+
+# Episode traces: task, seed and the executed actions with their per-step outcome, appended to
+# MINIWOB_TRACE_DIR/traces.jsonl when a battle ends (replay them with replay.py)
+MINIWOB_TRACE_DIR = os.getenv("MINIWOB_TRACE_DIR")
+TRACE_PACKAGES = ("browsergym-core", "browsergym-miniwob", "playwright", "gymnasium")
+
+
+def _get_env_versions():
+    """Installed versions of the packages that define env behaviour."""
+    return package_versions(TRACE_PACKAGES)
+
+
+# Result cache (green_common.cache): evaluations of a whole (task, seed, env versions, actions)
+# run, content-addressed. In-memory LRU of RESULT_CACHE_SIZE entries, mirrored to
+# MINIWOB_RESULT_CACHE_DIR/miniwob-result-cache/<versions hash>/ when that is set.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+MINIWOB_RESULT_CACHE_DIR = os.getenv("MINIWOB_RESULT_CACHE_DIR")
+result_cache = ResultCache(RESULT_CACHE_SIZE, MINIWOB_RESULT_CACHE_DIR, "miniwob-result-cache", TRACE_PACKAGES)
+
+
+class _BattleSession:
+    """State of one battle: its pooled env, latest obs/info, counters and history."""
+
+    def __init__(self, battle_id, task_id, seed=None, observation_profile=None):
+        self.battle_id = battle_id
+        self.task_id = task_id
+        self.seed = seed
+        self.observation_profile = observation_profile
+        self.env = None
+        self.obs = None
+        self.info = None
+        self.reward_history = []
+        self.action_execution_count = 0
+        self.element_table = None  # built from obs on first use, dropped on the next step
+        self.sent_elements = None  # key -> element last sent to the white agent, base of delta mode
+        self.phase_totals = {}  # phase -> seconds spent in this battle
+        self.rejected_actions = 0  # actions refused by the validator, never sent to the env
+        self.trace = {"reset_time": None, "actions": [], "rewards": [], "terminated": [],
+                      "truncated": [], "step_times": []}
+        self.last_used = time.monotonic()  # idle sessions are reaped after MINIWOB_SESSION_TTL
+
+
+def _record_step(session, action, reward, terminated, truncated, step_time):
+    trace = session.trace
+    trace["actions"].append(action)
+    trace["rewards"].append(float(reward))
+    trace["terminated"].append(bool(terminated))
+    trace["truncated"].append(bool(truncated))
+    trace["step_times"].append(round(step_time, 4))
+
+
+def _save_trace(session):
+    if not MINIWOB_TRACE_DIR or session.trace["reset_time"] is None:
+        return
+    record = {"task_id": session.task_id, "seed": session.seed,
+              "observation_profile": session.observation_profile, "battle_id": session.battle_id,
+              "versions": _get_env_versions(), **session.trace}
+    os.makedirs(MINIWOB_TRACE_DIR, exist_ok=True)
+    with open(os.path.join(MINIWOB_TRACE_DIR, "traces.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def _record_timings(session, phases):
+    """Feed one tool call's phase timings into the histograms and the battle's totals."""
+    latency_metrics.observe(session.task_id, phases)
+    for phase, seconds in phases.items():
+        session.phase_totals[phase] = session.phase_totals.get(phase, 0.0) + seconds
+
+
+# battle_id -> _BattleSession, so one green agent process can run several battles at once.
+# A battle that is abandoned (no evaluate_task_completion) would hold its pooled env forever,
+# so sessions idle for more than MINIWOB_SESSION_TTL seconds are ended on the next reset.
+sessions = {}
+MINIWOB_SESSION_TTL = float(os.getenv("MINIWOB_SESSION_TTL", "900"))
 
-    action_execution_count = 0
-    reward_history = []
-    current_task_id = task_id
 
-    # 启动环境线程(如果未启动)
-    if env_thread is None or not env_thread.is_alive():
-        env_thread = threading.Thread(target=_env_worker, daemon=True)
-        env_thread.start()
+def _set_observation(session, obs, info):
+    session.obs = obs
+    session.info = info
+    session.element_table = None
 
-        # 发送 reset 命令
-    env_queue.put(("reset", task_id))
 
-    # 等待结果
-    def _wait_result():
-        status, data = result_queue.get(timeout=30)
-        if status == "error":
-            raise Exception(data)
-        return data
+def _release_env(session):
+    """Give the session's env back to the pool."""
+    if session.env is not None:
+        env_pool.put_nowait(session.env)
+        session.env = None
 
+
+def _end_session(session):
+    _release_env(session)
+    _save_trace(session)
+
+
+def _get_session(battle_id):
+    session = sessions.get(battle_id)
+    if session is not None:
+        session.last_used = time.monotonic()
+    return session
+
+
+def _remaining_actions(session):
+    """Actions the battle may still execute: both execute tools share MAX_ACTION_EXECUTIONS."""
+    return max(0, MAX_ACTION_EXECUTIONS - session.action_execution_count)
+
+
+def _reap_idle_sessions():
+    """End the sessions not used for MINIWOB_SESSION_TTL seconds, giving their envs back."""
+    if not MINIWOB_SESSION_TTL:
+        return
+    deadline = time.monotonic() - MINIWOB_SESSION_TTL
+    for battle_id, session in list(sessions.items()):
+        if session.last_used < deadline:
+            sessions.pop(battle_id, None)
+            print(f"🧹 MiniWob battle {battle_id} idle for over {MINIWOB_SESSION_TTL:.0f}s, env returned to the pool")
+            _end_session(session)
+
+
+@ab.tool
+async def reset_miniwob_env(task_id: str = "click-scroll-list", seed: int = None, battle_id: str = "default",
+                            observation_profile: str = DEFAULT_OBSERVATION_PROFILE) -> str:
+    """reset MiniWob env; observation_profile is one of text-only, axtree+screenshot, full"""
+    tool_start = time.perf_counter()
+    if observation_profile not in OBSERVATION_PROFILES:
+        return f"❌ Failed to reset: unknown observation_profile {observation_profile!r}, use one of {list(OBSERVATION_PROFILES)}"
+
+    # 同一 battle 重新 reset 时, 先归还上一局的环境
+    previous = sessions.pop(battle_id, None)
+    if previous is not None:
+        _end_session(previous)
+    _reap_idle_sessions()
+
+    # always run with an explicit seed so the episode can be replayed exactly
+    if seed is None:
+        seed = random.randint(0, 2 ** 31 - 1)
+    session = _BattleSession(battle_id, task_id, seed, observation_profile)
+    sessions[battle_id] = session
+
+    # 从池中取出一个空闲环境
+    _start_env_pool()
     try:
-        result = await asyncio.to_thread(_wait_result)
+        session.env = await asyncio.wait_for(env_pool.get(), ENV_TIMEOUT)
+    except asyncio.TimeoutError:
+        sessions.pop(battle_id, None)
+        return "❌ Failed to reset: no idle MiniWob environment in the pool"
+    pool_wait = time.perf_counter() - tool_start
 
-        current_obs = result["obs"]
-        current_info = result["info"]
+    # 发送 reset 命令并等待结果
+    try:
+        result = await _call_env(session.env, "reset", (task_id, seed, observation_profile),
+                                 timeout=_reset_timeout(session.env))
+
+        _set_observation(session, result["obs"], result["info"])
+        session.trace["reset_time"] = round(result["timings"]["env"], 4)
+        _mark_request_served()
+        _record_timings(session, {"pool_wait": pool_wait, **result["timings"],
+                                  "total": time.perf_counter() - tool_start})
 
         return f"✅ Environment reset successfully for task: {task_id}"
     except Exception as e:
+        # 失败时归还环境, 不让这个 battle 占着它
+        sessions.pop(battle_id, None)
+        _release_env(session)
         return f"❌ Failed to reset: {e}"
 
 
+INTERACTIVE_ROLES = frozenset(["button", "link", "textbox", "combobox", "checkbox", "menuitem", "radio", "listitem"])
+
+
 def _extract_elements_from_axtree(node):
+    """Iterative pre-order walk of a nested axtree dict (no recursion, no list copies)."""
     elements = []
-    if not node:
-        return elements
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if not node:
+            continue
+
+        role = node.get("role", "")
+        if role in INTERACTIVE_ROLES:
+            elements.append({
+                "role": role,
+                "name": node.get("name", ""),
+                "value": node.get("value", ""),
+                "focusable": node.get("focusable", False),
+                "clickable": node.get("clickable", False),
+                "disabled": node.get("disabled", False)
+            })
+
+        stack.extend(reversed(node.get("children", [])))
+
+    return elements
+
 
-    role = node.get("role", "")
-    name = node.get("name", "")
-    value = node.get("value", "")
-    children = node.get("children", [])
+def _extract_elements_from_axtree_object(axtree_object, extra_properties):
+    """Same as above for BrowserGym's flat CDP `axtree_object` (nodes are already in document order)."""
+    elements = []
+    for node in axtree_object.get("nodes", []):
+        role = node.get("role", {}).get("value", "")
+        if role not in INTERACTIVE_ROLES:
+            continue
 
-    if role in ["button", "link", "textbox", "combobox", "checkbox", "menuitem", "radio", "listitem"]:
+        properties = {p["name"]: p.get("value", {}).get("value") for p in node.get("properties", [])}
+        bid = node.get("browsergym_id")
         elements.append({
+            "bid": bid,
             "role": role,
-            "name": name,
-            "value": value,
-            "focusable": node.get("focusable", False),
-            "clickable": node.get("clickable", False),
-            "disabled": node.get("disabled", False)
+            "name": node.get("name", {}).get("value", ""),
+            "value": node.get("value", {}).get("value", ""),
+            "focusable": bool(properties.get("focusable", False)),
+            "clickable": bool(extra_properties.get(bid, {}).get("clickable", False)),
+            "disabled": bool(properties.get("disabled", False))
         })
 
-    for child in children:
-        elements.extend(_extract_elements_from_axtree(child))
-
     return elements
 
 
-@ab.tool
-async def get_task_description():
-
-    global current_obs, current_info
-
-    if current_obs is None:
-        return json.dumps({"error": "Environment not initialized"})
+def _element_table(session):
+    """Role-indexed element table of the session's current observation, built once per observation."""
+    if session.element_table is not None:
+        return session.element_table
 
-    if "axtree" in current_obs and current_obs["axtree"]:
+    current_obs = session.obs
+    if current_obs.get("axtree_object"):
+        visible_elements = _extract_elements_from_axtree_object(
+            current_obs["axtree_object"], current_obs.get("extra_element_properties") or {})
+    elif "axtree" in current_obs and current_obs["axtree"]:
         visible_elements = _extract_elements_from_axtree(current_obs["axtree"])
     else:
         # fallback 简化：提取 DOM 中的 tag 与 id
@@ -155,27 +779,223 @@ async def get_task_description():
                 text = child.get("text", "")
                 visible_elements.append({"tag": tag, "text": text})
 
+    by_role = {}
+    for index, element in enumerate(visible_elements):
+        by_role.setdefault(element.get("role", ""), []).append(index)
+
+    # every bid of the page (not only the interactive ones), None when the obs has no bids
+    bids = None
+    if current_obs.get("axtree_object"):
+        bids = {node["browsergym_id"] for node in current_obs["axtree_object"].get("nodes", [])
+                if node.get("browsergym_id")}
+
+    session.element_table = {"elements": visible_elements, "by_role": by_role, "bids": bids}
+    return session.element_table
+
+
+# ============ action validation ============
+# Actions are Playwright calls on `page` (the envs run with action_mapping=None). Before a step
+# is dispatched its syntax is checked and, for the first action, the locator target is looked up
+# in the element table of the current observation, so a typo or a missing element costs
+# microseconds instead of a Playwright timeout.
+MINIWOB_VALIDATE_ACTIONS = os.getenv("MINIWOB_VALIDATE_ACTIONS", "1") != "0"
+_BID_SELECTOR = re.compile(r"""^\[bid=["']?([^"'\]]+)["']?\]$""")
+# Calls whose first argument is a selector: `locator` / `frame_locator` anywhere in the chain, the
+# others only when called on `page` itself (page.fill(selector, value)). On a locator the same
+# methods take values: get_by_role("textbox").fill("[bid=77]") types that text.
+_LOCATOR_METHODS = frozenset(["locator", "frame_locator"])
+_PAGE_SELECTOR_METHODS = frozenset([
+    "click", "dblclick", "tap", "fill", "type", "press", "check", "uncheck", "set_checked", "hover",
+    "focus", "select_option", "set_input_files", "dispatch_event", "wait_for_selector",
+    "query_selector", "query_selector_all", "inner_text", "inner_html", "text_content",
+    "input_value", "get_attribute", "is_checked", "is_disabled", "is_enabled", "is_visible",
+])
+
+
+def _call_chain(node):
+    """`page.get_by_role("button").click()` -> ("page", [call nodes, outermost last]), or (None, [])."""
+    calls = []
+    while True:
+        if isinstance(node, ast.Call):
+            calls.append(node)
+            node = node.func
+        elif isinstance(node, ast.Attribute):
+            node = node.value
+        elif isinstance(node, ast.Name):
+            return node.id, list(reversed(calls))
+        else:
+            return None, []
+
+
+def _literal_args(call):
+    args = [a.value if isinstance(a, ast.Constant) else None for a in call.args]
+    kwargs = {k.arg: k.value.value if isinstance(k.value, ast.Constant) else None for k in call.keywords}
+    return args, kwargs
+
+
+def _takes_selector(call, method):
+    if method in _LOCATOR_METHODS:
+        return True
+    return (method in _PAGE_SELECTOR_METHODS and isinstance(call.func.value, ast.Name)
+            and call.func.value.id == "page")
+
+
+def _normalize_name(name):
+    return " ".join(str(name).split()).lower()
+
+
+def _check_target(table, call):
+    """Structured error if the locator built by `call` cannot match anything on the page, else None."""
+    method = call.func.attr if isinstance(call.func, ast.Attribute) else ""
+    args, kwargs = _literal_args(call)
+
+    if method == "get_by_role" and args and isinstance(args[0], str):
+        role = args[0]
+        # the table only holds interactive roles, nothing can be said about the others
+        if role not in INTERACTIVE_ROLES:
+            return None
+        candidates = [table["elements"][i] for i in table["by_role"].get(role, [])]
+        if not candidates:
+            return {"error_type": "unknown_target", "message": f"no element with role {role!r} on the page"}
+        name = kwargs.get("name")
+        if not isinstance(name, str):
+            return None
+        # Playwright matches names case-insensitively as a substring unless exact=True
+        if kwargs.get("exact"):
+            match = any(e.get("name", "") == name for e in candidates)
+        else:
+            match = any(_normalize_name(name) in _normalize_name(e.get("name", "")) for e in candidates)
+        if not match:
+            return {"error_type": "unknown_target",
+                    "message": f"no {role} named {name!r} on the page",
+                    "available": [e.get("name", "") for e in candidates][:20]}
+        return None
+
+    bid = None
+    if method == "get_by_test_id" and args and isinstance(args[0], str):
+        bid = args[0]
+    elif args and isinstance(args[0], str) and _takes_selector(call, method):
+        selector = _BID_SELECTOR.match(args[0].strip())
+        bid = selector.group(1) if selector else None
+    if bid is not None and table["bids"] is not None and bid not in table["bids"]:
+        return {"error_type": "unknown_target", "message": f"no element with bid {bid!r} on the page"}
+    return None
+
+
+def _validate_action(session, action, check_target=True):
+    """None if the action may be dispatched, else a structured error."""
+    try:
+        tree = ast.parse(action.strip())
+        # BrowserGym exec()s the action at module level: also reject what only the compiler
+        # catches there, e.g. "'await' outside function"
+        compile(tree, "<action>", "exec")
+    except SyntaxError as e:
+        return {"error_type": "syntax", "message": f"invalid Python: {e.msg} (line {e.lineno}, col {e.offset})"}
+    if not tree.body:
+        return {"error_type": "syntax", "message": "empty action"}
+
+    for statement in tree.body:
+        expression = statement.value if isinstance(statement, ast.Expr) else None
+        root, calls = _call_chain(expression) if expression is not None else (None, [])
+        if root != "page" or not calls:
+            return {"error_type": "unsupported_action",
+                    "message": "every statement must be a Playwright call on `page`, e.g. "
+                               "page.get_by_role(\"button\", name=\"Submit\").click()"}
+        if check_target:
+            table = _element_table(session)
+            for call in calls:
+                error = _check_target(table, call)
+                if error:
+                    return error
+    return None
+
+
+def _rejected_response(session, action, error, **extra):
+    session.rejected_actions += 1
+    return json.dumps({"success": False, "rejected": True, "action": action, **error,
+                       "message": f"Action rejected before execution: {error['message']}", **extra},
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+def _project(elements, fields):
+    """Keep only the requested (comma separated) fields of each element."""
+    keep = [f.strip() for f in fields.split(",") if f.strip()]
+    if not keep:
+        return elements
+    return [{k: e[k] for k in keep if k in e} for e in elements]
+
+
+def _keyed_elements(elements):
+    """Stable identity per element: its bid, else role + name + occurrence among equal role/name."""
+    keyed = {}
+    seen = {}
+    for element in elements:
+        if element.get("bid"):
+            key = element["bid"]
+        else:
+            role_name = f"{element.get('role', element.get('tag', ''))}|{element.get('name', element.get('text', ''))}"
+            seen[role_name] = seen.get(role_name, 0) + 1
+            key = f"{role_name}|{seen[role_name]}"
+        keyed[key] = element
+    return keyed
+
+
+def _observation_delta(session, fields="", full=False):
+    """
+    Elements of the current observation, as a diff against what the white agent last received
+    (or a full snapshot when asked or when nothing was sent yet). Remembers the current elements
+    unprojected, so the next diff does not depend on the `fields` of this call.
+    """
+    current = _keyed_elements(_element_table(session)["elements"])
+    previous = session.sent_elements
+    session.sent_elements = current
+
+    if full or previous is None:
+        return {"full": True, "visible_elements": _project(list(current.values()), fields)}
+
+    return {
+        "full": False,
+        "added": _project([e for k, e in current.items() if k not in previous], fields),
+        "removed": [k for k in previous if k not in current],
+        "changed": _project([e for k, e in current.items() if k in previous and previous[k] != e], fields),
+    }
+
+
+@ab.tool
+async def get_task_description(battle_id: str = "default", fields: str = "", delta: bool = False):
+
+    session = _get_session(battle_id)
+    if session is None or session.obs is None:
+        return json.dumps({"error": "Environment not initialized"})
+
+    current_obs, current_info = session.obs, session.info
+    elements = _observation_delta(session, fields, full=not delta)
+
     task_summary = {
         "goal": current_obs.get("goal", current_obs.get("utterance", "")),
         "url": current_obs.get("url", ""),
-        "visible_elements": visible_elements,
+        **{k: v for k, v in elements.items() if k != "full" or delta},
         "reward": current_info.get("reward", 0),
         "terminated": current_info.get("terminated", False),
         "raw_keys": list(current_obs.keys())
     }
 
-    return json.dumps(task_summary, ensure_ascii=False, indent=2, default=str)
+    return json.dumps(task_summary, ensure_ascii=False, separators=(",", ":"), default=str)
 
 
 @ab.tool
-async def execute_white_agent_action(playwright_action: str) -> str:
-    # dummy test
-    playwright_action = f"""page.get_by_role("button", name="Submit").click()"""
-
-    global miniwob_env, current_obs, current_info, reward_history, action_execution_count
+async def execute_white_agent_action(playwright_action: str, battle_id: str = "default",
+                                     delta: bool = False, full: bool = False) -> str:
+    session = _get_session(battle_id)
+    if session is None or session.env is None:
+        return json.dumps({
+            "success": False,
+            "error": "Environment not initialized",
+            "message": "Call reset_miniwob_env first"
+        })
 
-    # No more than 10 turns
-    if action_execution_count > MAX_ACTION_EXECUTIONS:
+    # No more than MAX_ACTION_EXECUTIONS actions per battle
+    if _remaining_actions(session) <= 0:
         return json.dumps({
             "success": True,
             "terminated": True,
@@ -184,31 +1004,43 @@ async def execute_white_agent_action(playwright_action: str) -> str:
             "message": "Task terminated due to exceeding maximum action limit"
         })
 
-    action_execution_count += 1
+    tool_start = time.perf_counter()
+    if MINIWOB_VALIDATE_ACTIONS:
+        error = _validate_action(session, playwright_action)
+        _record_timings(session, {"validate": time.perf_counter() - tool_start})
+        if error:
+            return _rejected_response(session, playwright_action, error)
 
-    env_queue.put(("step", playwright_action))
-
-    def _wait_result():
-        status, data = result_queue.get(timeout=30)
-        if status == "error":
-            raise Exception(data)
-        return data
+    session.action_execution_count += 1
 
     try:
-        result = await asyncio.to_thread(_wait_result)
+        result = await _call_env(session.env, "step", playwright_action)
 
-        current_obs = result["obs"]
-        current_info = result["info"]
+        _set_observation(session, result["obs"], result["info"])
 
-        reward_history.append(result["reward"])
+        session.reward_history.append(result["reward"])
+        _record_step(session, playwright_action, result["reward"], result["terminated"],
+                     result["truncated"], result["timings"]["env"])
 
-        return json.dumps({
+        response = {
             "success": True,
             "reward": result["reward"],
             "terminated": result["terminated"],
             "truncated": result["truncated"],
             "message": f"Action executed. Reward: {result['reward']}"
-        })
+        }
+        phases = dict(result["timings"])
+        if delta or full:
+            observation_start = time.perf_counter()
+            response["observation"] = _observation_delta(session, full=full)
+            phases["observation"] = time.perf_counter() - observation_start
+
+        serialize_start = time.perf_counter()
+        payload = json.dumps(response, ensure_ascii=False, separators=(",", ":"), default=str)
+        phases["serialize"] = time.perf_counter() - serialize_start
+        phases["total"] = time.perf_counter() - tool_start
+        _record_timings(session, phases)
+        return payload
     except Exception as e:
         return json.dumps({
             "success": False,
@@ -218,17 +1050,339 @@ async def execute_white_agent_action(playwright_action: str) -> str:
 
 
 @ab.tool
-async def evaluate_task_completion() -> str:
+async def execute_white_agent_actions(playwright_actions: str, battle_id: str = "default",
+                                      delta: bool = False, full: bool = False) -> str:
+    """
+    Execute a JSON list of actions in one env round trip.
+    Stops early on terminated/truncated and never goes past MAX_ACTION_EXECUTIONS.
+    """
+    session = _get_session(battle_id)
+    if session is None or session.env is None:
+        return json.dumps({
+            "success": False,
+            "error": "Environment not initialized",
+            "message": "Call reset_miniwob_env first"
+        })
+
+    try:
+        actions = json.loads(playwright_actions)
+        if isinstance(actions, str):
+            actions = [actions]
+        if not isinstance(actions, list) or not all(isinstance(a, str) for a in actions):
+            raise ValueError("expected a JSON list of action strings")
+    except ValueError as e:
+        return json.dumps({
+            "success": False,
+            "error": str(e),
+            "message": f"Invalid action list: {e}"
+        })
+
+    remaining = _remaining_actions(session)
+    if remaining <= 0:
+        return json.dumps({
+            "success": True,
+            "terminated": True,
+            "truncated": True,
+            "reward": 0.0,
+            "steps": [],
+            "message": "Task terminated due to exceeding maximum action limit"
+        })
+    skipped = max(0, len(actions) - remaining)
+    actions = actions[:remaining]
+
+    batch_start = time.perf_counter()
+    if MINIWOB_VALIDATE_ACTIONS:
+        # later actions may target elements that only appear after the earlier ones ran,
+        # so only the first one is checked against the current page
+        for index, action in enumerate(actions):
+            error = _validate_action(session, action, check_target=index == 0)
+            if error:
+                _record_timings(session, {"validate": time.perf_counter() - batch_start})
+                return _rejected_response(session, action, error, index=index, steps=[])
+        _record_timings(session, {"validate": time.perf_counter() - batch_start})
+    try:
+        result = await _call_env(session.env, "step_batch", actions, timeout=ENV_TIMEOUT * max(1, len(actions)))
+    except Exception as e:
+        return json.dumps({
+            "success": False,
+            "error": str(e),
+            "message": f"Failed to execute actions: {e}"
+        })
+
+    steps = result["steps"]
+    if result["obs"] is not None:
+        _set_observation(session, result["obs"], result["info"])
+    # the step that raised counts as an attempt too, like a failed single action
+    session.action_execution_count += len(steps) + bool(result["error"])
+    session.reward_history.extend(step["reward"] for step in steps)
+    for step in steps:
+        _record_step(session, step["action"], step["reward"], step["terminated"], step["truncated"],
+                     step["step_time"])
+
+    last = steps[-1] if steps else {"reward": 0.0, "terminated": False, "truncated": False}
+    response = {
+        "success": result["error"] is None,
+        "reward": last["reward"],
+        "terminated": last["terminated"],
+        "truncated": last["truncated"] or skipped > 0,
+        "steps": steps,
+        "num_executed": len(steps),
+        "num_skipped": len(actions) + skipped - len(steps),
+        "total_time": round(time.perf_counter() - batch_start, 4),
+        "message": f"Executed {len(steps)} action(s). Reward: {last['reward']}"
+    }
+    if result["error"]:
+        response["error"] = result["error"]
+        response["failed_index"] = len(steps)
+        response["message"] = f"Action {len(steps)} failed, {len(steps)} action(s) ran before it: {result['error']}"
+    phases = dict(result["timings"])
+    if delta or full:
+        observation_start = time.perf_counter()
+        response["observation"] = _observation_delta(session, full=full)
+        phases["observation"] = time.perf_counter() - observation_start
+
+    serialize_start = time.perf_counter()
+    payload = json.dumps(response, ensure_ascii=False, separators=(",", ":"), default=str)
+    phases["serialize"] = time.perf_counter() - serialize_start
+    phases["total"] = time.perf_counter() - batch_start
+    _record_timings(session, phases)
+    return payload
+
+
+def _parse_white_agent_actions(response):
+    """White agents answer with one action, a JSON list of actions, or one action per line
+    (possibly inside a ``` block)."""
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.strip("`").split("\n", 1)[-1] if "\n" in text else ""
+    try:
+        actions = json.loads(text)
+        if isinstance(actions, str):
+            return [actions]
+        if isinstance(actions, list):
+            return [a for a in actions if isinstance(a, str)]
+    except ValueError:
+        pass
+    return [line.strip() for line in text.splitlines() if line.strip().startswith(("page.", "page "))] or [text]
+
+
+def _episode_plan(task_ids, episodes_per_task, seed):
+    rng = random.Random(seed)
+    return [(task_id, rng.randint(0, 2 ** 31 - 1))
+            for task_id in (t.strip() for t in task_ids.split(",")) if task_id
+            for _ in range(episodes_per_task)]
+
+
+def _episode_statistics(rewards):
+    if not rewards:
+        return {"episodes": 0, "mean_reward": 0.0, "variance": 0.0, "success_rate": 0.0}
+    mean = sum(rewards) / len(rewards)
+    return {
+        "episodes": len(rewards),
+        "mean_reward": round(mean, 4),
+        "variance": round(sum((r - mean) ** 2 for r in rewards) / len(rewards), 4),
+        "success_rate": round(sum(r > 0 for r in rewards) / len(rewards), 4),
+    }
+
+
+multi_episode_reports = {}  # battle_id -> aggregated report of run_miniwob_episodes
+
+
+@ab.tool
+async def run_miniwob_episodes(white_agent_url: str, battle_id: str = "default",
+                               task_ids: str = "click-scroll-list", episodes_per_task: int = 1,
+                               seed: int = None, max_turns: int = 3,
+                               observation_profile: str = DEFAULT_OBSERVATION_PROFILE) -> str:
     """
-    Evaluate
+    Run several MiniWob episodes in one tool call: for each (task, seed) reset an env, send the
+    task description to the white agent, execute the actions it answers with (up to max_turns
+    exchanges per episode) and score it. task_ids is comma separated, every task gets
+    episodes_per_task seeds drawn from `seed`. Returns the aggregated report, which
+    evaluate_task_completion(battle_id) also returns afterwards.
+    """
+    run_start = time.perf_counter()
+    episodes = []
+    for index, (task_id, episode_seed) in enumerate(_episode_plan(task_ids, episodes_per_task, seed)):
+        episode_id = f"{battle_id}/{index}"
+        episode_start = time.perf_counter()
+        record = {"task_id": task_id, "seed": episode_seed, "reward": 0.0, "num_actions": 0,
+                  "turns": 0, "terminated": False, "error": ""}
+        try:
+            reset = await reset_miniwob_env(task_id, episode_seed, episode_id, observation_profile)
+            if not reset.startswith("✅"):
+                raise RuntimeError(reset)
+
+            description = await get_task_description(episode_id)
+            while record["turns"] < max_turns and not record["terminated"]:
+                record["turns"] += 1
+                response = await ab.send_message_to_agent(
+                    white_agent_url,
+                    f"The web task of MiniWob's description is {description}. The battle_id is {battle_id}",
+                )
+                result = json.loads(await execute_white_agent_actions(
+                    json.dumps(_parse_white_agent_actions(response)), episode_id, delta=True))
+                if result.get("rejected"):
+                    # nothing ran: hand the validator's error back to the white agent
+                    description = json.dumps({k: result[k] for k in ("action", "error_type", "message", "available")
+                                              if k in result}, ensure_ascii=False, separators=(",", ":"))
+                    continue
+                if not result.get("success"):
+                    raise RuntimeError(result.get("message", "action execution failed"))
+                record["terminated"] = result["terminated"] or result["truncated"]
+                # later turns only carry what changed on the page
+                description = json.dumps({"goal": sessions[episode_id].obs.get("goal", ""),
+                                          "last_reward": result["reward"],
+                                          "changes": result.get("observation", {})},
+                                         ensure_ascii=False, separators=(",", ":"), default=str)
+
+            session = sessions[episode_id]
+            record["num_actions"] = session.action_execution_count
+            record["reward"] = float(session.reward_history[-1]) if session.reward_history else 0.0
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            session = sessions.pop(episode_id, None)
+            if session is not None:
+                _end_session(session)
+        record["wall_time"] = round(time.perf_counter() - episode_start, 4)
+        episodes.append(record)
+
+    per_task = {}
+    for record in episodes:
+        per_task.setdefault(record["task_id"], []).append(record["reward"])
+    report = {
+        "battle_id": battle_id,
+        **_episode_statistics([record["reward"] for record in episodes]),
+        "errors": sum(bool(record["error"]) for record in episodes),
+        "wall_time": round(time.perf_counter() - run_start, 4),
+        "per_task": {task_id: _episode_statistics(rewards) for task_id, rewards in per_task.items()},
+        "episode_results": episodes,
+    }
+    multi_episode_reports[battle_id] = report
+    return json.dumps(report, ensure_ascii=False, default=str)
+
+
+@ab.tool
+async def evaluate_action_sequence(task_id: str, seed: int, playwright_actions: str, use_cache: bool = True) -> str:
+    """
+    Reset task_id with seed, run a JSON list of actions and return the outcome, without a battle session.
+    Identical (task, seed, env versions, actions) runs are answered from the result cache unless use_cache=False.
+    """
+    try:
+        actions = json.loads(playwright_actions)
+        if isinstance(actions, str):
+            actions = [actions]
+        if not isinstance(actions, list) or not all(isinstance(a, str) for a in actions):
+            raise ValueError("expected a JSON list of action strings")
+    except ValueError as e:
+        return json.dumps({"success": False, "error": str(e), "message": f"Invalid action list: {e}"})
+    actions = actions[:MAX_ACTION_EXECUTIONS]
+
+    key = result_cache.key("miniwob", task_id, seed, actions)
+    if use_cache:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return json.dumps({**cached, "cached": True})
+
+    _start_env_pool()
+    try:
+        pooled = await asyncio.wait_for(env_pool.get(), ENV_TIMEOUT)
+    except asyncio.TimeoutError:
+        return json.dumps({"success": False, "error": "no idle MiniWob environment in the pool"})
+
+    try:
+        await _call_env(pooled, "reset", (task_id, seed, "text-only"), timeout=_reset_timeout(pooled))
+        result = await _call_env(pooled, "step_batch", actions, timeout=ENV_TIMEOUT * max(1, len(actions)))
+    except Exception as e:
+        return json.dumps({"success": False, "error": str(e), "message": f"Failed to evaluate actions: {e}"})
+    finally:
+        env_pool.put_nowait(pooled)
+    if result["error"]:
+        # not cached: the failure may not be reproducible
+        return json.dumps({"success": False, "error": result["error"], "steps": result["steps"],
+                           "message": f"Failed to evaluate actions: {result['error']}"}, default=str)
+
+    steps = [{k: step[k] for k in ("action", "reward", "terminated", "truncated", "error")}
+             for step in result["steps"]]
+    last = steps[-1] if steps else {"terminated": False, "truncated": False}
+    evaluation = {
+        "success": True,
+        "task_id": task_id,
+        "seed": seed,
+        "steps": steps,
+        "total_reward": float(sum(step["reward"] for step in steps)),
+        "solved": any(step["reward"] > 0 for step in steps),
+        "terminated": last["terminated"],
+        "truncated": last["truncated"],
+    }
+    result_cache.put(key, evaluation)
+    return json.dumps({**evaluation, "cached": False}, default=str)
+
+
+@ab.tool
+async def get_latency_metrics(format: str = "json") -> str:
+    """Per task / phase latency histograms ("json" summary or "prometheus" text).
+    Also served on GREEN_AGENT_METRICS_PORT (/metrics, /metrics.json) from the first reset on."""
+    if format == "prometheus":
+        return latency_metrics.prometheus()
+    return json.dumps(latency_metrics.json())
+
+
+@ab.tool
+async def get_startup_report() -> str:
+    """Cold-start timings (seconds since the tools module started loading)."""
+    return json.dumps(startup_timings)
+
+
+@ab.tool
+async def get_resource_report() -> str:
+    """Resident memory and process count of the green agent (incl. its browsers),
+    env create/close/recycle counters and the episodes served by each pooled env."""
+    memory = _process_tree_memory()
+    with _lifecycle_lock:
+        lifecycle_snapshot = dict(lifecycle_stats)
+    return json.dumps({
+        "memory": memory,
+        "lifecycle": lifecycle_snapshot,
+        "recycle_after_episodes": MINIWOB_RECYCLE_EPISODES,
+        "recycle_rss_mb": MINIWOB_RECYCLE_RSS_MB,
+        "pool": [{"index": p.index, "task_id": p.task_id, "episodes": p.episodes, "alive": p.env is not None,
+                  "browser_rss_mb": p.rss_mb} for p in pooled_envs],
+    })
+
+
+@ab.tool
+async def get_observation_profile_report() -> str:
+    """Mean observation capture time per profile, over every reset/step so far."""
+    with _timings_lock:
+        report = {
+            profile: {"count": t["count"], "mean_seconds": round(t["total"] / t["count"], 4)}
+            for profile, t in observation_timings.items() if t["count"]
+        }
+    return json.dumps(report)
+
+
+@ab.tool
+async def evaluate_task_completion(battle_id: str = "default", include_timings: bool = False) -> str:
+    """
+    Evaluate, then end the battle's session and give its env back to the pool
 
     Returns:
         JSON result
     """
-    global current_obs, current_info, reward_history
+    session = sessions.get(battle_id)
+    if session is None and battle_id in multi_episode_reports:
+        # battle played with run_miniwob_episodes: its aggregated report is the evaluation
+        return json.dumps(multi_episode_reports.pop(battle_id), ensure_ascii=False, indent=2, default=str)
+    if session is None or session.obs is None:
+        return json.dumps({"error": "Environment not initialized", "score": 0.0, "success": False})
+
+    reward_history = session.reward_history
+    sessions.pop(battle_id, None)
+    _end_session(session)
 
     def _sync_evaluate():
-        return current_obs, current_info
+        return session.obs, session.info
 
     try:
         if reward_history:
@@ -241,17 +1395,22 @@ async def evaluate_task_completion() -> str:
         obs, info = await asyncio.to_thread(_sync_evaluate)
 
         evaluation = {
-            "task_id": current_task_id,
+            "battle_id": battle_id,
+            "task_id": session.task_id,
+            "seed": session.seed,
             "goal": obs.get("goal", ""),
             "elapsed_time": obs.get("elapsed_time", 0),
             "last_action": obs.get("last_action", ""),
             "last_action_error": obs.get("last_action_error", ""),
             "num_actions": len(reward_history),
+            "rejected_actions": session.rejected_actions,
             "reward_history": reward_history,
             "total_reward": total_reward,
             "average_reward": avg_reward,
             "evaluation_details": info,
         }
+        if include_timings:
+            evaluation["phase_seconds"] = {phase: round(t, 4) for phase, t in session.phase_totals.items()}
 
         return json.dumps(evaluation, ensure_ascii=False, indent=2, default=str)
 
@@ -262,6 +1421,11 @@ async def evaluate_task_completion() -> str:
             "success": False
         })
 
+# Warm the pool while the agent starts: only starts the worker threads, so loading stays fast
+if MINIWOB_WARM_ON_LOAD:
+    _start_env_pool()
+
+
 # ============ utils ============
 
 
@@ -0,0 +1,451 @@
+import asyncio
+import json
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+os.environ["MINIWOB_WARM_ON_LOAD"] = "0"  # no browsers for the unit tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "green_agent"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))  # green_common
+
+import tools
+
+
+def _node(bid, role, name, children=()):
+    return {"browsergym_id": bid, "role": {"value": role}, "name": {"value": name},
+            "properties": [{"name": "focusable", "value": {"value": True}}], "childIds": list(children)}
+
+
+def _session(*nodes):
+    session = tools._BattleSession("test", "click-test")
+    tools._set_observation(session, {"goal": "Click Submit", "axtree_object": {"nodes": list(nodes)},
+                                     "extra_element_properties": {"13": {"clickable": True}}}, {})
+    return session
+
+
+# ============================================================================
+# White agent answers -> action lists
+# ============================================================================
+
+
+def test_parse_white_agent_actions():
+    click = 'page.get_by_role("button", name="Submit").click()'
+    assert tools._parse_white_agent_actions(click) == [click]
+    assert tools._parse_white_agent_actions(json.dumps([click, click])) == [click, click]
+    assert tools._parse_white_agent_actions(json.dumps(click)) == [click]
+    assert tools._parse_white_agent_actions(f"```python\n{click}\npage.keyboard.press(\"Enter\")\n```") == \
+        [click, 'page.keyboard.press("Enter")']
+    assert tools._parse_white_agent_actions("Here you go:\n" + click) == [click]
+
+
+# ============================================================================
+# AXTree -> element table
+# ============================================================================
+
+
+def test_extract_elements_from_flat_axtree():
+    nodes = [_node("1", "RootWebArea", "page"), _node("13", "button", "Submit"), _node("14", "textbox", "Name")]
+    elements = tools._extract_elements_from_axtree_object({"nodes": nodes}, {"13": {"clickable": True}})
+    assert elements == [
+        {"bid": "13", "role": "button", "name": "Submit", "value": "", "focusable": True, "clickable": True,
+         "disabled": False},
+        {"bid": "14", "role": "textbox", "name": "Name", "value": "", "focusable": True, "clickable": False,
+         "disabled": False},
+    ]
+
+
+def test_extract_elements_from_nested_axtree_in_document_order():
+    tree = {"role": "main", "children": [
+        {"role": "link", "name": "a", "children": [{"role": "button", "name": "b"}]},
+        {"role": "button", "name": "c"},
+    ]}
+    assert [e["name"] for e in tools._extract_elements_from_axtree(tree)] == ["a", "b", "c"]
+
+
+def test_element_table_is_built_once_per_observation():
+    session = _session(_node("13", "button", "Submit"))
+    table = tools._element_table(session)
+    assert tools._element_table(session) is table
+    assert table["by_role"] == {"button": [0]} and table["bids"] == {"13"}
+
+
+# ============================================================================
+# Delta observations
+# ============================================================================
+
+
+def test_observation_delta():
+    session = _session(_node("13", "button", "Submit"), _node("14", "textbox", "Name"))
+    first = tools._observation_delta(session)
+    assert first["full"] is True and len(first["visible_elements"]) == 2
+
+    tools._set_observation(session, {"axtree_object": {"nodes": [
+        _node("13", "button", "Sent"), _node("15", "link", "Next")]}}, {})
+    delta = tools._observation_delta(session)
+    assert delta["full"] is False
+    assert [e["bid"] for e in delta["added"]] == ["15"]
+    assert delta["removed"] == ["14"]
+    assert [e["name"] for e in delta["changed"]] == ["Sent"]
+    assert tools._observation_delta(session) == {"full": False, "added": [], "removed": [], "changed": []}
+
+
+def test_observation_delta_after_projected_snapshot():
+    session = _session(_node("13", "button", "Submit"), _node("14", "textbox", "Name"))
+    first = tools._observation_delta(session, fields="bid,name")
+    assert first["visible_elements"] == [{"bid": "13", "name": "Submit"}, {"bid": "14", "name": "Name"}]
+
+    # same page, full fields: nothing changed although the previous call was projected
+    tools._set_observation(session, session.obs, {})
+    assert tools._observation_delta(session) == {"full": False, "added": [], "removed": [], "changed": []}
+
+
+# ============================================================================
+# Action validation
+# ============================================================================
+
+
+def _error_type(action, check_target=True):
+    session = _session(_node("13", "button", "Submit"), _node("14", "textbox", "First name"),
+                       _node("15", "button", "Submit"))
+    error = tools._validate_action(session, action, check_target)
+    return error and error["error_type"]
+
+
+@pytest.mark.parametrize("action", [
+    'page.get_by_role("button", name="Submit").click()',
+    'page.get_by_role("button", name="submit").click()',  # case-insensitive substring by default
+    'page.get_by_role("textbox", name="first").fill("Bob")',
+    'page.get_by_role("heading", name="anything").click()',  # roles outside the table are not checked
+    'page.get_by_test_id("14").fill("Bob")',
+    'page.locator("[bid=13]").click()',
+    "page.click(\"[bid='15']\")",
+    'page.get_by_role("textbox").fill("[bid=77]")',  # a value, not a selector
+    'page.get_by_role("textbox").press("[bid=77]")',
+    'page.keyboard.type("[bid=77]")',
+    'page.fill("#name", "Bob")\npage.get_by_role("button", name="Submit").click()',
+])
+def test_valid_actions(action):
+    assert _error_type(action) is None
+
+
+@pytest.mark.parametrize("action, error_type", [
+    ('page.get_by_role("button", name="Submit".click()', "syntax"),
+    ('await page.get_by_role("button", name="Submit").click()', "syntax"),  # exec()ed at module level
+    ("", "syntax"),
+    ('print("hi")', "unsupported_action"),
+    ('page.get_by_role("button").click()\nx = 1', "unsupported_action"),
+    ('browser.close()', "unsupported_action"),
+    ('page.get_by_role("link").click()', "unknown_target"),
+    ('page.get_by_role("button", name="Cancel").click()', "unknown_target"),
+    ('page.get_by_role("button", name="Sub", exact=True).click()', "unknown_target"),
+    ('page.get_by_test_id("77").click()', "unknown_target"),
+    ('page.locator("[bid=77]").click()', "unknown_target"),
+    ('page.fill("[bid=77]", "Bob")', "unknown_target"),
+])
+def test_rejected_actions(action, error_type):
+    assert _error_type(action) == error_type
+
+
+def test_targets_are_not_checked_when_disabled():
+    assert _error_type('page.locator("[bid=77]").click()', check_target=False) is None
+    assert _error_type("page.click(", check_target=False) == "syntax"
+
+# ============================================================================
+# Observation profiles keep every key of the observation space
+# ============================================================================
+
+
+@pytest.mark.parametrize("profile", ["text-only", "axtree+screenshot"])
+def test_profiled_obs_matches_observation_space(monkeypatch, profile):
+    gym = pytest.importorskip("gymnasium")
+    pytest.importorskip("browsergym.miniwob")
+    from green_common import observation
+
+    page = types.SimpleNamespace(url="about:blank", title=lambda: "")
+    base = types.SimpleNamespace(chat=types.SimpleNamespace(messages=[]), goal_object=[], page=page,
+                                 context=types.SimpleNamespace(pages=[page]), last_action="",
+                                 last_action_error="", start_time=0.0)
+    monkeypatch.setattr(observation, "_extract_axtree", lambda base: ({"nodes": []}, ""))
+    monkeypatch.setattr("browsergym.core.observation.extract_screenshot",
+                        lambda page: np.zeros((4, 4, 3), dtype=np.uint8))
+    obs = observation.get_obs(base, observation.OBSERVATION_PROFILES[profile])
+
+    space = gym.make("browsergym/miniwob.click-test").unwrapped.observation_space
+    assert obs.keys() == space.spaces.keys()
+    assert space["screenshot"].contains(obs["screenshot"])
+
+
+# ============================================================================
+# Abandoned battles give their env back
+# ============================================================================
+
+
+def test_idle_sessions_are_reaped():
+    idle, active = _session(), _session()
+    idle.env, active.env = "env-a", "env-b"
+    idle.last_used -= tools.MINIWOB_SESSION_TTL + 1
+    tools.sessions.update({"idle": idle, "active": active})
+    try:
+        tools._reap_idle_sessions()
+        assert "idle" not in tools.sessions and idle.env is None
+        assert tools.sessions["active"] is active
+        assert tools.env_pool.get_nowait() == "env-a" and tools.env_pool.empty()
+    finally:
+        tools.sessions.clear()
+
+
+# ============================================================================
+# A step that raises mid-batch keeps the steps before it
+# ============================================================================
+
+
+class _FlakyEnv:
+    def step(self, action):
+        if action == "boom":
+            raise RuntimeError("page crashed")
+        return {"last_action_error": ""}, 0.5, False, False, {}
+
+    def close(self):
+        pass
+
+
+def test_step_batch_returns_partial_results(monkeypatch):
+    monkeypatch.setattr(tools, "_import_browsergym", lambda: None)
+    monkeypatch.setattr(tools, "MINIWOB_VALIDATE_ACTIONS", False)
+    pooled = tools._PooledEnv("test")
+    pooled.env = _FlakyEnv()
+    session = _session()
+    session.env = pooled
+    tools.sessions["batch"] = session
+    try:
+        result = json.loads(asyncio.run(tools.execute_white_agent_actions('["a", "boom", "c"]', "batch")))
+    finally:
+        tools.sessions.clear()
+        pooled.submit("stop").result(5)
+
+    assert result["success"] is False and "page crashed" in result["error"]
+    assert result["num_executed"] == 1 and result["failed_index"] == 1
+    assert [step["action"] for step in result["steps"]] == ["a"]
+    assert session.action_execution_count == 2
+    assert session.reward_history == [0.5] and session.trace["actions"] == ["a"]
+
+
+
+def test_single_and_batch_actions_share_one_budget(monkeypatch):
+    monkeypatch.setattr(tools, "_import_browsergym", lambda: None)
+    monkeypatch.setattr(tools, "MINIWOB_VALIDATE_ACTIONS", False)
+    pooled = tools._PooledEnv("budget")
+    pooled.env = _FlakyEnv()
+    session = _session()
+    session.env = pooled
+    tools.sessions["budget"] = session
+    try:
+        batch = json.loads(asyncio.run(tools.execute_white_agent_actions(json.dumps(["a"] * 8), "budget")))
+        singles = [json.loads(asyncio.run(tools.execute_white_agent_action("a", "budget"))) for _ in range(3)]
+        after = json.loads(asyncio.run(tools.execute_white_agent_actions('["a"]', "budget")))
+    finally:
+        tools.sessions.clear()
+        pooled.submit("stop").result(5)
+
+    assert batch["num_executed"] == 8
+    assert [single.get("truncated") for single in singles] == [False, False, True]
+    assert "maximum action limit" in singles[-1]["message"] and after["steps"] == []
+    assert session.action_execution_count == tools.MAX_ACTION_EXECUTIONS
+
+
+def test_stop_env_pool_closes_envs_and_joins_workers(monkeypatch):
+    monkeypatch.setattr(tools, "_import_browsergym", lambda: None)
+    closed = tools.lifecycle_stats["envs_closed"]
+    pool = [tools._PooledEnv(f"stop-{i}") for i in range(2)]
+    for pooled in pool:
+        pooled.env = _FlakyEnv()
+    monkeypatch.setattr(tools, "pooled_envs", list(pool))
+
+    tools._stop_env_pool(timeout=5)
+    assert not any(pooled.thread.is_alive() for pooled in pool)
+    assert all(pooled.env is None for pooled in pool)
+    assert tools.lifecycle_stats["envs_closed"] == closed + 2 and tools.pooled_envs == []
+
+
+# ============================================================================
+# The memory watermark recycles only the env whose own browser is over it
+# ============================================================================
+
+
+def test_browser_roots_skip_the_driver_and_other_envs():
+    me = os.getpid()
+    before = ({me: [10], 10: [20], 20: [21]}, {10: "node", 20: "chrome", 21: "chrome"})
+    # a second browser (30) under the shared driver, plus a renderer (22) the first env's browser
+    # started while the second one launched
+    after = ({me: [10], 10: [20, 30], 20: [21, 22], 30: [31, 32]},
+             {10: "node", 20: "chrome", 21: "chrome", 22: "chrome", 30: "chrome", 31: "chrome",
+              32: "chrome"})
+    assert tools._browser_roots(before, after, known_roots=[20]) == [30]
+    # first launch: the driver itself is new and is looked through
+    first = ({me: [10], 10: [20], 20: [21]}, {10: "node", 20: "chrome", 21: "chrome"})
+    assert tools._browser_roots(({}, {}), first) == [20]
+
+
+def test_rss_watermark_recycles_only_the_env_over_it(monkeypatch):
+    scans = []
+    monkeypatch.setattr(tools, "MINIWOB_RECYCLE_EPISODES", 0)
+    monkeypatch.setattr(tools, "MINIWOB_RECYCLE_RSS_MB", 500)
+    monkeypatch.setattr(tools, "_process_table", lambda: scans.append(1) or ({}, {}))
+    monkeypatch.setattr(tools, "_subtree_memory",
+                        lambda table, roots: ((900 if roots == [101] else 100) * 2**20, {}))
+    growing, steady = (types.SimpleNamespace(index=i, env=_FlakyEnv(), task_id="click-test", episodes=3,
+                                             browser_pids=[pid], rss_mb=None, rss_checked=0.0)
+                       for i, pid in enumerate([101, 202]))
+    recycled = tools.lifecycle_stats["recycled_rss"]
+
+    for _ in range(3):
+        tools._maybe_recycle(steady)
+    tools._maybe_recycle(growing)
+
+    assert growing.env is None and growing.browser_pids == []
+    assert steady.env is not None and steady.rss_mb == 100
+    assert tools.lifecycle_stats["recycled_rss"] == recycled + 1
+    assert len(scans) == 2  # the steady env was measured once within MINIWOB_RSS_CHECK_INTERVAL
+
+
+# ============================================================================
+# A reset queued behind the warmup gets the warmup budget
+# ============================================================================
+
+
+def test_first_reset_waits_for_warmup_with_its_own_budget(monkeypatch):
+    timeouts = []
+
+    async def call_env(pooled, command, args=None, timeout=tools.ENV_TIMEOUT):
+        timeouts.append(timeout)
+        pooled.warm = True  # the worker finished the warmup, then this reset
+        return {"obs": {"goal": "Click", "axtree_object": {"nodes": []}}, "info": {},
+                "timings": {"queue_wait": 0.0, "env": 0.0}}
+
+    monkeypatch.setattr(tools, "_start_env_pool", lambda: None)
+    monkeypatch.setattr(tools, "_call_env", call_env)
+    tools.env_pool.put_nowait(types.SimpleNamespace(index=0, warm=False))
+    try:
+        for _ in range(2):
+            assert asyncio.run(tools.reset_miniwob_env("click-test", 0, "warm")).startswith("✅")
+    finally:
+        tools._end_session(tools.sessions.pop("warm"))
+        tools.env_pool.get_nowait()
+
+    assert timeouts == [tools.ENV_TIMEOUT + tools.MINIWOB_WARMUP_TIMEOUT, tools.ENV_TIMEOUT]
+
+
+# ============================================================================
+# Sweep workers stop their env before exiting
+# ============================================================================
+
+
+def test_sweep_workers_stop_their_env(monkeypatch, tmp_path):
+    import sweep
+
+    stopped = tmp_path / "stopped"
+    stop_env = tools._stop_env
+
+    def recording_stop(pooled, timeout):
+        stop_env(pooled, timeout)
+        with open(stopped, "a") as f:
+            f.write(f"{pooled.index} {pooled.thread.is_alive()}\n")
+
+    monkeypatch.setattr(tools, "_import_browsergym", lambda: None)
+    monkeypatch.setattr(tools, "_stop_env", recording_stop)
+    monkeypatch.setattr(sweep, "_list_tasks", lambda pattern: ["click-test"])
+    monkeypatch.setattr(sys, "argv", ["sweep.py", "--workers", "2", "--seeds", "4", "--policy", "noop",
+                                      "--out", str(tmp_path / "sweep.jsonl"),
+                                      "--summary", str(tmp_path / "sweep.csv")])
+    sweep.main()
+
+    lines = stopped.read_text().splitlines()
+    assert len(lines) == 2 and all(line.endswith("False") for line in lines)
+
+
+# ============================================================================
+# Several episodes in one tool call
+# ============================================================================
+
+
+def test_episode_plan_draws_seeds_from_the_seed():
+    plan = tools._episode_plan("click-test, ,focus-text", 2, 7)
+    assert [task_id for task_id, _ in plan] == ["click-test", "click-test", "focus-text", "focus-text"]
+    assert plan == tools._episode_plan("click-test,focus-text", 2, 7)
+    assert plan != tools._episode_plan("click-test,focus-text", 2, 8)
+
+
+def test_episode_statistics():
+    assert tools._episode_statistics([]) == {"episodes": 0, "mean_reward": 0.0, "variance": 0.0,
+                                             "success_rate": 0.0}
+    assert tools._episode_statistics([1.0, 0.0, 0.5, 0.5]) == {"episodes": 4, "mean_reward": 0.5,
+                                                               "variance": 0.125, "success_rate": 0.75}
+
+
+class _EpisodeEnv:
+    """Submit ends the episode with reward 1; every step of the second episode crashes."""
+
+    def __init__(self):
+        self.unwrapped = types.SimpleNamespace(task=None)  # each reset goes through env.reset()
+        self.resets = []
+
+    def _obs(self):
+        nodes = [_node("13", "button", "Submit"), _node("14", "textbox", "First name")]
+        return {"goal": "Click Submit", "last_action_error": "", "axtree_object": {"nodes": nodes},
+                "extra_element_properties": {}}
+
+    def reset(self, seed=None):
+        self.resets.append(seed)
+        return self._obs(), {}
+
+    def step(self, action):
+        if len(self.resets) == 2:
+            raise RuntimeError("page crashed")
+        done = "Submit" in action
+        return self._obs(), float(done), done, False, {}
+
+    def close(self):
+        pass
+
+
+def test_run_miniwob_episodes(monkeypatch):
+    replies = ['page.get_by_role("button", name="Cancel").click()',  # rejected: no such button
+               'page.get_by_role("textbox", name="first").fill("Bob")',
+               'page.get_by_role("button", name="Submit").click()',
+               'page.get_by_role("button", name="Submit").click()']  # second episode: the env crashes
+    messages = []
+
+    async def send_message_to_agent(url, message):
+        messages.append(message)
+        return replies[len(messages) - 1]
+
+    monkeypatch.setattr(tools, "_import_browsergym", lambda: None)
+    monkeypatch.setattr(tools, "_start_env_pool", lambda: None)
+    monkeypatch.setattr(tools, "MINIWOB_VALIDATE_ACTIONS", True)
+    monkeypatch.setattr(tools.ab, "send_message_to_agent", send_message_to_agent)
+    pooled = tools._PooledEnv("episodes")
+    pooled.env = env = _EpisodeEnv()
+    tools.env_pool.put_nowait(pooled)
+    try:
+        report = json.loads(asyncio.run(tools.run_miniwob_episodes("http://white", "multi", "click-test", 2, seed=3)))
+        evaluation = json.loads(asyncio.run(tools.evaluate_task_completion("multi")))
+        # every episode's session was ended and the env went back to the pool
+        assert tools.sessions == {} and tools.env_pool.get_nowait() is pooled and tools.env_pool.empty()
+    finally:
+        tools.sessions.clear()
+        pooled.submit("stop").result(5)
+
+    first, second = report["episode_results"]
+    assert env.resets == [first["seed"], second["seed"]]
+    assert first["turns"] == 3 and first["num_actions"] == 2
+    assert first["reward"] == 1.0 and first["terminated"] and first["error"] == ""
+    assert "page crashed" in second["error"] and second["reward"] == 0.0
+    assert len(messages) == 4 and "Click Submit" in messages[0] and "Click Submit" in messages[3]
+    assert "unknown_target" in messages[1]  # the rejected action is fed back
+    assert '"last_reward":0.0' in messages[2]  # then only what changed on the page
+    assert report["episodes"] == 2 and report["mean_reward"] == 0.5 and report["errors"] == 1
+    assert report["per_task"]["click-test"]["success_rate"] == 0.5
+    assert evaluation == report and "multi" not in tools.multi_episode_reports
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: WebLINX action parsing, single-pass tokenizer vs the ast-based parser
+- corpus: every expected action and every action of the action histories of a split
+- reports actions/sec of both parsers and how much of the corpus the tokenizer handles
+  without falling back to ast
+
+Usage:
+    python bench_action_parser.py weblinx_data/valid.json.gz --repeat 5
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import re
+import time
+
+from weblinx_actions import parse_weblinx_action, parse_weblinx_action_ast, _parse_args_fast, _split_action
+
+_CALL = re.compile(r'[a-zA-Z_]+\((?:[^()"]|"[^"]*")*\)')
+
+
+def load_corpus(path):
+    actions = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                actions.append(row["action"])
+                actions.extend(_CALL.findall(row["action_history"] or ""))
+    return actions
+
+
+def _throughput(parse, actions, repeat):
+    best = float("inf")
+    # the ast parser prints a warning per unparsable string, keep that out of the timing
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for action in actions:
+                parse(action)
+            best = min(best, time.perf_counter() - start)
+    return len(actions) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebLINX action parser microbenchmark")
+    parser.add_argument("split", help="a WebLINX .json.gz split")
+    parser.add_argument("--repeat", type=int, default=5, help="best of N passes over the corpus")
+    args = parser.parse_args()
+
+    actions = load_corpus(args.split)
+    fast_path = sum(1 for a in actions
+                    if (split := _split_action(a)) and split[1] and _parse_args_fast(split[1]) is not None)
+    tokenizer = _throughput(parse_weblinx_action, actions, args.repeat)
+    reference = _throughput(parse_weblinx_action_ast, actions, args.repeat)
+    print(json.dumps({
+        "actions": len(actions),
+        "tokenizer_coverage": round(fast_path / len(actions), 4),
+        "tokenizer_actions_per_sec": round(tokenizer),
+        "ast_actions_per_sec": round(reference),
+        "speedup": round(tokenizer / reference, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+Code shared by the green agents of every scenario
+- observation: BrowserGym observation profiles (skip the screenshot / DOM snapshot capture)
+- metrics: per (scenario, task, phase) latency histograms and their /metrics HTTP endpoint
+- cache: content-addressed LRU of evaluation results, optionally mirrored to disk
+
+Each green agent is its own deploy unit, so this package reaches them in two ways:
+- MiniWob / AssistantBench (loaded by `agentbeats` from their scenario.toml) import it installed:
+  `pip install ./green_common` from the repository root
+- WebLINX ships only scenario4WebLINX/green_agent to Cloud Run (cloudbuild.yml), so it keeps a
+  vendored copy in green_agent/green_common next to main.py. Edit the files here, then copy them
+  there; green_common/tests/test_vendored.py fails while the two differ
+"""
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Latency metrics shared by the green agents
+- Histogram: fixed-bucket histogram, observing a value is a bisect and two adds
+- LatencyMetrics(scenario, buckets, gauges): one Histogram per (scenario, task, phase);
+  json() summarizes them (count, mean, p50/p90/p99), prometheus() renders the text format,
+  plus the lines returned by `gauges` (e.g. resident memory)
+- percentiles(values): exact mean/p50/p90/p99/max of a list of timings, for offline reports
+  (MiniWob replay.py and sweep.py)
+- start_metrics_server(metrics, port): serves GET /metrics (Prometheus text) and /metrics.json.
+  Called from the agent's entry point only (main.py / the first reset), never at import, so
+  sweep workers and tests that import a tools module do not try to bind the port
+"""
+
+import bisect
+import http.server
+import json
+import os
+import threading
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PORT = os.getenv("GREEN_AGENT_METRICS_PORT")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last bucket is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None past the last bucket)."""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pct(p):
+        return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 4)
+
+    return {"mean": round(sum(values) / len(values), 4), "p50": pct(50), "p90": pct(90),
+            "p99": pct(99), "max": round(values[-1], 4), "n": len(values)}
+
+
+class LatencyMetrics:
+    """Phase latency histograms of one scenario, keyed by (scenario, task, phase)."""
+
+    def __init__(self, scenario, buckets=LATENCY_BUCKETS, gauges=None):
+        self.scenario = scenario
+        self.buckets = buckets
+        self.gauges = gauges  # () -> extra Prometheus lines
+        self.histograms = {}
+
+    def observe(self, task, phases):
+        for phase, seconds in phases.items():
+            key = (self.scenario, task, phase)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms.setdefault(key, Histogram(self.buckets))
+            histogram.observe(seconds)
+
+    def json(self):
+        return {
+            f"{scenario}/{task}/{phase}": {
+                "count": h.count,
+                "mean": round(h.total / h.count, 6) if h.count else 0.0,
+                "p50": h.quantile(0.5),
+                "p90": h.quantile(0.9),
+                "p99": h.quantile(0.99),
+            }
+            for (scenario, task, phase), h in sorted(self.histograms.items())
+        }
+
+    def prometheus(self):
+        lines = ["# TYPE green_agent_phase_seconds histogram"]
+        for (scenario, task, phase), h in sorted(self.histograms.items()):
+            labels = f'scenario="{scenario}",task="{task}",phase="{phase}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), h.counts):
+                cumulative += n
+                lines.append(f'green_agent_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"green_agent_phase_seconds_sum{{{labels}}} {h.total}")
+            lines.append(f"green_agent_phase_seconds_count{{{labels}}} {h.count}")
+        if self.gauges is not None:
+            lines.extend(self.gauges())
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """GET /metrics (Prometheus text) or /metrics.json"""
+
+    metrics = None  # set on the subclass made by start_metrics_server
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(self.metrics.json()), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = self.metrics.prometheus(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(metrics, port=METRICS_PORT):
+    """Serve `metrics` on port (GREEN_AGENT_METRICS_PORT) in a daemon thread, once per process.
+    Returns the server, or None when no port is set or it cannot be bound."""
+    global _server
+    with _server_lock:
+        if _server is None and port not in (None, ""):
+            handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+            try:
+                _server = http.server.ThreadingHTTPServer(("0.0.0.0", int(port)), handler)
+            except OSError as e:
+                print(f"⚠️ metrics server not started on port {port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics").start()
+        return _server
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+BrowserGym observation profiles, shared by the MiniWob and AssistantBench green agents
+- OBSERVATION_PROFILES: which optional parts (screenshot, DOM snapshot) a profile captures;
+  goal, url, chat, AXTree and focused bid are always captured
+- get_obs(base, parts): BrowserEnv._get_obs without the parts that are not listed. A skipped
+  part keeps its key with an empty placeholder (dom_object={}, a 0x0 screenshot), so the
+  observation still matches the env's observation space and gymnasium's env checker passes
+
+browsergym / playwright / numpy are imported on first use only.
+"""
+
+import time
+
+OBSERVATION_PROFILES = {
+    "text-only": frozenset(),
+    "axtree+screenshot": frozenset(["screenshot"]),
+    "full": frozenset(["screenshot", "dom"]),
+}
+
+
+def _extract_axtree(base):
+    """AXTree and focused bid, with BrowserGym's mark / retry / unmark policy."""
+    import playwright.sync_api
+    from browsergym.core.constants import EXTRACT_OBS_MAX_TRIES
+    from browsergym.core.observation import (MarkingError, _post_extract, _pre_extract,
+                                             extract_focused_element_bid, extract_merged_axtree)
+
+    for retries_left in reversed(range(EXTRACT_OBS_MAX_TRIES)):
+        try:
+            _pre_extract(base.page, tags_to_mark=base.tags_to_mark, lenient=(retries_left == 0))
+            axtree = extract_merged_axtree(base.page)
+            focused_element_bid = extract_focused_element_bid(base.page)
+        except (playwright.sync_api.Error, MarkingError):
+            # frames detached / navigating: same retry policy as BrowserGym
+            if retries_left > 0:
+                _post_extract(base.page)
+                time.sleep(0.5)
+                continue
+            raise
+        break
+    _post_extract(base.page)
+    return axtree, focused_element_bid
+
+
+def get_obs(base, parts):
+    """Observation of the BrowserEnv `base` capturing only `parts` (a set of OBSERVATION_PROFILES)."""
+    if parts >= OBSERVATION_PROFILES["full"]:
+        return type(base)._get_obs(base)
+
+    import numpy as np
+    from browsergym.core.observation import extract_screenshot
+
+    axtree, focused_element_bid = _extract_axtree(base)
+    return {
+        "chat_messages": tuple(dict(m) for m in base.chat.messages),
+        "goal": "\n".join(m["text"] for m in base.goal_object if m["type"] == "text"),
+        "goal_object": tuple(dict(m) for m in base.goal_object),
+        "open_pages_urls": tuple(page.url for page in base.context.pages),
+        "open_pages_titles": tuple(page.title() for page in base.context.pages),
+        "active_page_index": np.asarray([base.context.pages.index(base.page)]),
+        "url": base.page.url,
+        "screenshot": (extract_screenshot(base.page) if "screenshot" in parts
+                       else np.zeros((0, 0, 3), dtype=np.uint8)),
+        "dom_object": {},
+        "axtree_object": axtree,
+        "extra_element_properties": {},
+        "focused_element_bid": focused_element_bid,
+        "last_action": base.last_action,
+        "last_action_error": base.last_action_error,
+        "elapsed_time": np.asarray([time.time() - base.start_time]),
+    }
@@ -1,9 +1,23 @@
+import time
+_start = time.perf_counter()
+
 import agentbeats as ab
+_agentbeats_loaded = time.perf_counter()
 import tools  # 必须 import 才能注册工具
+_tools_loaded = time.perf_counter()
+from green_common.metrics import start_metrics_server
 
 if __name__ == "__main__":
+    # Cold-start report (Cloud Run logs)
+    print(f"⏱️ import agentbeats: {_agentbeats_loaded - _start:.3f}s, "
+          f"import tools: {_tools_loaded - _agentbeats_loaded:.3f}s")
+
     # Load agent card
     ab.load_agent_card("green_agent_card.toml")
+    print(f"⏱️ agent card loaded: {time.perf_counter() - _start:.3f}s after start")
     
+    # Latency metrics on GREEN_AGENT_METRICS_PORT (if set)
+    start_metrics_server(tools.latency_metrics)
+
     # Start MCP-based agent for cloud controller
     ab.start_green_agent()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Offline bulk WebLINX scoring (no AgentBeats / LLM in the loop)
+- reads a JSONL file of {"task_id": int, "agent_action": str} predictions for one split;
+  a line that is not such an object is scored 0 as "malformed_prediction" instead of
+  stopping the run
+- scores them in N worker processes with the green agent's match rules
+  (weblinx_actions.score_action); the expected actions come from the memory-mapped
+  columnar store, so every worker shares the same pages
+- prints overall success rate / average score with per action type and per match type
+  breakdowns and a score histogram (weblinx_stats.RunningStats, the same aggregates as the
+  green agent's get_weblinx_statistics), and optionally writes one JSONL result per prediction
+- also averages grounding_iou (bbox IoU, uid actions) and text_similarity (chrF of say /
+  text_input), both computed per chunk in one batch with weblinx_metrics.py
+
+Usage:
+    python score_predictions.py predictions.jsonl --split validation --workers 8 --out scored.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from weblinx_actions import TEXT_ARGS, action_text, parse_agent_action, score_action, to_parsed_action
+from weblinx_candidates import find_candidates
+from weblinx_columns import open_columns
+from weblinx_metrics import bbox_iou, chrf
+from weblinx_stats import RunningStats
+
+DATASET_DIR = os.getenv("WEBLINX_DATA_PATH", "weblinx_data")
+INDEX_DIR = os.getenv("WEBLINX_INDEX_DIR") or None
+CHUNK_SIZE = 256
+
+_columns = None
+_expected = {}  # task_id -> ParsedAction, per worker
+
+
+def _split_path(split):
+    return os.path.join(DATASET_DIR, "valid.json.gz" if split in ("validation", "valid") else f"{split}.json.gz")
+
+
+def _init_worker(path, index_dir):
+    global _columns
+    _columns = open_columns(path, index_dir)
+
+
+def _load_prediction(line):
+    """The decoded line, or the raw line when it is not JSON (scored as malformed)."""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return line.rstrip("\n")
+
+
+def _expected_action(task_id):
+    expected = _expected.get(task_id)
+    if expected is None:
+        expected = _expected[task_id] = to_parsed_action(_columns.text("action", task_id))
+    return expected
+
+
+def _score_chunk(predictions):
+    results = []
+    box_rows, agent_boxes, expected_boxes = [], [], []
+    text_rows, hypotheses, references = [], [], []
+    for prediction in predictions:
+        if not isinstance(prediction, dict) or not isinstance(prediction.get("agent_action") or "", str):
+            results.append({"task_id": None, "actual": prediction, "success": False, "score": 0.0,
+                            "match_type": "malformed_prediction", "action_type": None})
+            continue
+        task_id = prediction.get("task_id")
+        agent_action = prediction.get("agent_action") or ""
+        if not isinstance(task_id, int) or not 0 <= task_id < len(_columns):
+            results.append({"task_id": task_id, "actual": agent_action, "success": False, "score": 0.0,
+                            "match_type": "invalid_task_id", "action_type": None})
+            continue
+
+        agent_func, agent_args = parse_agent_action(agent_action)
+        exp_func, exp_args = _expected_action(task_id)
+        success, score, match_type = score_action(agent_func, agent_args, exp_func, exp_args)
+        result = {"task_id": task_id, "expected": _columns.text("action", task_id), "actual": agent_action,
+                  "success": success, "score": score, "match_type": match_type, "action_type": exp_func}
+        if "uid" in agent_args and "uid" in exp_args:
+            uids = str(agent_args["uid"]), str(exp_args["uid"])
+            found = find_candidates(_columns.text("candidates", task_id), uids)
+            agent, expected = found.get(uids[0]), found.get(uids[1])
+            result["grounding_iou"] = None
+            if agent and expected and agent["bbox"] and expected["bbox"]:
+                box_rows.append(result)
+                agent_boxes.append(agent["bbox"])
+                expected_boxes.append(expected["bbox"])
+        if exp_func in TEXT_ARGS and agent_func == exp_func:
+            text_rows.append(result)
+            hypotheses.append(action_text(agent_func, agent_args))
+            references.append(action_text(exp_func, exp_args))
+        results.append(result)
+
+    # IoU and chrF of the whole chunk in one vectorized call each
+    if box_rows:
+        for result, iou in zip(box_rows, bbox_iou(agent_boxes, expected_boxes)):
+            result["grounding_iou"] = round(float(iou), 4)
+    if text_rows:
+        for result, similarity in zip(text_rows, chrf(hypotheses, references)):
+            result["text_similarity"] = round(float(similarity), 4)
+    return results
+
+
+def summarize(results):
+    stats = RunningStats()
+    for result in results:
+        stats.add(result)
+    return stats.summary()
+
+
+def score_file(predictions_path, split="validation", workers=None, out_path=None):
+    path = _split_path(split)
+    open_columns(path, INDEX_DIR)  # build the store once, before the workers map it
+
+    with open(predictions_path, "r", encoding="utf-8") as f:
+        predictions = [_load_prediction(line) for line in f if line.strip()]
+    chunks = [predictions[i:i + CHUNK_SIZE] for i in range(0, len(predictions), CHUNK_SIZE)]
+
+    start = time.perf_counter()
+    results = []
+    with multiprocessing.Pool(workers or os.cpu_count() or 1, initializer=_init_worker,
+                              initargs=(path, INDEX_DIR)) as pool:
+        for chunk in pool.imap(_score_chunk, chunks):
+            results.extend(chunk)
+    elapsed = time.perf_counter() - start
+
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as out:
+            for result in results:
+                out.write(json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    report = summarize(results)
+    report["split"] = split
+    report["seconds"] = round(elapsed, 3)
+    report["predictions_per_sec"] = round(len(results) / elapsed) if elapsed else 0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score WebLINX predictions offline")
+    parser.add_argument("predictions", help='JSONL of {"task_id": int, "agent_action": str}')
+    parser.add_argument("--split", default="validation")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default=None, help="per-prediction JSONL output")
+    args = parser.parse_args()
+
+    print(json.dumps(score_file(args.predictions, args.split, args.workers, args.out), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,114 +2,188 @@
 """
 WebLINX Green Agent Toolset
 Fixed Logic & Debugging
+- expected actions are parsed once per split (from the columnar store, weblinx_columns.py),
+  agent actions go through a bounded LRU parse cache (weblinx_actions.py)
+- candidates are parsed once per task into uid-indexed records (weblinx_candidates.py);
+  get_weblinx_task(task_id, top_k, fields) can send only the first k, projected
+- splits are read through a seekable block-gzip copy (weblinx_index.py): reset only loads
+  the block index, get_weblinx_task decompresses the one block holding the task
+- evaluations also report grounding_iou (bbox IoU of the agent's vs the expected element) and
+  text_similarity (chrF of say / text_input text), vectorized in weblinx_metrics.py; the
+  pass/fail score itself is unchanged
+- sample_weblinx_tasks(n, strata, seed) draws distinct, stratified, reproducible task ids
+  from groups built once per split (weblinx_sampler.py), instead of the LLM picking ids
+- run_weblinx_episode(white_agent_url, demo) streams a whole conversation turn by turn
+  (weblinx_episodes.py): after the first turn only the history / utterance deltas and the
+  candidates not sent before go to the white agent
+- statistics are running aggregates (weblinx_stats.py) and only the latest
+  WEBLINX_HISTORY_SIZE results stay in memory; with WEBLINX_RESULTS_LOG every result is
+  also appended to a compact log that aggregate_weblinx_results_log re-aggregates
 """
 
 import agentbeats as ab
 import json
-import re
-import ast
 import os
+import time
+import collections
+import random
+import uuid
+
+# vendored copy of <repo>/green_common (this directory is the Cloud Run deploy unit)
+from green_common.metrics import LatencyMetrics
+
+from weblinx_index import BlockGzipStore
+from weblinx_columns import open_columns
+from weblinx_candidates import CandidateTable
+from weblinx_actions import TEXT_ARGS, action_text, to_parsed_action, parse_agent_action, score_action
+from weblinx_metrics import chrf, grounding_iou
+from weblinx_sampler import TaskSampler
+from weblinx_episodes import EpisodeIndex, EpisodeStream
+from weblinx_stats import ResultLog, RunningStats, aggregate_log
 
 # Global variables
 weblinx_data = None
 current_task = None
-task_history = []
+current_split = None
+# only the latest results are kept in memory, the aggregates live in `stats`
+HISTORY_SIZE = int(os.getenv("WEBLINX_HISTORY_SIZE", "100"))
+task_history = collections.deque(maxlen=HISTORY_SIZE)
+stats = RunningStats()
+# every evaluation is also appended to this log (off when empty), tagged with the run id
+RESULTS_LOG = os.getenv("WEBLINX_RESULTS_LOG", "")
+results_log = ResultLog(RESULTS_LOG) if RESULTS_LOG else None
+run_id = None  # set by reset_weblinx_env
+expected_actions = None  # task_id -> ParsedAction of the loaded split
+sampler = None  # TaskSampler of the loaded split
+episode_index = None  # EpisodeIndex (demo -> task ids in turn order) of the loaded split
 
 DATASET_DIR = os.getenv(
     "WEBLINX_DATA_PATH",
     r"D:\Agentbeats\weblinx_scenario\green_agent\weblinx_data"
 )
+# where the .bgz copies and their indexes go (defaults to next to the dataset)
+INDEX_DIR = os.getenv("WEBLINX_INDEX_DIR") or None
+_stores = {}  # split path -> BlockGzipStore, opened once per process
+_expected_actions = {}  # split path -> [ParsedAction], parsed once per process
+_samplers = {}  # split path -> TaskSampler, grouped once per process
+_episode_indexes = {}  # split path -> EpisodeIndex, grouped once per process
+CANDIDATE_CACHE_SIZE = 256
+_candidate_tables = collections.OrderedDict()  # (split path, task_id) -> CandidateTable
 
 
-def _ast_node_to_value(node):
-    if isinstance(node, ast.Constant): return node.value
-    if isinstance(node, ast.Str): return node.s
-    if isinstance(node, ast.Num): return node.n
-    if isinstance(node, ast.NameConstant): return node.value
-    if isinstance(node, ast.Name):
-        if node.id in ("True", "False", "None"): return eval(node.id)
-        return node.id
-    if isinstance(node, ast.List): return [_ast_node_to_value(e) for e in node.elts]
-    if isinstance(node, ast.Tuple): return tuple(_ast_node_to_value(e) for e in node.elts)
-    if isinstance(node, ast.Dict):
-        return {_ast_node_to_value(k): _ast_node_to_value(v) for k, v in zip(node.keys, node.values)}
-    try: return ast.unparse(node)
-    except: return repr(node)
-
-def parse_weblinx_action(action_str: str):
-    """Robust parsing of WebLINX actions."""
-    if not action_str: return None, {}
-    
-    # 1. 基础清洗
-    action_str = str(action_str).strip()
-    # 2. 关键：移除转义符，防止 \" 导致解析失败
-    action_str = action_str.replace('\\"', '"').replace("\\'", "'")
+def _candidate_table(task):
+    """The task's parsed candidates, from a small LRU so a task is parsed only once."""
+    key = (current_split, task["task_id"])
+    table = _candidate_tables.get(key)
+    if table is None:
+        table = _candidate_tables[key] = CandidateTable(task.get("candidates"))
+        if len(_candidate_tables) > CANDIDATE_CACHE_SIZE:
+            _candidate_tables.popitem(last=False)
+    else:
+        _candidate_tables.move_to_end(key)
+    return table
 
-    # 3. 正则提取函数名和参数部分
-    match = re.match(r'^([a-zA-Z_][a-zA-Z0-9_]*)\((.*)\)$', action_str, re.DOTALL)
-    if not match: return None, {}
 
-    func_name = match.group(1).strip().lower()
-    args_str = match.group(2).strip()
+# ============ latency metrics ============
+# Fixed-bucket histograms per (scenario, task, phase), see green_common.metrics; served on
+# GREEN_AGENT_METRICS_PORT by main.py. WebLINX tasks are dataset rows, so the "task" label is
+# the expected action type (click, say, ...) to keep the label set small.
+# Phases: parse, match, metrics, record, serialize, total.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+latency_metrics = LatencyMetrics("weblinx", LATENCY_BUCKETS)
 
-    if not args_str: return func_name, {}
 
-    try:
-        # 4. 利用 AST 安全解析参数
-        tree = ast.parse(f"dummy({args_str})", mode="eval")
-        call_node = tree.body
-        if isinstance(call_node, ast.Expression): call_node = call_node.body
-        
-        kwargs = {}
-        for kw in call_node.keywords:
-            kwargs[kw.arg] = _ast_node_to_value(kw.value)
-        return func_name, kwargs
-    except:
-        # 解析失败降级处理
-        print(f"⚠️ AST Parse failed for: {args_str}")
-        return func_name, {"raw": args_str}
+def _record_timings(task, phases):
+    latency_metrics.observe(task, phases)
+
 
 @ab.tool
 def reset_weblinx_env(split: str = "validation") -> str:
-    global weblinx_data, task_history
+    global weblinx_data, task_history, expected_actions, current_split, sampler, episode_index, stats, run_id
     path = f"{DATASET_DIR}/valid.json.gz" if split in ["validation", "valid"] else f"{DATASET_DIR}/train.json.gz"
     
     try:
-        import gzip, json
-        print(f"📂 Loading WebLINX from {path}")
-        tasks = []
-        with gzip.open(path, "rt", encoding="utf-8") as f:
-            for line in f:
-                if line.strip(): tasks.append(json.loads(line))
-        
-        weblinx_data = tasks
-        task_history = []
-        print(f"✅ Loaded {len(tasks)} tasks.")
-        return json.dumps({"success": True, "total_tasks": len(tasks)})
+        if path not in _stores:
+            print(f"📂 Loading WebLINX from {path}")
+            _stores[path] = BlockGzipStore(path, INDEX_DIR)
+        if path not in _expected_actions:
+            # only the action column is read, not the whole rows
+            columns = open_columns(path, INDEX_DIR)
+            _expected_actions[path] = [to_parsed_action(columns.text("action", row)) for row in range(len(columns))]
+        if path not in _samplers:
+            # action type / demo / turn groups, from the int32 columns only
+            _samplers[path] = TaskSampler(open_columns(path, INDEX_DIR))
+        if path not in _episode_indexes:
+            _episode_indexes[path] = EpisodeIndex(open_columns(path, INDEX_DIR))
+
+        weblinx_data = _stores[path]
+        current_split = path
+        expected_actions = _expected_actions[path]
+        sampler = _samplers[path]
+        episode_index = _episode_indexes[path]
+        task_history = collections.deque(maxlen=HISTORY_SIZE)
+        stats = RunningStats()
+        run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        print(f"✅ Loaded {len(weblinx_data)} tasks.")
+        return json.dumps({"success": True, "total_tasks": len(weblinx_data), "run_id": run_id})
     except Exception as e:
         return json.dumps({"success": False, "error": str(e)})
 
 @ab.tool
-def get_weblinx_task(task_id: int = 0) -> str:
-    global weblinx_data, current_task
-    if not weblinx_data or task_id >= len(weblinx_data):
-        return json.dumps({"error": "Invalid task_id or dataset not loaded"})
-    
+def sample_weblinx_tasks(n: int = 5, strata: str = "action_type", seed: int = -1, allocation: str = "balanced") -> str:
+    """
+    n distinct task ids for get_weblinx_task, stratified by "action_type", "demo", "turn"
+    or a combination ("action_type,turn"). allocation "balanced" spreads n evenly over the
+    strata, "proportional" follows their sizes. seed < 0 draws a seed; it is returned so
+    the same sample can be drawn again.
+    """
+    if sampler is None:
+        return json.dumps({"error": "Dataset not loaded"})
+    if seed < 0:
+        seed = random.SystemRandom().randrange(2 ** 31)
+    try:
+        picks = sampler.sample(n, strata, seed, allocation)
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    return json.dumps({
+        "task_ids": [task_id for task_id, _ in picks],
+        "strata": [label for _, label in picks],
+        "seed": seed,
+        "allocation": allocation,
+    }, ensure_ascii=False, separators=(",", ":"))
+
+def _set_current_task(task_id):
+    """Make task_id the task evaluate_white_agent_action scores against."""
+    global current_task
     current_task = weblinx_data[task_id]
     current_task["task_id"] = task_id
-    
+    current_task["expected"] = expected_actions[task_id]
+    return current_task
+
+@ab.tool
+def get_weblinx_task(task_id: int = 0, top_k: int = 0, fields: str = "") -> str:
+    """
+    top_k / fields: send the candidates as structured records, only the first top_k
+    (the dataset ranks them) and only the comma separated fields (uid, tag, xpath, text,
+    bbox, attributes, children). Without them the raw candidates string is sent.
+    """
+    if not weblinx_data or not 0 <= task_id < len(weblinx_data):
+        return json.dumps({"error": "Invalid task_id or dataset not loaded"})
+
+    _set_current_task(task_id)
+    candidates = current_task.get("candidates")
+    if top_k or fields:
+        candidates = _candidate_table(current_task).payload(top_k, fields)
+
     return json.dumps({
         "task_id": task_id,
         "utterances": current_task.get("utterances"),
         "viewport": current_task.get("viewport"),
-        "candidates": current_task.get("candidates"),
+        "candidates": candidates,
+        "num_candidates": len(_candidate_table(current_task)),
         "action_history": current_task.get("action_history"),
         "expected_action": current_task.get("action")
-    }, indent=2, ensure_ascii=False)
-
-def clean_val(v):
-    """Normalize values for comparison."""
-    return str(v).strip().replace('\\"', '"')
+    }, ensure_ascii=False, separators=(",", ":"))
 
 @ab.tool
 async def evaluate_white_agent_action(agent_action: str) -> str:
@@ -117,11 +191,13 @@ async def evaluate_white_agent_action(agent_action: str) -> str:
     global current_task, task_history
     if not current_task: return json.dumps({"error": "No active task"})
 
-    expected_action_str = current_task.get("expected_action", "")
-    
-    # 解析
-    agent_func, agent_args = parse_weblinx_action(agent_action)
-    exp_func, exp_args = parse_weblinx_action(expected_action_str)
+    tool_start = time.perf_counter()
+    expected_action_str = current_task.get("action", "")
+
+    # 解析 (expected: pre-parsed at reset, agent: LRU cached)
+    agent_func, agent_args = parse_agent_action(agent_action)
+    exp_func, exp_args = current_task["expected"]
+    phases = {"parse": time.perf_counter() - tool_start}
 
     # --- 🔍 强力调试日志 (会在终端显示) ---
     print(f"\n--- EVALUATION DEBUG Task {current_task['task_id']} ---")
@@ -130,59 +206,9 @@ async def evaluate_white_agent_action(agent_action: str) -> str:
     print(f"Exp   Parsed: Func={exp_func}, Args={exp_args}")
     # ----------------------------------------
 
-    success = False
-    score = 0.0
-    match_type = "mismatch"
-
-    if not agent_func:
-        match_type = "parse_error"
-    elif agent_func != exp_func:
-        match_type = f"wrong_action_type ({agent_func} vs {exp_func})"
-    else:
-        # 1. CLICK / HOVER / SUBMIT
-        if agent_func in ["click", "hover", "submit"]:
-            a_uid = clean_val(agent_args.get("uid"))
-            e_uid = clean_val(exp_args.get("uid"))
-            if a_uid == e_uid:
-                success = True
-                score = 1.0
-                match_type = "exact_match"
-            else:
-                match_type = f"wrong_element (Got {a_uid}, Exp {e_uid})"
-        
-        # 2. TEXTINPUT
-        elif agent_func == "textinput":
-            if clean_val(agent_args.get("uid")) == clean_val(exp_args.get("uid")):
-                if clean_val(agent_args.get("text")) == clean_val(exp_args.get("text")):
-                    success = True
-                    score = 1.0
-                    match_type = "exact_match"
-                else:
-                    score = 0.5
-                    match_type = "wrong_text_content"
-            else:
-                match_type = "wrong_element"
-        
-        # 3. SAY
-        elif agent_func == "say":
-            # 兼容 utterance 和 text 字段
-            msg1 = clean_val(agent_args.get("utterance") or agent_args.get("text"))
-            msg2 = clean_val(exp_args.get("utterance") or exp_args.get("text"))
-            # 忽略空格对比
-            if "".join(msg1.split()) == "".join(msg2.split()):
-                success = True
-                score = 1.0
-                match_type = "exact_match"
-            else:
-                score = 0.5
-                match_type = "message_mismatch"
-        
-        # 4. 其他情况 (Fallback)
-        else:
-            if agent_args == exp_args:
-                success = True
-                score = 1.0
-                match_type = "exact_match"
+    match_start = time.perf_counter()
+    success, score, match_type = score_action(agent_func, agent_args, exp_func, exp_args)
+    phases["match"] = time.perf_counter() - match_start
 
     result = {
         "task_id": current_task["task_id"],
@@ -190,21 +216,140 @@ async def evaluate_white_agent_action(agent_action: str) -> str:
         "actual": agent_action,
         "success": success,
         "score": score,
-        "match_type": match_type
+        "match_type": match_type,
+        "action_type": exp_func
     }
+    metrics_start = time.perf_counter()
+    if "uid" in agent_args:
+        # O(1) lookup in the task's uid index
+        table = _candidate_table(current_task)
+        result["uid_in_candidates"] = agent_args["uid"] in table
+        if "uid" in exp_args:
+            iou = grounding_iou(table, str(agent_args["uid"]), str(exp_args["uid"]))
+            result["grounding_iou"] = None if iou is None else round(iou, 4)
+    if exp_func in TEXT_ARGS and agent_func == exp_func:
+        similarity = chrf([action_text(agent_func, agent_args)], [action_text(exp_func, exp_args)])[0]
+        result["text_similarity"] = round(float(similarity), 4)
+    phases["metrics"] = time.perf_counter() - metrics_start
+
+    record_start = time.perf_counter()
     task_history.append(result)
+    stats.add(result)
+    if results_log:
+        results_log.append(run_id, result)
+    phases["record"] = time.perf_counter() - record_start
     
     print(f"Result: {match_type}, Score: {score}") # 终端确认
-    return json.dumps({"success": True, "evaluation": result}, ensure_ascii=False)
+    serialize_start = time.perf_counter()
+    payload = json.dumps({"success": True, "evaluation": result}, ensure_ascii=False)
+    phases["serialize"] = time.perf_counter() - serialize_start
+    phases["total"] = time.perf_counter() - tool_start
+    _record_timings(exp_func or "unknown", phases)
+    return payload
+
+@ab.tool
+def list_weblinx_episodes(offset: int = 0, limit: int = 20) -> str:
+    """Demos of the loaded split (for run_weblinx_episode) with their number of turns."""
+    if episode_index is None:
+        return json.dumps({"error": "Dataset not loaded"})
+    demos = [d for d in episode_index.demos if d is not None][offset:offset + limit]
+    return json.dumps({
+        "total_episodes": len(episode_index),
+        "episodes": [{"demo": d, "num_turns": episode_index.num_turns(d)} for d in demos],
+    }, ensure_ascii=False, separators=(",", ":"))
+
+
+def _extract_action(response):
+    """The text after "ACTION:" (the whole response if it has none)."""
+    response = str(response or "")
+    return response.split("ACTION:", 1)[1].strip() if "ACTION:" in response else response.strip()
+
+
+@ab.tool
+async def run_weblinx_episode(white_agent_url: str, demo: str, top_k: int = 0, fields: str = "",
+                              max_turns: int = 0) -> str:
+    """
+    Play one demo's turns to the white agent in turn order and evaluate every answer. The
+    first turn is sent in full; later turns only carry action_history_delta /
+    utterances_delta (what was added since the previous turn), new_candidates (elements
+    not sent before) and candidate_uids (all current ones, ranked). top_k / fields as in
+    get_weblinx_task, max_turns > 0 stops early.
+    """
+    if episode_index is None:
+        return json.dumps({"error": "Dataset not loaded"})
+    if demo not in episode_index:
+        return json.dumps({"error": f"Unknown demo {demo!r}"})
+
+    run_start = time.perf_counter()
+    task_ids = episode_index.task_ids(demo)
+    if max_turns > 0:
+        task_ids = task_ids[:max_turns]
+    stream = EpisodeStream(demo, task_ids)
+    turns, payload_chars, full_payload_chars = [], 0, 0
+    for task_id in task_ids:
+        task = _set_current_task(task_id)
+        table = _candidate_table(task)
+        payload = json.dumps(stream.payload(task_id, task, table, top_k, fields),
+                             ensure_ascii=False, separators=(",", ":"))
+        payload_chars += len(payload)
+        full_payload_chars += len(json.dumps({
+            "task_id": task_id, "utterances": task.get("utterances"), "viewport": task.get("viewport"),
+            "candidates": table.payload(top_k, fields), "action_history": task.get("action_history"),
+        }, ensure_ascii=False, separators=(",", ":")))
+
+        if stream.position == 1:
+            intro = ("Here is a multi-turn WebLINX conversation, sent one turn at a time. "
+                     "Answer every turn ONLY with a WebLINX action string.")
+        else:
+            intro = ("Next turn of the same conversation. action_history_delta / utterances_delta only hold "
+                     "what was added since the previous turn, new_candidates only the elements not sent before; "
+                     "candidate_uids lists all current candidates. Answer ONLY with a WebLINX action string.")
+        try:
+            response = await ab.send_message_to_agent(white_agent_url, f"{intro} Turn JSON: {payload}")
+            evaluation = json.loads(await evaluate_white_agent_action(_extract_action(response)))["evaluation"]
+        except Exception as e:
+            turns.append({"task_id": task_id, "turn": task.get("turn"), "success": False, "score": 0.0,
+                          "match_type": "error", "error": f"{type(e).__name__}: {e}"})
+            continue
+        turns.append({"task_id": task_id, "turn": task.get("turn"), "success": evaluation["success"],
+                      "score": evaluation["score"], "match_type": evaluation["match_type"]})
+
+    return json.dumps({
+        "demo": demo,
+        "turns": len(turns),
+        "success_rate": round(sum(t["success"] for t in turns) / len(turns), 4) if turns else 0.0,
+        "average_score": round(sum(t["score"] for t in turns) / len(turns), 4) if turns else 0.0,
+        "payload_chars": payload_chars,
+        "full_payload_chars": full_payload_chars,
+        "wall_time": round(time.perf_counter() - run_start, 4),
+        "turn_results": turns,
+    }, ensure_ascii=False)
 
 @ab.tool
 async def get_weblinx_statistics() -> str:
-    global task_history
-    if not task_history: return json.dumps({"message": "No data"})
-    
-    success_count = sum(1 for t in task_history if t["success"])
+    """Running aggregates of this run (O(1), not a rescan) plus the latest results."""
+    if not stats.total: return json.dumps({"message": "No data"})
+
     return json.dumps({
-        "total": len(task_history),
-        "success_rate": round(success_count / len(task_history), 2),
+        "run_id": run_id,
+        **stats.summary(),
         "summary": [f"T{t['task_id']}: {t['match_type']}" for t in task_history]
-    }, ensure_ascii=False)
\ No newline at end of file
+    }, ensure_ascii=False)
+
+
+@ab.tool
+def aggregate_weblinx_results_log(run: str = "") -> str:
+    """Re-aggregate the on-disk results log (WEBLINX_RESULTS_LOG), one run or all of them."""
+    if not results_log or not os.path.exists(results_log.path):
+        return json.dumps({"error": "No results log (set WEBLINX_RESULTS_LOG)"})
+    return json.dumps({"run_id": run or None, **aggregate_log(results_log.path, run or None).summary()},
+                      ensure_ascii=False)
+
+
+@ab.tool
+async def get_latency_metrics(format: str = "json") -> str:
+    """Per action type / phase latency histograms ("json" summary or "prometheus" text).
+    Also served on GREEN_AGENT_METRICS_PORT (/metrics, /metrics.json) by main.py when that is set."""
+    if format == "prometheus":
+        return latency_metrics.prometheus()
+    return json.dumps(latency_metrics.json())
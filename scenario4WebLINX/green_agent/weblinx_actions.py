@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+WebLINX action strings: `name(key="value", key=number, ...)`
+- parse_weblinx_action(action_str): (func, kwargs) as written, (None, {}) if not a call,
+  {"raw": args} when the arguments cannot be parsed
+- the arguments go through a single-pass tokenizer for the WebLINX grammar (keyword
+  arguments whose values are strings, numbers, True/False/None or bare names); anything
+  outside it falls back to the ast-based parser, which defines the expected results
+  (see tests/test_action_parser.py and bench_action_parser.py)
+- score_action(): the evaluator's match rules, shared by the green agent tools and the
+  offline scorer (score_predictions.py); action_text(): the free text of a say / text_input
+  action, read like score_action reads it, for their chrF text_similarity
+- ParsedAction: typed, normalized form used by the evaluator (canonical lower-case name,
+  every argument passed through clean_val); expected actions are converted once per split,
+  agent actions through the bounded LRU of parse_agent_action
+"""
+
+import ast
+import collections
+import functools
+import keyword
+import os
+import re
+
+AGENT_PARSE_CACHE_SIZE = int(os.getenv("WEBLINX_PARSE_CACHE_SIZE", "4096"))
+
+# alternative spellings of the same action
+ACTION_ALIASES = {"textinput": "text_input"}
+
+ParsedAction = collections.namedtuple("ParsedAction", ["func", "args"])
+ParsedAction.__doc__ = "func: canonical action name or None, args: normalized kwargs (shared, do not mutate)"
+
+
+def _ast_node_to_value(node):
+    # ast.Constant covers str / numbers / True / False / None (ast.Str, ast.Num are gone in 3.12+)
+    if isinstance(node, ast.Constant): return node.value
+    if isinstance(node, ast.Name):
+        if node.id in ("True", "False", "None"): return eval(node.id)
+        return node.id
+    if isinstance(node, ast.List): return [_ast_node_to_value(e) for e in node.elts]
+    if isinstance(node, ast.Tuple): return tuple(_ast_node_to_value(e) for e in node.elts)
+    if isinstance(node, ast.Dict):
+        return {_ast_node_to_value(k): _ast_node_to_value(v) for k, v in zip(node.keys, node.values)}
+    try: return ast.unparse(node)
+    except: return repr(node)
+
+_ACTION_CALL = re.compile(r'^([a-zA-Z_][a-zA-Z0-9_]*)\((.*)\)$', re.DOTALL)
+
+
+def _split_action(action_str):
+    """Steps 1-3 shared by both parsers: (func_name, args_str), or None if not a call."""
+    # 1. 基础清洗
+    action_str = str(action_str).strip()
+    # 2. 关键：移除转义符，防止 \" 导致解析失败
+    action_str = action_str.replace('\\"', '"').replace("\\'", "'")
+
+    # 3. 正则提取函数名和参数部分
+    match = _ACTION_CALL.match(action_str)
+    if not match: return None
+
+    return match.group(1).strip().lower(), match.group(2).strip()
+
+
+def _parse_args_ast(args_str):
+    try:
+        # 4. 利用 AST 安全解析参数
+        tree = ast.parse(f"dummy({args_str})", mode="eval")
+        call_node = tree.body
+        if isinstance(call_node, ast.Expression): call_node = call_node.body
+
+        kwargs = {}
+        for kw in call_node.keywords:
+            kwargs[kw.arg] = _ast_node_to_value(kw.value)
+        return kwargs
+    except:
+        # 解析失败降级处理
+        print(f"⚠️ AST Parse failed for: {args_str}")
+        return {"raw": args_str}
+
+
+def parse_weblinx_action_ast(action_str: str):
+    """Reference parser: the arguments go through the full Python parser."""
+    if not action_str: return None, {}
+    split = _split_action(action_str)
+    if split is None: return None, {}
+    func_name, args_str = split
+    if not args_str: return func_name, {}
+    return func_name, _parse_args_ast(args_str)
+
+
+# ============ single-pass tokenizer ============
+# kwargs := kwarg ("," kwarg)* [","]      kwarg := NAME "=" value
+# value  := STRING+ | NUMBER | NAME      (adjacent strings concatenate, as in Python)
+# One compiled pattern consumes a whole kwarg, so the scan runs in the regex engine.
+# _parse_args_fast returns None for anything it does not handle exactly like Python would;
+# the caller then uses the ast parser.
+_WS = r"[ \t\n\r\f]*"
+# unrolled "normal* (escape normal*)*" loops: runs of plain characters are matched in one step
+_STRING = r""""[^"\\\r\n]*(?:\\.[^"\\\r\n]*)*"|'[^'\\\r\n]*(?:\\.[^'\\\r\n]*)*'"""
+_KWARG = re.compile(
+    rf"{_WS}([A-Za-z_][A-Za-z0-9_]*){_WS}={_WS}"
+    rf"(?:((?:{_STRING})(?:{_WS}(?:{_STRING}))*)"  # 2: one or more string literals
+    rf"|((?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)"  # 3: number
+    rf"|([A-Za-z_][A-Za-z0-9_]*))"  # 4: name
+    rf"{_WS}(,|$)",
+    re.DOTALL,
+)
+_STRING_PART = re.compile(_STRING, re.DOTALL)
+_TRAILING_WS = re.compile(rf"{_WS}$")
+_INT = re.compile(r"0+|[1-9][0-9]*")
+_NAME_CONSTANTS = {"True": True, "False": False, "None": None}
+_NON_LATIN1_ESCAPE = re.compile(r"\\[^\x00-\xff]")
+
+
+def _decode_string_body(body):
+    """Python escape sequences of a (non-raw) string literal body, None if invalid."""
+    if "\\" not in body:
+        return body
+    if _NON_LATIN1_ESCAPE.search(body):
+        return None  # unknown escape of a non latin-1 char, backslashreplace would mangle it
+    try:
+        # unicode_escape works on latin-1 bytes: encode everything else as \uXXXX first
+        return body.encode("latin-1", "backslashreplace").decode("unicode_escape")
+    except (UnicodeDecodeError, UnicodeEncodeError):
+        return None
+
+
+def _parse_args_fast(args_str):
+    if '"""' in args_str or "'''" in args_str:
+        return None  # triple-quoted strings: not in the grammar
+    kwargs = {}
+    position = 0
+    end = len(args_str)
+    while position < end:
+        match = _KWARG.match(args_str, position)
+        if match is None:
+            # only a trailing comma may be left
+            return kwargs if kwargs and _TRAILING_WS.match(args_str, position) else None
+        name, strings, number, identifier, separator = match.groups()
+        if keyword.iskeyword(name) or name in kwargs:
+            return None  # SyntaxError in Python (-> raw), let the ast path produce it
+
+        if strings is not None:
+            parts = []
+            for literal in _STRING_PART.findall(strings):
+                body = _decode_string_body(literal[1:-1])
+                if body is None:
+                    return None
+                parts.append(body)
+            value = "".join(parts)
+        elif number is not None:
+            if _INT.fullmatch(number):
+                value = int(number)
+            elif "." in number or "e" in number or "E" in number:
+                value = float(number)
+            else:
+                return None  # leading zeros (007) are a SyntaxError
+        elif identifier in _NAME_CONSTANTS:
+            value = _NAME_CONSTANTS[identifier]
+        elif keyword.iskeyword(identifier):
+            return None
+        else:
+            value = identifier
+
+        kwargs[name] = value
+        position = match.end()
+        if not separator:
+            return kwargs
+    return kwargs
+
+
+def parse_weblinx_action(action_str: str):
+    """Robust parsing of WebLINX actions."""
+    if not action_str: return None, {}
+    split = _split_action(action_str)
+    if split is None: return None, {}
+    func_name, args_str = split
+    if not args_str: return func_name, {}
+
+    kwargs = _parse_args_fast(args_str)
+    if kwargs is None:
+        kwargs = _parse_args_ast(args_str)
+    return func_name, kwargs
+
+
+def clean_val(v):
+    """Normalize values for comparison."""
+    return str(v).strip().replace('\\"', '"')
+
+
+def to_parsed_action(action_str):
+    """parse_weblinx_action + canonical name + clean_val on every argument."""
+    func, args = parse_weblinx_action(action_str)
+    if func is not None:
+        func = ACTION_ALIASES.get(func, func)
+    return ParsedAction(func, {key: clean_val(value) for key, value in args.items()})
+
+
+@functools.lru_cache(maxsize=AGENT_PARSE_CACHE_SIZE)
+def parse_agent_action(action_str):
+    """to_parsed_action behind a bounded LRU: white agents often repeat the same string."""
+    return to_parsed_action(action_str)
+
+
+# action type -> arguments holding its free text, the first non-empty one is used (say(text=...) works too)
+TEXT_ARGS = {"say": ("utterance", "text"), "text_input": ("text",)}
+
+
+def action_text(func, args):
+    """Free text of a say / text_input action, None for the other action types."""
+    keys = TEXT_ARGS.get(func)
+    if keys is None: return None
+    values = [args.get(key) for key in keys]
+    return next((value for value in values if value), values[-1])
+
+
+def score_action(agent_func, agent_args, exp_func, exp_args):
+    """Match rules of the evaluator: (success, score, match_type) of an agent action
+    against the expected one (click/hover/submit: uid, text_input: uid + text,
+    say: whitespace-insensitive message, others: all arguments)."""
+    success = False
+    score = 0.0
+    match_type = "mismatch"
+
+    if not agent_func:
+        match_type = "parse_error"
+    elif agent_func != exp_func:
+        match_type = f"wrong_action_type ({agent_func} vs {exp_func})"
+    else:
+        # 1. CLICK / HOVER / SUBMIT
+        if agent_func in ["click", "hover", "submit"]:
+            a_uid = clean_val(agent_args.get("uid"))
+            e_uid = clean_val(exp_args.get("uid"))
+            if a_uid == e_uid:
+                success = True
+                score = 1.0
+                match_type = "exact_match"
+            else:
+                match_type = f"wrong_element (Got {a_uid}, Exp {e_uid})"
+
+        # 2. TEXTINPUT
+        elif agent_func == "text_input":
+            if clean_val(agent_args.get("uid")) == clean_val(exp_args.get("uid")):
+                if clean_val(agent_args.get("text")) == clean_val(exp_args.get("text")):
+                    success = True
+                    score = 1.0
+                    match_type = "exact_match"
+                else:
+                    score = 0.5
+                    match_type = "wrong_text_content"
+            else:
+                match_type = "wrong_element"
+
+        # 3. SAY
+        elif agent_func == "say":
+            # 兼容 utterance 和 text 字段
+            msg1 = clean_val(agent_args.get("utterance") or agent_args.get("text"))
+            msg2 = clean_val(exp_args.get("utterance") or exp_args.get("text"))
+            # 忽略空格对比
+            if "".join(msg1.split()) == "".join(msg2.split()):
+                success = True
+                score = 1.0
+                match_type = "exact_match"
+            else:
+                score = 0.5
+                match_type = "message_mismatch"
+
+        # 4. 其他情况 (Fallback)
+        else:
+            if agent_args == exp_args:
+                success = True
+                score = 1.0
+                match_type = "exact_match"
+
+    return success, score, match_type
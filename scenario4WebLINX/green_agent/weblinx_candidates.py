@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Structured WebLINX candidates
+- a task's `candidates` field is one string with a line per element:
+  `(uid = ...) [[tag]] ... [[xpath]] ... [[text]] ... [[bbox]] x=.. y=.. width=.. height=.. [[attributes]] ... [[children]] ...`
+- parse_candidates() turns it into records {uid, tag, xpath, text, bbox, attributes, children}
+  (bbox as [x, y, width, height] floats, missing sections as "" / None)
+- CandidateTable keeps them in dataset order (the candidate ranking) with a uid -> record
+  index, for O(1) "is this uid a candidate" checks and top-k / field-projected payloads
+- find_candidates() pulls out a few uids' records without parsing the rest
+"""
+
+import re
+
+CANDIDATE_FIELDS = ("uid", "tag", "xpath", "text", "bbox", "attributes", "children")
+
+_RECORD = re.compile(r"^\(uid = ([^)]*)\)(.*)$", re.DOTALL)
+_SECTION = re.compile(r"\s*\[\[(\w+)\]\]\s?")
+_BBOX = re.compile(r"x=(-?[\d.]+)\s+y=(-?[\d.]+)\s+width=(-?[\d.]+)\s+height=(-?[\d.]+)")
+
+
+def _parse_bbox(value):
+    match = _BBOX.search(value)
+    if not match:
+        return None
+    try:
+        return [float(v) for v in match.groups()]
+    except ValueError:
+        return None
+
+
+def parse_candidates(candidates):
+    """Records of a `candidates` string, in order (empty for None / "")."""
+    records = []
+    for line in (candidates or "").split("\n"):
+        match = _RECORD.match(line.strip())
+        if not match:
+            continue
+        record = {"uid": match.group(1).strip(), "tag": "", "xpath": "", "text": "",
+                  "bbox": None, "attributes": "", "children": ""}
+        parts = _SECTION.split(match.group(2))
+        # parts: ["", name, value, name, value, ...]
+        for name, value in zip(parts[1::2], parts[2::2]):
+            if name == "bbox":
+                record["bbox"] = _parse_bbox(value)
+            else:
+                record[name] = value.strip()
+        records.append(record)
+    return records
+
+
+def find_candidates(candidates, uids):
+    """uid -> record for just the given uids, parsing only their lines (no full table)."""
+    found = {}
+    candidates = candidates or ""
+    for uid in uids:
+        start = candidates.find(f"(uid = {uid})")
+        if start < 0 or uid in found:
+            continue
+        end = candidates.find("\n", start)
+        records = parse_candidates(candidates[start:end if end >= 0 else None])
+        if records:
+            found[uid] = records[0]
+    return found
+
+
+class CandidateTable:
+    """Parsed candidates of one task with a uid index."""
+
+    __slots__ = ("records", "by_uid")
+
+    def __init__(self, candidates):
+        self.records = parse_candidates(candidates)
+        self.by_uid = {}
+        for record in self.records:
+            self.by_uid.setdefault(record["uid"], record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, uid):
+        return uid in self.by_uid
+
+    def get(self, uid):
+        return self.by_uid.get(uid)
+
+    def payload(self, top_k=0, fields=""):
+        """The first top_k candidates (all if 0), reduced to the comma separated fields."""
+        records = self.records[:top_k] if top_k and top_k > 0 else self.records
+        keep = [f.strip() for f in fields.split(",") if f.strip() in CANDIDATE_FIELDS] if fields else []
+        if not keep:
+            return records
+        return [{k: r[k] for k in keep} for r in records]
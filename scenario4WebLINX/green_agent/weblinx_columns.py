@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar, memory-mapped copy of a WebLINX split, for filtering and statistics
+- small fields are NumPy columns: demo / action_type / action_uid are dictionary-encoded
+  (int32 codes into a list of values, -1 when missing; action types use their canonical
+  name), turn and utterance_len are int32
+- large text fields (action, action_history, utterances, candidates, clean_html, viewport) are
+  one UTF-8 blob per field plus an int64 offsets column (rows + 1 entries) and a null mask
+- every file is opened with mmap, so worker processes share the same pages and opening
+  the store costs nothing until a column is touched
+- the store lives in <split>.columns/ and is rebuilt when the source file changes; every
+  builder writes its own temporary directory and publishes it with one rename, so processes
+  building at once never see a partial store (the first complete one wins, the others drop theirs)
+
+Usage:
+    python weblinx_columns.py weblinx_data/valid.json.gz
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+
+import numpy as np
+
+from weblinx_actions import ACTION_ALIASES
+
+STORE_VERSION = 2
+DICTIONARY_FIELDS = ("demo", "action_type", "action_uid")
+INT_FIELDS = ("turn", "utterance_len")
+TEXT_FIELDS = ("action", "action_history", "utterances", "candidates", "clean_html", "viewport")
+
+_ACTION_TYPE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*\(")
+_ACTION_UID = re.compile(r"""\buid\s*=\s*["']([^"']*)["']""")
+
+
+def _source_signature(source_path):
+    stat = os.stat(source_path)
+    return {"path": os.path.abspath(source_path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def _store_dir(source_path, out_dir=None):
+    name = os.path.basename(source_path)
+    if name.endswith(".json.gz"):
+        name = name[:-len(".json.gz")]
+    return os.path.join(out_dir or os.path.dirname(source_path), f"{name}.columns")
+
+
+def _canonical_type(name):
+    name = name.lower()
+    return ACTION_ALIASES.get(name, name)
+
+
+def _small_fields(row):
+    action = row.get("action") or ""
+    action_type = _ACTION_TYPE.match(action)
+    uid = _ACTION_UID.search(action)
+    return {
+        "demo": row.get("demo"),
+        "action_type": _canonical_type(action_type.group(1)) if action_type else None,
+        "action_uid": uid.group(1) if uid else None,
+        "turn": int(row.get("turn") or 0),
+        "utterance_len": len(row.get("utterances") or ""),
+    }
+
+
+def _is_fresh(directory, source_path):
+    """The store in directory is complete and built from the current source file."""
+    try:
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return meta.get("version") == STORE_VERSION and meta["source"] == _source_signature(source_path)
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def _publish(tmp_directory, directory, source_path):
+    """Move a complete store into place; a fresh store already there is kept."""
+    while True:
+        try:
+            os.rename(tmp_directory, directory)  # fails if directory exists, never merges
+            return
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+        if _is_fresh(directory, source_path):
+            shutil.rmtree(tmp_directory, ignore_errors=True)  # another builder got there first
+            return
+        # stale store: move it aside in one rename, then delete it where no reader looks
+        stale = f"{directory}.stale-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        try:
+            os.rename(directory, stale)
+        except FileNotFoundError:
+            continue  # another builder moved it first
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def build_columns(source_path, out_dir=None):
+    """Stream a .json.gz split into the columnar layout; returns the store directory."""
+    directory = _store_dir(source_path, out_dir)
+    tmp_directory = f"{directory}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp_directory)
+    try:
+        _write_columns(source_path, tmp_directory)
+        _publish(tmp_directory, directory, source_path)
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+    return directory
+
+
+def _write_columns(source_path, tmp_directory):
+    """Every column file of source_path, written into tmp_directory."""
+
+    dictionaries = {field: {} for field in DICTIONARY_FIELDS}
+    codes = {field: [] for field in DICTIONARY_FIELDS}
+    ints = {field: [] for field in INT_FIELDS}
+    offsets = {field: [0] for field in TEXT_FIELDS}
+    nulls = {field: [] for field in TEXT_FIELDS}
+    blobs = {field: open(os.path.join(tmp_directory, f"{field}.bin"), "wb") for field in TEXT_FIELDS}
+
+    try:
+        with gzip.open(source_path, "rt", encoding="utf-8") as source:
+            for line in source:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                small = _small_fields(row)
+                for field in DICTIONARY_FIELDS:
+                    value = small[field]
+                    codes[field].append(-1 if value is None else dictionaries[field].setdefault(value, len(dictionaries[field])))
+                for field in INT_FIELDS:
+                    ints[field].append(small[field])
+                for field in TEXT_FIELDS:
+                    value = row.get(field)
+                    data = b"" if value is None else str(value).encode("utf-8")
+                    blobs[field].write(data)
+                    offsets[field].append(offsets[field][-1] + len(data))
+                    nulls[field].append(value is None)
+    finally:
+        for blob in blobs.values():
+            blob.close()
+
+    for field in DICTIONARY_FIELDS:
+        np.save(os.path.join(tmp_directory, f"{field}.npy"), np.asarray(codes[field], dtype=np.int32))
+    for field in INT_FIELDS:
+        np.save(os.path.join(tmp_directory, f"{field}.npy"), np.asarray(ints[field], dtype=np.int32))
+    for field in TEXT_FIELDS:
+        np.save(os.path.join(tmp_directory, f"{field}.off.npy"), np.asarray(offsets[field], dtype=np.int64))
+        np.save(os.path.join(tmp_directory, f"{field}.null.npy"), np.asarray(nulls[field], dtype=np.bool_))
+
+    meta = {
+        "version": STORE_VERSION,
+        "source": _source_signature(source_path),
+        "rows": len(ints["turn"]),
+        "dictionaries": {field: list(values) for field, values in dictionaries.items()},
+    }
+    with open(os.path.join(tmp_directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, separators=(",", ":"))
+
+
+class WeblinxColumns:
+    """Read-only, memory-mapped columns of one WebLINX split."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self.dictionaries = self.meta["dictionaries"]
+        self._lookup = {field: {value: code for code, value in enumerate(values)}
+                        for field, values in self.dictionaries.items()}
+        self._arrays = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _array(self, name):
+        array = self._arrays.get(name)
+        if array is None:
+            path = os.path.join(self.directory, name)
+            if name.endswith(".bin"):
+                # np.memmap refuses empty files
+                array = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, np.uint8)
+            else:
+                array = np.load(path, mmap_mode="r")
+            self._arrays[name] = array
+        return array
+
+    def column(self, field):
+        """int32 column: dictionary codes for demo / action_type / action_uid, values otherwise."""
+        return self._array(f"{field}.npy")
+
+    def code(self, field, value):
+        """Dictionary code of a value (-2 if the split never contains it, so it matches nothing)."""
+        return self._lookup[field].get(value, -2)
+
+    def decode(self, field, codes):
+        values = self.dictionaries[field]
+        return [values[c] if c >= 0 else None for c in np.asarray(codes).tolist()]
+
+    def mask(self, demo=None, action_type=None, turn_min=None, turn_max=None):
+        """Boolean row mask; every argument is optional, demo / action_type may also be lists."""
+        mask = np.ones(self.rows, dtype=bool)
+        for field, wanted in (("demo", demo), ("action_type", action_type)):
+            if wanted is None:
+                continue
+            wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+            if field == "action_type":
+                wanted = [_canonical_type(w) for w in wanted]
+            mask &= np.isin(self.column(field), [self.code(field, w) for w in wanted])
+        if turn_min is not None:
+            mask &= self.column("turn") >= turn_min
+        if turn_max is not None:
+            mask &= self.column("turn") <= turn_max
+        return mask
+
+    def filter(self, **conditions):
+        """Row numbers (task ids) matching mask(**conditions)."""
+        return np.flatnonzero(self.mask(**conditions))
+
+    def counts(self, field, rows=None):
+        """value -> number of rows, over all rows or the given row numbers."""
+        codes = self.column(field) if rows is None else self.column(field)[rows]
+        codes = np.asarray(codes)
+        present = codes[codes >= 0]
+        counts = np.bincount(present, minlength=len(self.dictionaries[field]))
+        result = {self.dictionaries[field][c]: int(n) for c, n in enumerate(counts) if n}
+        if len(present) < len(codes):
+            result[None] = int(len(codes) - len(present))
+        return result
+
+    def text(self, field, row):
+        """One large field of one row, decoded from its blob (None where the source had null)."""
+        if self._array(f"{field}.null.npy")[row]:
+            return None
+        offsets = self._array(f"{field}.off.npy")
+        return bytes(self._array(f"{field}.bin")[offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def text_lengths(self, field):
+        """Byte length of a large field for every row, without touching the blob."""
+        return np.diff(self._array(f"{field}.off.npy"))
+
+    def row(self, row):
+        """A row in the original record layout (as in the .json.gz split)."""
+        record = {"demo": self.dictionaries["demo"][int(self.column("demo")[row])],
+                  "turn": int(self.column("turn")[row])}
+        for field in TEXT_FIELDS:
+            record[field] = self.text(field, row)
+        return record
+
+
+def open_columns(source_path, out_dir=None):
+    """The columnar store of source_path, (re)built if missing or stale."""
+    directory = _store_dir(source_path, out_dir)
+    if _is_fresh(directory, source_path):
+        return WeblinxColumns(directory)
+    print(f"🗂️ Building columnar store for {source_path}")
+    return WeblinxColumns(build_columns(source_path, out_dir))
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        columns = WeblinxColumns(build_columns(path))
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        by_type = columns.counts("action_type")
+        long_turns = len(columns.filter(action_type=["click", "text_input"], turn_min=5))
+        scanned = time.perf_counter() - start
+        print(json.dumps({"path": path, "rows": len(columns), "demos": len(columns.dictionaries["demo"]),
+                          "action_types": by_type, "click_or_text_input_from_turn_5": long_turns,
+                          "build_seconds": round(built, 3), "query_seconds": round(scanned, 6)},
+                         indent=2, default=str))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-turn WebLINX episodes
+- EpisodeIndex(columns) groups the rows of a split by demo, in turn order, once: one
+  lexsorted row array plus a start offset per demo (demo -> turn offsets), read from the
+  demo / turn int32 columns of the columnar store
+- text_delta(previous, current): what a turn's action_history / utterances add to the
+  previous turn's. Both fields are sliding windows (old entries fall off the front), so
+  the new part is what follows the longest overlap of current with the tail of previous
+- EpisodeStream(...) turns consecutive turns of one demo into payloads: the first turn
+  in full, later turns only with the history / utterance deltas and the candidates whose
+  uid was not sent before (plus the ranked uid list), so a conversation costs O(turns)
+  payload instead of O(turns^2)
+"""
+
+import numpy as np
+
+# prev must be covered up to these trailing characters / turn markers for current to count as
+# its continuation (the history closes every turn with "</s><s>[INST]")
+_TAIL_CHARS = " ;\n\t"
+_TAIL_MARKERS = ("</s><s>[INST]",)
+_ANCHOR = 8  # overlap candidates are the places where current's first characters occur in prev
+
+
+class EpisodeIndex:
+    """Task ids of every demo of one split, in turn order."""
+
+    def __init__(self, columns):
+        demo = np.asarray(columns.column("demo"))
+        turn = np.asarray(columns.column("turn"))
+        self.rows = np.lexsort((turn, demo)).astype(np.int64)
+        codes, starts = np.unique(demo[self.rows], return_index=True)
+        ends = np.append(starts[1:], len(self.rows))
+        values = columns.dictionaries["demo"]
+        self.demos = [values[c] if c >= 0 else None for c in codes.tolist()]
+        self.offsets = {name: (int(s), int(e)) for name, s, e in zip(self.demos, starts, ends) if name is not None}
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, demo):
+        return demo in self.offsets
+
+    def task_ids(self, demo):
+        start, end = self.offsets[demo]
+        return self.rows[start:end].tolist()
+
+    def num_turns(self, demo):
+        start, end = self.offsets[demo]
+        return end - start
+
+
+def _is_tail(text):
+    for marker in _TAIL_MARKERS:
+        text = text.replace(marker, "")
+    return not text.strip(_TAIL_CHARS)
+
+
+def text_delta(previous, current):
+    """(new text, reset): the part of current after its overlap with previous' tail.
+    reset is True when current does not continue previous, new text is then all of current."""
+    previous, current = previous or "", current or ""
+    if not previous:
+        return current, False
+    anchor = current[:_ANCHOR]
+    best = 0
+    position = previous.find(anchor) if anchor else -1
+    while position >= 0:
+        # common prefix of previous[position:] and current
+        length = min(len(previous) - position, len(current))
+        if previous[position:position + length] != current[:length]:
+            low, high = len(anchor), length
+            while low < high:
+                middle = (low + high + 1) // 2
+                if previous[position:position + middle] == current[:middle]:
+                    low = middle
+                else:
+                    high = middle - 1
+            length = low
+        if length > best and _is_tail(previous[position + length:]):
+            best = length
+        position = previous.find(anchor, position + 1)
+    if best == 0 and not (_is_tail(previous) and _is_tail(current)):
+        return current, True
+    return current[best:], False
+
+
+class EpisodeStream:
+    """Per-turn payloads of one demo: the first in full, the rest as deltas."""
+
+    def __init__(self, demo, task_ids):
+        self.demo = demo
+        self.task_ids = task_ids
+        self.position = 0
+        self._history = None
+        self._utterances = None
+        self._viewport = None
+        self._sent_uids = set()
+
+    def __len__(self):
+        return len(self.task_ids)
+
+    def payload(self, task_id, task, table, top_k=0, fields=""):
+        """Payload of the next turn (task: the row, table: its CandidateTable)."""
+        history, utterances = task.get("action_history") or "", task.get("utterances") or ""
+        records = table.payload(top_k, fields)
+        ranked = table.records[:top_k] if top_k and top_k > 0 else table.records
+        payload = {"task_id": task_id, "demo": self.demo, "turn": task.get("turn"),
+                   "turn_index": self.position, "num_turns": len(self.task_ids)}
+
+        if self.position == 0:
+            payload.update({"utterances": utterances, "viewport": task.get("viewport"),
+                            "candidates": records, "action_history": history})
+        else:
+            history_delta, history_reset = text_delta(self._history, history)
+            utterances_delta, utterances_reset = text_delta(self._utterances, utterances)
+            payload["action_history_delta"] = history_delta
+            payload["utterances_delta"] = utterances_delta
+            if history_reset or utterances_reset:
+                payload["reset"] = [name for name, reset in (("action_history", history_reset),
+                                                             ("utterances", utterances_reset)) if reset]
+            if task.get("viewport") != self._viewport:
+                payload["viewport"] = task.get("viewport")
+            payload["new_candidates"] = [r for r, full in zip(records, ranked) if full["uid"] not in self._sent_uids]
+            payload["candidate_uids"] = [r["uid"] for r in ranked]
+
+        self._history, self._utterances, self._viewport = history, utterances, task.get("viewport")
+        self._sent_uids.update(r["uid"] for r in ranked)
+        self.position += 1
+        return payload
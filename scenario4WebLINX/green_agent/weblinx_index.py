@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Seekable block-gzip copy of a WebLINX split, for random access to single tasks
+- <split>.bgz: the JSONL rows of <split>.json.gz re-compressed as independent gzip members of
+  BLOCK_ROWS rows each (still a valid gzip file, `zcat valid.bgz` gives back the original lines)
+- <split>.bgz.idx.json: offset / length of every member, built once and rebuilt when the
+  source file changes (size or mtime). Both files are written under per-process temporary
+  names and renamed into place; the output is deterministic, so processes building at once
+  publish identical bytes
+- BlockGzipStore: len(store) and store[row] decompress only the member that holds the row,
+  so loading a split is O(1) and memory does not depend on the size of the split
+
+Usage:
+    python weblinx_index.py weblinx_data/valid.json.gz
+"""
+
+import collections
+import gzip
+import json
+import os
+import sys
+import threading
+import uuid
+import zlib
+
+INDEX_VERSION = 1
+BLOCK_ROWS = int(os.getenv("WEBLINX_BLOCK_ROWS", "16"))
+BLOCK_CACHE_SIZE = 4  # decompressed blocks kept per store
+
+
+def _source_signature(source_path):
+    stat = os.stat(source_path)
+    return {"path": os.path.abspath(source_path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def _paths(source_path, index_dir=None):
+    name = os.path.basename(source_path)
+    if name.endswith(".json.gz"):
+        name = name[:-len(".json.gz")]
+    base = os.path.join(index_dir or os.path.dirname(source_path), name)
+    return f"{base}.bgz", f"{base}.bgz.idx.json"
+
+
+def build_index(source_path, index_dir=None, block_rows=BLOCK_ROWS):
+    """Re-compress a .json.gz split into gzip members of block_rows rows and write the index."""
+    data_path, index_path = _paths(source_path, index_dir)
+    os.makedirs(os.path.dirname(data_path) or ".", exist_ok=True)
+    suffix = f".tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    try:
+        index = _write_index(source_path, data_path + suffix, index_path + suffix, block_rows)
+        os.replace(data_path + suffix, data_path)
+        os.replace(index_path + suffix, index_path)
+    except BaseException:
+        for path in (data_path + suffix, index_path + suffix):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return index
+
+
+def _write_index(source_path, tmp_data_path, tmp_index_path, block_rows):
+    """The block-gzip copy and its index, written to the given temporary paths."""
+    blocks = []
+    rows = 0
+    offset = 0
+
+    with gzip.open(source_path, "rb") as source, open(tmp_data_path, "wb") as out:
+        pending = []
+
+        def flush():
+            nonlocal offset
+            member = gzip.compress(b"".join(pending), compresslevel=6, mtime=0)
+            out.write(member)
+            blocks.append([offset, len(member)])
+            offset += len(member)
+            pending.clear()
+
+        for line in source:
+            if not line.strip():
+                continue
+            pending.append(line if line.endswith(b"\n") else line + b"\n")
+            rows += 1
+            if len(pending) == block_rows:
+                flush()
+        if pending:
+            flush()
+
+    index = {"version": INDEX_VERSION, "source": _source_signature(source_path),
+             "block_rows": block_rows, "rows": rows, "blocks": blocks}
+    with open(tmp_index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    return index
+
+
+def _consistent(index, data_path):
+    """The index covers every row and exactly the bytes of the data file."""
+    blocks = index["blocks"]
+    if len(blocks) != -(-index["rows"] // index["block_rows"]):
+        return False
+    end = blocks[-1][0] + blocks[-1][1] if blocks else 0
+    return os.path.getsize(data_path) == end
+
+
+def load_index(source_path, index_dir=None):
+    """The index of source_path, (re)built if it is missing, stale, corrupted or partial."""
+    data_path, index_path = _paths(source_path, index_dir)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if (index.get("version") == INDEX_VERSION and os.path.exists(data_path)
+                and index["source"] == _source_signature(source_path) and _consistent(index, data_path)):
+            return index
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        pass
+    print(f"🗂️ Building block index for {source_path}")
+    return build_index(source_path, index_dir)
+
+
+class BlockGzipStore:
+    """Read-only sequence of WebLINX rows backed by a block-gzip file."""
+
+    def __init__(self, source_path, index_dir=None):
+        self.index = load_index(source_path, index_dir)
+        self.data_path = _paths(source_path, index_dir)[0]
+        self.block_rows = self.index["block_rows"]
+        self._file = open(self.data_path, "rb")
+        self._lock = threading.Lock()
+        self._blocks = collections.OrderedDict()  # block number -> list of raw lines
+
+    def __len__(self):
+        return self.index["rows"]
+
+    def _block(self, number):
+        lines = self._blocks.get(number)
+        if lines is not None:
+            self._blocks.move_to_end(number)
+            return lines
+        offset, length = self.index["blocks"][number]
+        self._file.seek(offset)
+        lines = zlib.decompress(self._file.read(length), 31).splitlines()
+        self._blocks[number] = lines
+        if len(self._blocks) > BLOCK_CACHE_SIZE:
+            self._blocks.popitem(last=False)
+        return lines
+
+    def raw(self, row):
+        """The JSON line of a row, without decoding it."""
+        if not 0 <= row < len(self):
+            raise IndexError(f"row {row} out of range (0..{len(self) - 1})")
+        with self._lock:
+            return self._block(row // self.block_rows)[row % self.block_rows]
+
+    def __getitem__(self, row):
+        return json.loads(self.raw(row))
+
+    def close(self):
+        self._file.close()
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        index = build_index(path)
+        print(f"✅ {path}: {index['rows']} rows in {len(index['blocks'])} blocks")
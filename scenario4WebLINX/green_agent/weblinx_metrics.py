@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized WebLINX metrics
+- bbox_iou(a, b): intersection-over-union of [x, y, width, height] boxes, row-wise for two
+  (N, 4) arrays or one box against all candidates (broadcasting), NaN boxes score 0
+- chrf(hypotheses, references): chrF-style character n-gram F-score (orders 1..6, beta 2,
+  whitespace ignored) for a whole batch of pairs at once: all texts are concatenated, n-grams
+  get a rolling uint64 hash (mixed with their pair index) and are counted / matched with
+  sort + searchsorted, no per-text or per-n-gram Python loop
+- grounding_iou(table, agent_uid, expected_uid): IoU of two candidates of a CandidateTable
+
+Usage (benchmark):
+    python weblinx_metrics.py weblinx_data/valid.json.gz
+"""
+
+import numpy as np
+
+CHRF_ORDER = 6
+CHRF_BETA = 2.0
+
+# polynomial hash of an n-gram of code points (sum of code * BASE**i), wrapping in uint64
+_HASH_BASE = np.uint64(0x100000001B3)
+_HASH_POWERS = np.array([int(_HASH_BASE) ** i % 2 ** 64 for i in range(CHRF_ORDER)], dtype=np.uint64)
+_PAIR_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def bbox_iou(a, b):
+    """IoU of [x, y, width, height] boxes; a and b broadcast against each other, e.g. (4,) vs (N, 4)."""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    ax1, ay1, aw, ah = np.moveaxis(a, -1, 0)
+    bx1, by1, bw, bh = np.moveaxis(b, -1, 0)
+    inter_w = np.clip(np.minimum(ax1 + aw, bx1 + bw) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay1 + ah, by1 + bh) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = np.clip(aw, 0, None) * np.clip(ah, 0, None) + np.clip(bw, 0, None) * np.clip(bh, 0, None) - inter
+    with np.errstate(invalid="ignore", divide="ignore"):
+        iou = np.where(union > 0, inter / union, 0.0)
+    return np.nan_to_num(iou, nan=0.0)
+
+
+def candidate_boxes(table):
+    """(N, 4) float array of a CandidateTable's bboxes (NaN where a candidate has none)."""
+    boxes = np.full((len(table.records), 4), np.nan)
+    for row, record in enumerate(table.records):
+        if record["bbox"]:
+            boxes[row] = record["bbox"]
+    return boxes
+
+
+def grounding_iou(table, agent_uid, expected_uid):
+    """IoU between the boxes of two candidates, None if either uid has no box.
+    table: a CandidateTable or any uid -> record mapping (e.g. from find_candidates)."""
+    agent, expected = table.get(agent_uid), table.get(expected_uid)
+    if not agent or not expected or not agent["bbox"] or not expected["bbox"]:
+        return None
+    return float(bbox_iou(agent["bbox"], expected["bbox"]))
+
+
+def _encode(texts):
+    """All texts as one uint64 array of code points, with the text index of every position."""
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    lengths = np.array([len(t) for t in texts], dtype=np.int64)
+    owners = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    ends = np.repeat(np.cumsum(lengths), lengths)  # end offset of the text each position belongs to
+    return codes, owners, ends
+
+
+def _ngram_keys(encoded, order):
+    """For n = 1..order: uint64 keys (n-gram hash mixed with its text index) and text indexes.
+    The hash of an n-gram is rolled from the (n-1)-gram starting at the same position."""
+    codes, owners, ends = encoded
+    hashes = np.zeros(len(codes), dtype=np.uint64)
+    starts = np.arange(len(codes))
+    pair_mix = owners.astype(np.uint64) * _PAIR_MIX
+    for n in range(1, order + 1):
+        count = len(codes) - n + 1
+        if count <= 0:
+            yield np.zeros(0, np.uint64), np.zeros(0, np.int64)
+            continue
+        hashes = hashes[:count] + codes[n - 1:] * _HASH_POWERS[n - 1]
+        inside = starts[:count] + n <= ends[:count]  # drop n-grams that run into the next text
+        yield (hashes ^ pair_mix[:count])[inside], owners[:count][inside]
+
+
+def _matches_per_pair(hyp, ref, pairs):
+    """Clipped n-gram matches per pair: sum over shared n-grams of min(hyp count, ref count)."""
+    hyp_keys, hyp_pairs = hyp
+    ref_keys, _ = ref
+    hyp_unique, hyp_first, hyp_counts = np.unique(hyp_keys, return_index=True, return_counts=True)
+    ref_unique, ref_counts = np.unique(ref_keys, return_counts=True)
+    if not len(hyp_unique) or not len(ref_unique):
+        return np.zeros(pairs)
+    # position of every hyp n-gram in the sorted ref n-grams, shared where the key is equal
+    position = np.minimum(np.searchsorted(ref_unique, hyp_unique), len(ref_unique) - 1)
+    shared = ref_unique[position] == hyp_unique
+    clipped = np.minimum(hyp_counts[shared], ref_counts[position[shared]])
+    return np.bincount(hyp_pairs[hyp_first[shared]], weights=clipped, minlength=pairs)
+
+
+def chrf(hypotheses, references, order=CHRF_ORDER, beta=CHRF_BETA):
+    """chrF in [0, 1] for each (hypothesis, reference) pair."""
+    hypotheses = ["".join(str(h or "").split()) for h in hypotheses]
+    references = ["".join(str(r or "").split()) for r in references]
+    pairs = len(hypotheses)
+    hyp_lengths = np.array([len(h) for h in hypotheses], dtype=np.float64)
+    ref_lengths = np.array([len(r) for r in references], dtype=np.float64)
+
+    hyp_encoded, ref_encoded = _encode(hypotheses), _encode(references)
+    precision_sum = np.zeros(pairs)
+    recall_sum = np.zeros(pairs)
+    orders = np.zeros(pairs)
+    hyp_ngrams, ref_ngrams = _ngram_keys(hyp_encoded, order), _ngram_keys(ref_encoded, order)
+    for n in range(1, order + 1):
+        hyp_keys, ref_keys = next(hyp_ngrams), next(ref_ngrams)
+        hyp_total = np.clip(hyp_lengths - n + 1, 0, None)
+        ref_total = np.clip(ref_lengths - n + 1, 0, None)
+        present = (hyp_total > 0) & (ref_total > 0)
+        if not present.any():
+            break
+        matches = _matches_per_pair(hyp_keys, ref_keys, pairs)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            precision_sum += np.where(present, matches / hyp_total, 0.0)
+            recall_sum += np.where(present, matches / ref_total, 0.0)
+        orders += present
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = np.where(orders > 0, precision_sum / orders, 0.0)
+        recall = np.where(orders > 0, recall_sum / orders, 0.0)
+        beta2 = beta ** 2
+        score = np.where(precision + recall > 0,
+                         (1 + beta2) * precision * recall / (beta2 * precision + recall), 0.0)
+    # two empty strings are identical
+    return np.where((hyp_lengths == 0) & (ref_lengths == 0), 1.0, score)
+
+
+if __name__ == "__main__":
+    import gzip
+    import json
+    import sys
+    import time
+
+    from weblinx_actions import to_parsed_action
+    from weblinx_candidates import CandidateTable
+
+    with gzip.open(sys.argv[1], "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    tables = [CandidateTable(row["candidates"]) for row in rows]
+    texts = [a.args.get("utterance") or a.args.get("text") or "" for a in map(to_parsed_action, (r["action"] for r in rows))]
+    texts = [t for t in texts if t]
+    shuffled = texts[1:] + texts[:1]
+
+    start = time.perf_counter()
+    for table in tables:
+        boxes = candidate_boxes(table)
+        if len(boxes):
+            bbox_iou(boxes[0], boxes)
+    iou_one_vs_all = (time.perf_counter() - start) / len(tables)
+
+    start = time.perf_counter()
+    for hypothesis, reference in zip(shuffled, texts):
+        chrf([hypothesis], [reference])
+    chrf_single = (time.perf_counter() - start) / len(texts)
+
+    start = time.perf_counter()
+    chrf(shuffled, texts)
+    chrf_batch = (time.perf_counter() - start) / len(texts)
+
+    print(json.dumps({
+        "tasks": len(tables),
+        "text_pairs": len(texts),
+        "iou_one_vs_all_candidates_us": round(iou_one_vs_all * 1e6, 1),
+        "chrf_single_pair_us": round(chrf_single * 1e6, 1),
+        "chrf_batched_per_pair_us": round(chrf_batch * 1e6, 1),
+    }, indent=2))
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Stratified WebLINX task sampling
+- TaskSampler(columns) groups the rows of a split by expected action type, demo and turn
+  once, from the columnar store (weblinx_columns.py): per stratum a sorted row array plus
+  group start offsets, so a group is a slice and building it reads three int32 columns
+- sample(n, strata, seed, allocation) draws n distinct task ids (the row numbers that
+  get_weblinx_task takes) in O(groups + n): "balanced" spreads n evenly over the groups
+  (groups that run out hand their share on), "proportional" follows the group sizes
+- strata can be combined ("action_type,turn"); a combination is grouped on first use
+- the same (n, strata, seed, allocation) gives the same ids on every run and platform
+  (random.Random, not NumPy's global state)
+"""
+
+import random
+
+import numpy as np
+
+STRATA_FIELDS = ("action_type", "demo", "turn")
+ALLOCATIONS = ("balanced", "proportional")
+
+
+class _Groups:
+    """Rows sorted by a key, with the start offset and label of every key value."""
+
+    __slots__ = ("rows", "starts", "sizes", "labels")
+
+    def __init__(self, keys, labels_of):
+        keys = np.asarray(keys)
+        self.rows = np.argsort(keys, kind="stable").astype(np.int64)
+        unique, starts = np.unique(keys[self.rows], return_index=True)
+        self.starts = starts.tolist()
+        self.sizes = np.diff(np.append(starts, len(keys))).tolist()
+        self.labels = labels_of(unique)
+
+    def pick(self, group, offsets):
+        start = self.starts[group]
+        return [int(self.rows[start + offset]) for offset in offsets]
+
+
+class TaskSampler:
+    """Stratified sampling of task ids of one split."""
+
+    def __init__(self, columns):
+        self.total = len(columns)
+        self._columns = columns
+        self._groups = {}
+        for field in STRATA_FIELDS:
+            self._groups[(field,)] = self._build((field,))
+
+    def _label(self, field, value):
+        if field == "turn":
+            return str(value)
+        value = self._columns.dictionaries[field][value] if value >= 0 else None
+        return "unknown" if value is None else value
+
+    def _build(self, fields):
+        if len(fields) == 1:
+            field = fields[0]
+            return _Groups(self._columns.column(field), lambda keys: [self._label(field, int(k)) for k in keys])
+        # mixed radix key over the fields' codes (+1 so a missing code -1 stays non negative)
+        codes = [np.asarray(self._columns.column(f), dtype=np.int64) + 1 for f in fields]
+        radixes = [int(c.max()) + 1 if len(c) else 1 for c in codes]
+        key = np.zeros(self.total, dtype=np.int64)
+        for column, radix in zip(codes, radixes):
+            key = key * radix + column
+
+        def labels_of(keys):
+            labels = []
+            for k in keys.tolist():
+                parts = []
+                for field, radix in zip(reversed(fields), reversed(radixes)):
+                    k, code = divmod(k, radix)
+                    parts.append(self._label(field, code - 1))
+                labels.append("/".join(reversed(parts)))
+            return labels
+
+        return _Groups(key, labels_of)
+
+    def groups(self, strata="action_type"):
+        """The _Groups of a strata spec like "action_type" or "action_type,turn"."""
+        fields = tuple(f.strip() for f in strata.split(",") if f.strip())
+        unknown = [f for f in fields if f not in STRATA_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown strata {unknown}, expected some of {STRATA_FIELDS}")
+        if not fields:
+            raise ValueError("strata is empty")
+        groups = self._groups.get(fields)
+        if groups is None:
+            groups = self._groups[fields] = self._build(fields)
+        return groups
+
+    @staticmethod
+    def _balanced(sizes, n, rng):
+        """Even shares in a seeded group order; what full groups cannot take moves on."""
+        take = [0] * len(sizes)
+        active = rng.sample(range(len(sizes)), len(sizes))
+        remaining = n
+        while remaining and active:
+            share, extra = divmod(remaining, len(active))
+            still_open = []
+            for position, group in enumerate(active):
+                want = share + (1 if position < extra else 0)
+                got = min(want, sizes[group] - take[group])
+                take[group] += got
+                remaining -= got
+                if take[group] < sizes[group]:
+                    still_open.append(group)
+            active = still_open
+        return take
+
+    @staticmethod
+    def _proportional(sizes, n, rng):
+        """Largest remainder shares of the group sizes, ties broken in a seeded order."""
+        total = sum(sizes)
+        quotas = [n * size / total for size in sizes]
+        take = [int(q) for q in quotas]
+        order = rng.sample(range(len(sizes)), len(sizes))
+        order.sort(key=lambda g: quotas[g] - take[g], reverse=True)
+        for group in order[:n - sum(take)]:
+            take[group] += 1
+        return take
+
+    def sample(self, n, strata="action_type", seed=0, allocation="balanced"):
+        """n distinct task ids, as [(task_id, stratum label)] in a seeded random order."""
+        if allocation not in ALLOCATIONS:
+            raise ValueError(f"unknown allocation {allocation!r}, expected one of {ALLOCATIONS}")
+        groups = self.groups(strata)
+        n = max(0, min(int(n), self.total))
+        rng = random.Random(seed)
+        take = (self._balanced if allocation == "balanced" else self._proportional)(groups.sizes, n, rng)
+
+        picks = []
+        for group, k in enumerate(take):
+            if k:
+                # random.sample over a range is O(k), not O(group size)
+                offsets = rng.sample(range(groups.sizes[group]), k)
+                label = groups.labels[group]
+                picks.extend((task_id, label) for task_id in groups.pick(group, offsets))
+        rng.shuffle(picks)
+        return picks
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental WebLINX statistics and an append-only results log
+- RunningStats.add(result) updates running aggregates in O(1): totals, success and score
+  sums overall and per action type, counts per match type (the part before " (Got ...)"),
+  a fixed-bucket score histogram and grounding_iou / text_similarity sums; summary() costs
+  O(action types + match types), independent of how many results were added
+- ResultLog appends one compact JSON array per result (LOG_FIELDS order) to a file that is
+  only ever appended to, flushed per line, so a crash loses at most the line being written
+- aggregate_log(path, run) re-aggregates a log into RunningStats in one streaming pass
+
+Usage:
+    python weblinx_stats.py weblinx_results.log [--run RUN_ID]
+"""
+
+import json
+import os
+
+SCORE_BUCKETS = 10  # [0, 0.1), [0.1, 0.2), ..., [0.9, 1.0]
+METRICS = ("grounding_iou", "text_similarity")
+LOG_FIELDS = ("run", "task_id", "action_type", "success", "score", "match_type") + METRICS
+
+
+def match_category(match_type):
+    """"wrong_element (Got a, Exp b)" -> "wrong_element", so the breakdown stays small."""
+    return (match_type or "unknown").split(" (", 1)[0]
+
+
+class RunningStats:
+    """Aggregates of evaluation results, updated one result at a time."""
+
+    def __init__(self):
+        self.total = 0
+        self.success = 0
+        self.score_sum = 0.0
+        self.by_action_type = {}  # action type -> [total, success, score_sum]
+        self.by_match_type = {}  # match category -> count
+        self.score_histogram = [0] * SCORE_BUCKETS
+        self.metric_sums = {metric: [0.0, 0] for metric in METRICS}
+
+    def add(self, result):
+        success, score = bool(result["success"]), float(result["score"])
+        self.total += 1
+        self.success += success
+        self.score_sum += score
+        bucket = self.by_action_type.setdefault(result.get("action_type") or "unknown", [0, 0, 0.0])
+        bucket[0] += 1
+        bucket[1] += success
+        bucket[2] += score
+        category = match_category(result.get("match_type"))
+        self.by_match_type[category] = self.by_match_type.get(category, 0) + 1
+        self.score_histogram[min(max(int(score * SCORE_BUCKETS), 0), SCORE_BUCKETS - 1)] += 1
+        for metric, sums in self.metric_sums.items():
+            if result.get(metric) is not None:
+                sums[0] += result[metric]
+                sums[1] += 1
+
+    def summary(self):
+        def rates(total, success, score_sum):
+            return {"total": total,
+                    "success_rate": round(success / total, 4) if total else 0.0,
+                    "average_score": round(score_sum / total, 4) if total else 0.0}
+
+        return {**rates(self.total, self.success, self.score_sum),
+                **{f"average_{m}": round(s / n, 4) if n else None for m, (s, n) in self.metric_sums.items()},
+                "score_histogram": list(self.score_histogram),
+                "by_action_type": {t: rates(*b) for t, b in sorted(self.by_action_type.items())},
+                "by_match_type": dict(sorted(self.by_match_type.items()))}
+
+
+class ResultLog:
+    """Append-only, line-per-result log (JSON arrays in LOG_FIELDS order)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def append(self, run, result):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8", buffering=1)  # line buffered
+        row = [run, result.get("task_id"), result.get("action_type"), int(bool(result["success"])),
+               result["score"], match_category(result.get("match_type"))] + [result.get(m) for m in METRICS]
+        self._file.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_log(path, run=None):
+    """Results of a log as dicts (only those of one run if given); a torn last line is skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if run is None or row[0] == run:
+                yield dict(zip(LOG_FIELDS, row))
+
+
+def aggregate_log(path, run=None):
+    stats = RunningStats()
+    for result in read_log(path, run):
+        stats.add(result)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-aggregate a WebLINX results log")
+    parser.add_argument("log")
+    parser.add_argument("--run", default=None, help="only this run id")
+    args = parser.parse_args()
+    print(json.dumps(aggregate_log(args.log, args.run).summary(), indent=2, ensure_ascii=False))
@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+import random
+import re
+import sys
+
+import pytest
+
+GREEN_AGENT_DIR = os.path.join(os.path.dirname(__file__), "..", "green_agent")
+sys.path.insert(0, GREEN_AGENT_DIR)
+
+from weblinx_actions import parse_weblinx_action, parse_weblinx_action_ast, _parse_args_fast, _split_action
+
+DATASET = os.path.join(GREEN_AGENT_DIR, "weblinx_data", "valid.json.gz")
+
+# ============================================================================
+# The tokenizer must give exactly what the ast-based parser gives
+# ============================================================================
+
+# a call with keyword arguments, quoted strings may contain parentheses
+_CALL = re.compile(r'[a-zA-Z_]+\((?:[^()"]|"[^"]*")*\)')
+_MUTATION_CHARS = "\"'\\=,() x0.-\n\t_eE1é”"
+
+
+def _same(action):
+    """Compare with repr so 1, 1.0 and True are told apart."""
+    return repr(parse_weblinx_action(action)) == repr(parse_weblinx_action_ast(action))
+
+
+def _mutate(rng, action):
+    chars = list(action)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randrange(len(chars) + 1)
+        operation = rng.random()
+        if operation < 0.4 or not chars:
+            chars.insert(position, rng.choice(_MUTATION_CHARS))
+        elif operation < 0.8:
+            del chars[min(position, len(chars) - 1)]
+        else:
+            chars[min(position, len(chars) - 1)] = rng.choice(_MUTATION_CHARS)
+    return "".join(chars)
+
+
+@pytest.fixture(scope="module")
+def dataset_actions():
+    if not os.path.exists(DATASET):
+        pytest.skip("WebLINX validation split not available")
+    actions = []
+    with gzip.open(DATASET, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                actions.append(row["action"])
+                actions.extend(_CALL.findall(row["action_history"] or ""))
+    return actions
+
+
+@pytest.mark.parametrize("action", [
+    'click(uid="67e2a5fb-8b1d-41a0")',
+    'text_input(text="biotechnology", uid="67e2a5fb-8b1d-41a0")',
+    'say(speaker="navigator", utterance="Here are some options:\\n\\t1.Biotechnology")',
+    'scroll(x=0, y=400)',
+    'scroll(x=0, y=-400)',
+    'say(utterance="a" \'b\')',
+    'load(url="https://example.com/?q=%20a")',
+    'f(a=1,)', 'f(a=1,,)', 'f(a=007)', 'f(a=007e1)', 'f(a=1.)', 'f(a=.5)', 'f(a=1_000)', 'f(a=0x1f)',
+    'f(a=True, b=None, c=name)', 'f(a=1, a=2)', 'f(from=1)', 'f(a="x\\"y")', 'f(a="bad \\x4")',
+    'f(a=1 b=2)', 'f(a=[1, 2])', 'f(1, a=2)', 'f(a="line\nbreak")', 'f(a = "s" , )', 'f(a=x.y)',
+    'f(a="\\q")', 'f(a="\\”")', 'f(\n a="x"\n)', 'f(a="""x""")', 'f(a=u"x")', 'f(**kw)', 'f()', 'nocall', '',
+])
+def test_handwritten_cases(action):
+    assert _same(action)
+
+
+def test_whole_dataset_matches_ast_parser(dataset_actions, capsys):
+    mismatches = [a for a in dataset_actions if not _same(a)]
+    assert mismatches == []
+
+
+def test_fuzzed_dataset_actions_match_ast_parser(dataset_actions, capsys):
+    rng = random.Random(0)
+    mutated = [_mutate(rng, action) for action in rng.sample(dataset_actions, 2000) for _ in range(5)]
+    mismatches = [a for a in mutated if not _same(a)]
+    assert mismatches == []
+
+
+def test_tokenizer_handles_the_dataset_itself(dataset_actions, capsys):
+    """The fast path must cover the grammar, not only defer to the ast parser."""
+    handled = 0
+    for action in dataset_actions:
+        split = _split_action(action)
+        if split and split[1] and _parse_args_fast(split[1]) is not None:
+            handled += 1
+    assert handled / len(dataset_actions) > 0.95
@@ -0,0 +1,59 @@
+import gzip
+import json
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "green_agent"))
+
+from weblinx_columns import open_columns
+
+ROWS = 40
+
+
+def _write_source(path, action="click"):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for row in range(ROWS):
+            f.write(json.dumps({"demo": f"d{row // 10}", "turn": row % 10, "action": f'{action}(uid="{row}")',
+                                "candidates": "x" * row, "utterances": ""}) + "\n")
+
+
+def _open_and_read(source, directory, barrier, results):
+    barrier.wait()
+    try:
+        columns = open_columns(source, directory)
+        results.put([columns.text("action", row) for row in range(len(columns))])
+    except Exception as e:  # reported to the test, not swallowed by the child
+        results.put(repr(e))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_builders_all_get_a_complete_store(tmp_path):
+    source = str(tmp_path / "valid.json.gz")
+    _write_source(source)
+    context = multiprocessing.get_context("fork")
+    barrier, results = context.Barrier(4), context.Queue()
+    workers = [context.Process(target=_open_and_read, args=(source, str(tmp_path), barrier, results))
+               for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(10)
+
+    expected = [f'click(uid="{row}")' for row in range(ROWS)]
+    assert outcomes == [expected] * 4
+    # one published store, no temporary or stale directories left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["valid.columns", "valid.json.gz"]
+
+
+def test_stale_store_is_replaced(tmp_path):
+    source = str(tmp_path / "valid.json.gz")
+    _write_source(source)
+    assert open_columns(source).text("action", 0) == 'click(uid="0")'
+    _write_source(source, action="say")
+    os.utime(source, (0, 0))  # different mtime even within the same second
+    assert open_columns(source).text("action", 0) == 'say(uid="0")'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["valid.columns", "valid.json.gz"]
@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "green_agent"))
+
+from weblinx_candidates import CandidateTable
+from weblinx_episodes import EpisodeStream, text_delta
+
+# ============================================================================
+# text_delta: sliding-window histories
+# ============================================================================
+
+
+def test_history_window_slides_forward():
+    previous = 'load(url="a")</s><s>[INST] say(speaker="instructor", utterance="go") click(uid="1")</s><s>[INST]'
+    current = 'say(speaker="instructor", utterance="go") click(uid="1") click(uid="2")</s><s>[INST]'
+    assert text_delta(previous, current) == (' click(uid="2")</s><s>[INST]', False)
+
+
+def test_utterances_grow_before_the_closing_semicolon():
+    assert text_delta("[00:05] Hello ;", "[00:05] Hello [00:27] Open the site. ;") == ("[00:27] Open the site. ;", False)
+
+
+def test_unrelated_text_is_a_reset():
+    assert text_delta("[00:05] Hello ;", "[01:00] Something else ;") == ("[01:00] Something else ;", True)
+    assert text_delta("[00:05] Hello ;", "") == ("", True)
+    assert text_delta("", "first turn") == ("first turn", False)
+    assert text_delta("same text ;", "same text ;") == ("", False)
+
+
+# ============================================================================
+# EpisodeStream: full first turn, deltas afterwards
+# ============================================================================
+
+
+def _task(turn, history, utterances, uids):
+    candidates = "\n".join(f"(uid = {uid}) [[tag]] button [[text]] {uid}" for uid in uids)
+    task = {"turn": turn, "action_history": history, "utterances": utterances,
+            "viewport": "746h x 1536w", "candidates": candidates}
+    return task, CandidateTable(candidates)
+
+
+def test_stream_sends_only_new_history_and_candidates():
+    stream = EpisodeStream("demo", [0, 1])
+    first = stream.payload(0, *_task(1, 'click(uid="a")</s><s>[INST]', "[00:01] Hi ;", ["a", "b"]))
+    assert first["action_history"] == 'click(uid="a")</s><s>[INST]'
+    assert [c["uid"] for c in first["candidates"]] == ["a", "b"]
+
+    second = stream.payload(1, *_task(2, 'click(uid="a") click(uid="b")</s><s>[INST]',
+                                      "[00:01] Hi [00:09] Next ;", ["c", "a", "b"]), fields="uid")
+    assert second["action_history_delta"] == ' click(uid="b")</s><s>[INST]'
+    assert second["utterances_delta"] == "[00:09] Next ;"
+    assert second["new_candidates"] == [{"uid": "c"}]
+    assert second["candidate_uids"] == ["c", "a", "b"]
+    assert "viewport" not in second and "reset" not in second and "candidates" not in second
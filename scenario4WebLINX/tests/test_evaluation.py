@@ -0,0 +1,107 @@
+import asyncio
+import gzip
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+GREEN_AGENT_DIR = os.path.join(os.path.dirname(__file__), "..", "green_agent")
+sys.path.insert(0, GREEN_AGENT_DIR)
+
+from weblinx_actions import action_text, score_action, to_parsed_action
+from weblinx_metrics import chrf
+
+DATA_DIR = os.path.join(GREEN_AGENT_DIR, "weblinx_data")
+DATASET = os.path.join(DATA_DIR, "valid.json.gz")
+
+if not os.path.exists(DATASET):
+    pytest.skip("WebLINX validation split not available", allow_module_level=True)
+
+
+def _rows():
+    with gzip.open(DATASET, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+ROWS = _rows()
+
+
+def _first(action_type):
+    return next(i for i, row in enumerate(ROWS) if row["action"].startswith(f"{action_type}("))
+
+
+@pytest.fixture(scope="module")
+def tools(tmp_path_factory):
+    # loaded from its path: other scenarios' green agents have a `tools` module as well
+    spec = importlib.util.spec_from_file_location("weblinx_tools", os.path.join(GREEN_AGENT_DIR, "tools.py"))
+    tools = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tools)
+    tools.DATASET_DIR = DATA_DIR
+    tools.INDEX_DIR = str(tmp_path_factory.mktemp("weblinx_index"))
+    assert json.loads(tools.reset_weblinx_env("validation"))["success"]
+    return tools
+
+
+def _evaluate(tools, task_id, agent_action):
+    tools.get_weblinx_task(task_id)
+    return json.loads(asyncio.run(tools.evaluate_white_agent_action(agent_action)))["evaluation"]
+
+
+# ============================================================================
+# Expected actions come from the rows' `action` key
+# ============================================================================
+
+
+def test_every_expected_action_matches_itself():
+    assert "expected_action" not in ROWS[0]
+    for row in ROWS:
+        expected = to_parsed_action(row["action"])
+        assert expected.func is not None
+        assert score_action(*expected, *expected) == (True, 1.0, "exact_match"), row["action"]
+
+
+def test_evaluator_scores_against_the_row_action(tools):
+    task_id = _first("click")
+    expected = ROWS[task_id]["action"]
+    result = _evaluate(tools, task_id, expected)
+    assert (result["expected"], result["success"], result["match_type"]) == (expected, True, "exact_match")
+    assert _evaluate(tools, task_id, 'click(uid="not-a-candidate")')["match_type"].startswith("wrong_element")
+
+
+# ============================================================================
+# textinput is the same action as text_input
+# ============================================================================
+
+
+def test_textinput_alias_on_real_rows(tools):
+    task_id = _first("text_input")
+    expected = to_parsed_action(ROWS[task_id]["action"])
+    uid, text = expected.args["uid"], expected.args["text"]
+    assert to_parsed_action(f'textinput(uid="{uid}", text="{text}")') == expected
+
+    assert _evaluate(tools, task_id, f'textinput(text="{text}", uid="{uid}")')["match_type"] == "exact_match"
+    wrong_text = _evaluate(tools, task_id, f'textinput(text="{text} and more", uid="{uid}")')
+    assert (wrong_text["score"], wrong_text["match_type"]) == (0.5, "wrong_text_content")
+    assert _evaluate(tools, task_id, f'text_input(text="{text}", uid="other")')["match_type"] == "wrong_element"
+
+
+# ============================================================================
+# chrF reads say(text=...) like score_action does
+# ============================================================================
+
+
+def test_say_text_argument_is_scored_like_utterance():
+    agent, expected = to_parsed_action('say(text="Hello there")'), to_parsed_action('say(utterance="Hello there")')
+    assert score_action(*agent, *expected) == (True, 1.0, "exact_match")
+    assert chrf([action_text(*agent)], [action_text(*expected)])[0] == pytest.approx(1.0)
+    assert action_text(*to_parsed_action('text_input(text="abc", uid="1")')) == "abc"
+    assert action_text(*to_parsed_action('click(uid="1")')) is None
+
+
+def test_evaluator_text_similarity_of_say_text(tools):
+    task_id = _first("say")
+    utterance = to_parsed_action(ROWS[task_id]["action"]).args["utterance"]
+    result = _evaluate(tools, task_id, f"say(text={json.dumps(utterance)})")
+    assert (result["match_type"], result["text_similarity"]) == ("exact_match", 1.0)
@@ -0,0 +1,109 @@
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "green_agent"))
+
+import weblinx_index
+from weblinx_index import BlockGzipStore, build_index, load_index
+
+ROWS = 53  # not a multiple of the block size: the last block is partial
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "valid.json.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for row in range(ROWS):
+            f.write(json.dumps({"demo": f"d{row // 10}", "turn": row % 10, "action": f'click(uid="{row}")',
+                                "utterances": "é" * (row % 7)}, ensure_ascii=False) + "\n")
+            if row == 20:
+                f.write("\n")  # blank lines are not rows
+    return str(path)
+
+
+def _sequential(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_random_access_matches_sequential_read(source, tmp_path):
+    store = BlockGzipStore(source, str(tmp_path / "index"))
+    expected = _sequential(source)
+    assert len(store) == len(expected) == ROWS
+    order = list(range(ROWS))
+    random.Random(0).shuffle(order)
+    assert all(store[row] == expected[row] for row in order)
+    with pytest.raises(IndexError):
+        store[ROWS]
+    store.close()
+    # the block file is itself a valid gzip stream of the same rows
+    assert _sequential(store.data_path) == expected
+
+
+@pytest.mark.parametrize("damage", ["truncated_index", "missing_blocks", "truncated_data", "missing_data"])
+def test_damaged_index_is_rebuilt(source, tmp_path, monkeypatch, damage):
+    index_dir = str(tmp_path / "index")
+    build_index(source, index_dir, block_rows=8)
+    data_path, index_path = weblinx_index._paths(source, index_dir)
+    if damage == "truncated_index":
+        with open(index_path, "r+", encoding="utf-8") as f:
+            f.truncate(len(f.read()) // 2)
+    elif damage == "missing_blocks":
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        index["blocks"] = index["blocks"][:-2]
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+    elif damage == "truncated_data":
+        with open(data_path, "r+b") as f:
+            f.truncate(os.path.getsize(data_path) - 10)
+    else:
+        os.remove(data_path)
+
+    rebuilt = []
+    monkeypatch.setattr(weblinx_index, "build_index",
+                        lambda *args: rebuilt.append(args) or build_index(*args))
+    store = BlockGzipStore(source, index_dir)
+    assert rebuilt and [store[row] for row in range(ROWS)] == _sequential(source)
+    store.close()
+    # and a sound index is reused as is
+    rebuilt.clear()
+    assert load_index(source, index_dir)["rows"] == ROWS and not rebuilt
+
+
+def _build_and_read(source, index_dir, barrier, results):
+    barrier.wait()
+    try:
+        store = BlockGzipStore(source, index_dir)
+        results.put([store[row] for row in range(len(store))])
+        store.close()
+    except Exception as e:  # reported to the test, not swallowed by the child
+        results.put(repr(e))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_builders_leave_one_index(tmp_path):
+    # large enough for the builds to overlap
+    source = str(tmp_path / "valid.json.gz")
+    with gzip.open(source, "wt", encoding="utf-8") as f:
+        for row in range(20000):
+            f.write(json.dumps({"turn": row, "action": f'click(uid="{row}")', "candidates": str(row) * 20}) + "\n")
+    index_dir = tmp_path / "index"
+    context = multiprocessing.get_context("fork")
+    barrier, results = context.Barrier(4), context.Queue()
+    workers = [context.Process(target=_build_and_read, args=(source, str(index_dir), barrier, results))
+               for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(10)
+
+    assert outcomes == [_sequential(source)] * 4
+    assert sorted(p.name for p in index_dir.iterdir()) == ["valid.bgz", "valid.bgz.idx.json"]
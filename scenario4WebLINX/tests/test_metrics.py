@@ -0,0 +1,85 @@
+import os
+import random
+import sys
+from collections import Counter
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "green_agent"))
+
+from weblinx_candidates import CandidateTable, find_candidates
+from weblinx_metrics import bbox_iou, chrf, grounding_iou
+
+# ============================================================================
+# chrF: the vectorized version must give what the textbook definition gives
+# ============================================================================
+
+
+def _chrf_reference(hypothesis, reference, order=6, beta=2.0):
+    hypothesis, reference = "".join(hypothesis.split()), "".join(reference.split())
+    if not hypothesis and not reference:
+        return 1.0
+    precision = recall = 0.0
+    orders = 0
+    for n in range(1, order + 1):
+        hyp = Counter(hypothesis[i:i + n] for i in range(len(hypothesis) - n + 1))
+        ref = Counter(reference[i:i + n] for i in range(len(reference) - n + 1))
+        if not hyp or not ref:
+            continue
+        matches = sum((hyp & ref).values())
+        precision += matches / sum(hyp.values())
+        recall += matches / sum(ref.values())
+        orders += 1
+    if not orders:
+        return 0.0
+    precision, recall = precision / orders, recall / orders
+    if precision + recall == 0:
+        return 0.0
+    return (1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall)
+
+
+def test_chrf_matches_reference_on_random_batch():
+    rng = random.Random(0)
+    words = "the cat sat on a mat 中文 héllo search results 😀 a b".split()
+    hypotheses = [" ".join(rng.choice(words) for _ in range(rng.randint(0, 8))) for _ in range(1000)]
+    references = [" ".join(rng.choice(words) for _ in range(rng.randint(0, 8))) for _ in range(1000)]
+    expected = [_chrf_reference(h, r) for h, r in zip(hypotheses, references)]
+    assert np.allclose(chrf(hypotheses, references), expected, atol=1e-12)
+
+
+@pytest.mark.parametrize("hypothesis, reference, expected", [
+    ("Here it is.", "Here it is.", 1.0),
+    ("", "", 1.0),
+    ("", "abc", 0.0),
+    (None, "abc", 0.0),
+    ("ab", "ba", 0.5),
+])
+def test_chrf_edge_cases(hypothesis, reference, expected):
+    assert chrf([hypothesis], [reference])[0] == pytest.approx(expected)
+
+
+# ============================================================================
+# IoU / grounding
+# ============================================================================
+
+CANDIDATES = "\n".join([
+    "(uid = a) [[tag]] button [[bbox]] x=0 y=0 width=10 height=10 [[attributes]] ",
+    "(uid = b) [[tag]] div [[bbox]] x=5 y=0 width=10 height=10 [[children]] ",
+    "(uid = c) [[tag]] span [[text]] no box",
+])
+
+
+def test_bbox_iou_broadcasts_one_box_against_all():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 10, 10], [20, 20, 5, 5], [np.nan] * 4])
+    assert np.allclose(bbox_iou(boxes[0], boxes), [1.0, 50 / 150, 0.0, 0.0])
+
+
+def test_grounding_iou_from_table_and_from_find_candidates():
+    table = CandidateTable(CANDIDATES)
+    assert grounding_iou(table, "a", "b") == pytest.approx(50 / 150)
+    assert grounding_iou(table, "a", "c") is None
+    assert grounding_iou(table, "a", "missing") is None
+    found = find_candidates(CANDIDATES, ("b", "a"))
+    assert found == {"a": table.get("a"), "b": table.get("b")}
+    assert grounding_iou(found, "a", "b") == pytest.approx(50 / 150)
@@ -0,0 +1,73 @@
+import collections
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "green_agent"))
+
+from weblinx_columns import open_columns
+from weblinx_sampler import TaskSampler
+
+# 3 demos x 10 turns, action types skewed like the real split (mostly click)
+ACTIONS = ["click"] * 6 + ["say"] * 2 + ["scroll", "textinput"]
+
+
+@pytest.fixture(scope="module")
+def sampler(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("weblinx")
+    source = directory / "valid.json.gz"
+    with gzip.open(source, "wt", encoding="utf-8") as f:
+        for demo in ("d0", "d1", "d2"):
+            for turn in range(10):
+                action = ACTIONS[turn]
+                f.write(json.dumps({"demo": demo, "turn": turn, "action": f'{action}(uid="{demo}-{turn}")',
+                                    "candidates": "", "utterances": "", "action_history": ""}) + "\n")
+    columns = open_columns(str(source), str(directory))
+    return columns, TaskSampler(columns)
+
+
+def _types(columns, task_ids):
+    return columns.decode("action_type", columns.column("action_type")[task_ids])
+
+
+def test_same_seed_same_sample(sampler):
+    _, s = sampler
+    assert s.sample(8, seed=3) == s.sample(8, seed=3)
+    assert s.sample(8, seed=3) != s.sample(8, seed=4)
+
+
+def test_balanced_spreads_over_action_types(sampler):
+    columns, s = sampler
+    picks = s.sample(8, "action_type", seed=0)
+    task_ids = [t for t, _ in picks]
+    assert len(set(task_ids)) == 8
+    assert collections.Counter(_types(columns, task_ids)) == {"click": 2, "say": 2, "scroll": 2, "text_input": 2}
+    assert [label for _, label in picks] == _types(columns, task_ids)
+
+
+def test_balanced_moves_share_of_small_groups_on(sampler):
+    columns, s = sampler
+    counts = collections.Counter(_types(columns, [t for t, _ in s.sample(20, seed=1)]))
+    # scroll and text_input only have 3 rows each
+    assert counts["scroll"] == counts["text_input"] == 3
+    assert counts["click"] + counts["say"] == 14 and counts["say"] == 6
+
+
+def test_proportional_follows_group_sizes(sampler):
+    columns, s = sampler
+    counts = collections.Counter(_types(columns, [t for t, _ in s.sample(10, seed=2, allocation="proportional")]))
+    assert counts == {"click": 6, "say": 2, "scroll": 1, "text_input": 1}
+
+
+def test_combined_strata_and_limits(sampler):
+    _, s = sampler
+    picks = s.sample(6, "demo,action_type", seed=5)
+    assert len({label for _, label in picks}) == 6
+    assert all(label.split("/")[0] in ("d0", "d1", "d2") for _, label in picks)
+    assert sorted(t for t, _ in s.sample(100)) == list(range(30))
+    assert s.sample(0) == []
+    with pytest.raises(ValueError):
+        s.sample(3, "speaker")
@@ -0,0 +1,93 @@
+import asyncio
+import gzip
+import importlib.util
+import json
+import os
+import re
+import sys
+
+import pytest
+
+GREEN_AGENT_DIR = os.path.join(os.path.dirname(__file__), "..", "green_agent")
+sys.path.insert(0, GREEN_AGENT_DIR)
+
+import score_predictions
+
+DATA_DIR = os.path.join(GREEN_AGENT_DIR, "weblinx_data")
+DATASET = os.path.join(DATA_DIR, "valid.json.gz")
+
+if not os.path.exists(DATASET):
+    pytest.skip("WebLINX validation split not available", allow_module_level=True)
+
+COMPARED = ("task_id", "expected", "actual", "success", "score", "match_type", "action_type",
+            "grounding_iou", "text_similarity")
+
+
+def _predictions():
+    with gzip.open(DATASET, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    firsts = {}
+    for task_id, row in enumerate(rows):
+        firsts.setdefault(row["action"].split("(", 1)[0], task_id)
+    click, text_input, say = firsts["click"], firsts["text_input"], firsts["say"]
+    # another candidate of the click task: wrong element, but a bbox to compute the IoU with
+    wrong_uid = [uid for uid in re.findall(r"\(uid = ([^)]*)\)", rows[click]["candidates"])
+                 if uid not in rows[click]["action"]][0]
+    return [
+        {"task_id": click, "agent_action": rows[click]["action"]},
+        {"task_id": click, "agent_action": f'click(uid="{wrong_uid}")'},
+        {"task_id": click, "agent_action": "scroll(x=0, y=100)"},
+        {"task_id": text_input, "agent_action": rows[text_input]["action"].replace("text_input", "textinput")},
+        {"task_id": text_input, "agent_action": 'text_input(text="something else", uid="nope")'},
+        {"task_id": say, "agent_action": rows[say]["action"]},
+        {"task_id": say, "agent_action": 'say(utterance="Hello there")'},
+        {"task_id": say, "agent_action": rows[say]["action"].replace("utterance=", "text=")},
+        {"task_id": say, "agent_action": "not an action"},
+    ]
+
+
+@pytest.fixture(scope="module")
+def tools(tmp_path_factory):
+    # loaded from its path: other scenarios' green agents have a `tools` module as well
+    spec = importlib.util.spec_from_file_location("weblinx_tools", os.path.join(GREEN_AGENT_DIR, "tools.py"))
+    tools = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tools)
+    tools.DATASET_DIR = DATA_DIR
+    tools.INDEX_DIR = str(tmp_path_factory.mktemp("weblinx_index"))
+    assert json.loads(tools.reset_weblinx_env("validation"))["success"]
+    return tools
+
+
+def test_offline_scores_match_the_green_agent(tools, tmp_path, monkeypatch):
+    monkeypatch.setattr(score_predictions, "DATASET_DIR", DATA_DIR)
+    monkeypatch.setattr(score_predictions, "INDEX_DIR", str(tmp_path))
+    predictions = _predictions()
+    (tmp_path / "predictions.jsonl").write_text(
+        "".join(json.dumps(p) + "\n" for p in predictions), encoding="utf-8")
+
+    report = score_predictions.score_file(str(tmp_path / "predictions.jsonl"), workers=2,
+                                          out_path=str(tmp_path / "scored.jsonl"))
+    scored = [json.loads(line) for line in (tmp_path / "scored.jsonl").read_text(encoding="utf-8").splitlines()]
+
+    assert report["total"] == len(predictions) == len(scored)
+    assert any(r.get("grounding_iou") is not None for r in scored)
+    assert any(r.get("text_similarity") is not None for r in scored)
+    assert scored[7]["text_similarity"] == 1.0  # say(text=...)
+    for prediction, result in zip(predictions, scored):
+        tools.get_weblinx_task(prediction["task_id"])
+        expected = json.loads(asyncio.run(tools.evaluate_white_agent_action(prediction["agent_action"])))
+        assert {k: result.get(k) for k in COMPARED} == {k: expected["evaluation"].get(k) for k in COMPARED}
+
+
+def test_malformed_lines_are_counted(tmp_path, monkeypatch):
+    monkeypatch.setattr(score_predictions, "DATASET_DIR", DATA_DIR)
+    monkeypatch.setattr(score_predictions, "INDEX_DIR", str(tmp_path))
+    with gzip.open(DATASET, "rt", encoding="utf-8") as f:
+        action = json.loads(f.readline())["action"]
+    lines = [json.dumps({"task_id": 0, "agent_action": action}), "{not json", "[0, 1]", '"click()"',
+             json.dumps({"task_id": 0, "agent_action": ["click"]}), json.dumps({"task_id": -1, "agent_action": action})]
+    (tmp_path / "predictions.jsonl").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    report = score_predictions.score_file(str(tmp_path / "predictions.jsonl"), workers=1)
+    assert report["total"] == 6 and report["success_rate"] == round(1 / 6, 4)
+    assert report["by_match_type"] == {"exact_match": 1, "malformed_prediction": 4, "invalid_task_id": 1}
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "green_agent"))
+
+from weblinx_stats import ResultLog, RunningStats, aggregate_log
+
+RESULTS = [
+    {"task_id": 0, "action_type": "click", "success": True, "score": 1.0, "match_type": "exact_match",
+     "grounding_iou": 1.0},
+    {"task_id": 1, "action_type": "click", "success": False, "score": 0.0,
+     "match_type": "wrong_element (Got a, Exp b)", "grounding_iou": 0.5},
+    {"task_id": 2, "action_type": "say", "success": True, "score": 0.5, "match_type": "exact_match",
+     "text_similarity": 0.25},
+]
+
+
+def test_running_stats_summary():
+    stats = RunningStats()
+    for result in RESULTS:
+        stats.add(result)
+    summary = stats.summary()
+    assert summary["total"] == 3
+    assert summary["success_rate"] == round(2 / 3, 4)
+    assert summary["average_score"] == 0.5
+    assert summary["average_grounding_iou"] == 0.75
+    assert summary["average_text_similarity"] == 0.25
+    assert summary["by_match_type"] == {"exact_match": 2, "wrong_element": 1}
+    assert summary["by_action_type"]["click"] == {"total": 2, "success_rate": 0.5, "average_score": 0.5}
+    assert summary["score_histogram"] == [1, 0, 0, 0, 0, 1, 0, 0, 0, 1]
+
+
+def test_log_re_aggregates_to_the_same_summary(tmp_path):
+    path = str(tmp_path / "logs" / "results.log")
+    log = ResultLog(path)
+    live = RunningStats()
+    for result in RESULTS:
+        log.append("run-a", result)
+        live.add(result)
+    log.append("run-b", RESULTS[0])
+    log.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('["run-a",3,"cli')  # torn last line of a crashed writer
+
+    assert aggregate_log(path, "run-a").summary() == live.summary()
+    assert aggregate_log(path).total == 4
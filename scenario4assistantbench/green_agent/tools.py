@@ -3,22 +3,64 @@
 Redesigned Green Agent Toolset for BrowserGym AssistantBench Web Navigation
 - reset_assistantbench_env(): Starts the env and returns the initial observation.
 - execute_browser_action(action): Executes one step in the env and returns the result.
+- get_observation_profile_report(): Mean observation capture time per observation profile.
+- evaluate_action_sequence(task_id, actions): Replays a whole action list, memoized by
+  hash(task, package versions, actions) in an LRU with an optional on-disk backend. A sequence
+  holds env_lock for its whole reset+steps run (the battle tools take it per command), and
+  reset_assistantbench_env refuses while one is running.
+- get_latency_metrics(format): Per task / phase latency histograms (JSON or Prometheus text),
+  also served on GREEN_AGENT_METRICS_PORT from the first reset on.
+- get_startup_report(): Cold-start timings (per-module import time, time to first request served).
 """
-import gymnasium as gym
-import browsergym.assistantbench
-from browsergym.assistantbench import VALID_AB_TASK_IDS
-from browsergym.utils.obs import flatten_axtree_to_str
-from browsergym.core.action.highlevel import HighLevelActionSet
+import time
+_module_load_start = time.perf_counter()
+
 import agentbeats as ab
 import asyncio
+import importlib
 import json
+import os
 import threading
 import queue
 import random
+import types
+import concurrent.futures
 
 from dotenv import load_dotenv
 load_dotenv()
 
+# shared green agent code: pip install ./green_common (from the repository root)
+from green_common.cache import ResultCache
+from green_common.metrics import LatencyMetrics, start_metrics_server
+from green_common.observation import OBSERVATION_PROFILES, get_obs
+
+# --- Heavy BrowserGym imports, warmed in a background thread so the card is served right away ---
+bgym = None
+startup_timings = {}
+_import_lock = threading.Lock()
+
+def _import_browsergym():
+    """Imports gymnasium/BrowserGym once (timing each module) and returns the names the tools use."""
+    global bgym
+    with _import_lock:
+        if bgym is None:
+            modules = {}
+            for name in ("gymnasium", "browsergym.assistantbench", "browsergym.utils.obs",
+                         "browsergym.core.action.highlevel"):
+                start = time.perf_counter()
+                modules[name] = importlib.import_module(name)
+                startup_timings[f"import_{name}"] = round(time.perf_counter() - start, 4)
+            bgym = types.SimpleNamespace(
+                gym=modules["gymnasium"],
+                VALID_AB_TASK_IDS=modules["browsergym.assistantbench"].VALID_AB_TASK_IDS,
+                flatten_axtree_to_str=modules["browsergym.utils.obs"].flatten_axtree_to_str,
+                HighLevelActionSet=modules["browsergym.core.action.highlevel"].HighLevelActionSet,
+            )
+    return bgym
+
+threading.Thread(target=_import_browsergym, daemon=True, name="browsergym-import").start()
+startup_timings["tools_module_load"] = round(time.perf_counter() - _module_load_start, 4)
+
 # --- Globals for managing the environment in a separate thread ---
 assistantbench_env = None
 current_obs = None
@@ -26,44 +68,100 @@ current_info = None
 current_task_id = None
 step_count = 0
 MAX_STEPS = 15
+battle_active = False  # from reset_assistantbench_env until evaluate_task_completion
+sequence_running = False  # while evaluate_action_sequence replays on the shared env
 
 env_thread = None
 env_queue = queue.Queue()
-result_queue = queue.Queue()
+# held around every env command of the battle tools and around a whole reset+steps sequence,
+# so commands of different callers are never interleaved on the one env
+env_lock = asyncio.Lock()
+
+# --- Observation profiles (green_common.observation): which parts of the observation are captured ---
+# goal, url, chat and AXTree are always captured; screenshot / DOM snapshot only when listed,
+# otherwise they are empty placeholders so the obs keys never change.
+DEFAULT_OBSERVATION_PROFILE = os.getenv("AB_OBSERVATION_PROFILE", "full")
+observation_timings = {}  # profile -> {"count": n, "total": seconds}
+
+def _profiled_get_obs(base, profile):
+    """BrowserEnv._get_obs without the screenshot / DOM snapshot the profile does not need."""
+    start = time.perf_counter()
+    obs = get_obs(base, OBSERVATION_PROFILES[profile])
+    timing = observation_timings.setdefault(profile, {"count": 0, "total": 0.0})
+    timing["count"] += 1
+    timing["total"] += time.perf_counter() - start
+    return obs
+
+# --- Latency metrics: fixed-bucket histograms per (scenario, task, phase), see green_common.metrics ---
+# Phases: queue_wait, env (env.step / reset), observation (AXTree flattening), serialize, total.
+latency_metrics = LatencyMetrics("assistantbench")
+phase_totals = {}  # phase -> seconds spent in the current task
+
+def _record_timings(task_id, phases):
+    latency_metrics.observe(task_id, phases)
+    for phase, seconds in phases.items():
+        phase_totals[phase] = phase_totals.get(phase, 0.0) + seconds
+
+# --- Result cache (green_common.cache): outcome of a whole (task, env versions, actions) run ---
+# In-memory LRU of RESULT_CACHE_SIZE entries, mirrored to
+# AB_RESULT_CACHE_DIR/assistantbench-result-cache/<versions hash>/ when set.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+AB_RESULT_CACHE_DIR = os.getenv("AB_RESULT_CACHE_DIR")
+CACHE_PACKAGES = ("browsergym-core", "browsergym-assistantbench", "playwright", "gymnasium")
+result_cache = ResultCache(RESULT_CACHE_SIZE, AB_RESULT_CACHE_DIR, "assistantbench-result-cache", CACHE_PACKAGES)
 
 def _env_worker():
     """A dedicated thread for BrowserGym to avoid greenlet/asyncio conflicts."""
     global assistantbench_env
 
     while True:
+        command, args, future, enqueued = env_queue.get()
+        # Skip commands whose caller already timed out and cancelled them
+        if not future.set_running_or_notify_cancel():
+            continue
+        picked = time.perf_counter()
         try:
-            command, args = env_queue.get()
+            bg = _import_browsergym()
             if command == "stop":
                 if assistantbench_env:
                     assistantbench_env.close()
+                future.set_result(None)
                 break
 
             if command == "reset":
-                task_id = args
+                task_id, profile = args
                 if assistantbench_env:
                     assistantbench_env.close()
                 
                 # Define the action space for the agent
-                action_set = HighLevelActionSet(subsets=["chat", "bid", "nav"])
+                action_set = bg.HighLevelActionSet(subsets=["chat", "bid", "nav"])
                 
-                assistantbench_env = gym.make(f"browsergym/{task_id}", action_mapping=action_set.to_python_code)
+                assistantbench_env = bg.gym.make(f"browsergym/{task_id}", action_mapping=action_set.to_python_code)
+                base = assistantbench_env.unwrapped
+                base._get_obs = lambda: _profiled_get_obs(base, profile)
                 obs, info = assistantbench_env.reset()
-                result_queue.put(("success", {"obs": obs, "info": info}))
+                future.set_result({"obs": obs, "info": info, "timings": {
+                    "queue_wait": picked - enqueued, "env": time.perf_counter() - picked}})
 
             elif command == "step":
                 action = args
                 obs, reward, terminated, truncated, info = assistantbench_env.step(action)
-                result_queue.put(("success", {
+                future.set_result({
                     "obs": obs, "reward": reward, "terminated": terminated,
-                    "truncated": truncated, "info": info
-                }))
+                    "truncated": truncated, "info": info, "timings": {
+                        "queue_wait": picked - enqueued, "env": time.perf_counter() - picked}
+                })
         except Exception as e:
-            result_queue.put(("error", str(e)))
+            future.set_exception(e)
+
+async def _call_env(command, args=None, timeout=30):
+    """Sends one command to the env thread and awaits the future carrying its own result."""
+    future = concurrent.futures.Future()
+    env_queue.put((command, args, future, time.perf_counter()))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"env {command} timed out after {timeout}s")
 
 def _get_observation_for_agent(obs):
     """Prepares the observation dictionary to be sent to the White Agent."""
@@ -73,7 +171,7 @@ def _get_observation_for_agent(obs):
     return {
         "goal": obs.get("goal", ""),
         "url": obs.get("url", ""),
-        "axtree": flatten_axtree_to_str(
+        "axtree": _import_browsergym().flatten_axtree_to_str(
             obs.get("axtree_object", {}),
             extra_properties=obs.get("extra_element_properties", {}),
             with_clickable=True
@@ -81,32 +179,45 @@ def _get_observation_for_agent(obs):
     }
 
 @ab.tool
-async def reset_assistantbench_env() -> str:
-    """Resets the AssistantBench environment with a random task and returns the initial observation."""
-    global env_thread, current_task_id, current_obs, current_info, step_count
+async def reset_assistantbench_env(observation_profile: str = DEFAULT_OBSERVATION_PROFILE) -> str:
+    """Resets the AssistantBench environment with a random task and returns the initial observation.
+    observation_profile is one of text-only, axtree+screenshot, full."""
+    global env_thread, current_task_id, current_obs, current_info, step_count, battle_active
+
+    if observation_profile not in OBSERVATION_PROFILES:
+        return json.dumps({"error": f"Unknown observation_profile {observation_profile!r}, use one of {list(OBSERVATION_PROFILES)}"})
+    if sequence_running:
+        return json.dumps({"error": "evaluate_action_sequence is running on the shared environment; retry when it is done"})
     
+    tool_start = time.perf_counter()
     step_count = 0
-    current_task_id = random.choice(VALID_AB_TASK_IDS)
+    battle_active = True
+    phase_totals.clear()
+    start_metrics_server(latency_metrics)  # no-op after the first reset
+    bg = await asyncio.to_thread(_import_browsergym)
+    current_task_id = random.choice(bg.VALID_AB_TASK_IDS)
     #current_rask_id = max(VALID_AB_TASK_IDS)
     
     if env_thread is None or not env_thread.is_alive():
         env_thread = threading.Thread(target=_env_worker, daemon=True)
         env_thread.start()
 
-    env_queue.put(("reset", current_task_id))
-
-    def _wait_result():
-        status, data = result_queue.get(timeout=60)
-        if status == "error":
-            raise Exception(data)
-        return data
-
     try:
-        result = await asyncio.to_thread(_wait_result)
+        async with env_lock:
+            result = await _call_env("reset", (current_task_id, observation_profile), timeout=60)
         current_obs = result["obs"]
         current_info = result["info"]
+        phases = dict(result["timings"])
+        observation_start = time.perf_counter()
         agent_obs = _get_observation_for_agent(current_obs)
-        return json.dumps(agent_obs, indent=2)
+        phases["observation"] = time.perf_counter() - observation_start
+        startup_timings.setdefault("first_request_served", round(time.perf_counter() - _module_load_start, 4))
+        serialize_start = time.perf_counter()
+        payload = json.dumps(agent_obs, indent=2)
+        phases["serialize"] = time.perf_counter() - serialize_start
+        phases["total"] = time.perf_counter() - tool_start
+        _record_timings(current_task_id, phases)
+        return payload
     except Exception as e:
         return json.dumps({"error": f"Failed to reset environment: {e}"})
 
@@ -123,16 +234,10 @@ async def execute_browser_action(action: str) -> str:
         })
     step_count += 1
 
-    env_queue.put(("step", action))
-
-    def _wait_result():
-        status, data = result_queue.get(timeout=30)
-        if status == "error":
-            raise Exception(data)
-        return data
-
+    tool_start = time.perf_counter()
     try:
-        result = await asyncio.to_thread(_wait_result)
+        async with env_lock:
+            result = await _call_env("step", action)
         current_obs = result["obs"]
         current_info = result["info"]
         
@@ -141,7 +246,10 @@ async def execute_browser_action(action: str) -> str:
         final_reward = result["reward"]
         
         # reCAPTCHA Detection Logic 
+        phases = dict(result["timings"])
+        observation_start = time.perf_counter()
         agent_observation = _get_observation_for_agent(current_obs)
+        phases["observation"] = time.perf_counter() - observation_start
         axtree_lower = agent_observation.get("axtree", "").lower()
         recaptcha_keywords = ["recaptcha", "i'm not a robot", "verify you are human"]
         
@@ -157,12 +265,17 @@ async def execute_browser_action(action: str) -> str:
         # End of reCAPTCHA Logic
         
         response_payload = {
-            "new_observation": _get_observation_for_agent(current_obs),
+            "new_observation": agent_observation,
             "reward": result["reward"],
             "terminated": terminated,
             "step": step_count
         }
-        return json.dumps(response_payload, indent=2)
+        serialize_start = time.perf_counter()
+        payload = json.dumps(response_payload, indent=2)
+        phases["serialize"] = time.perf_counter() - serialize_start
+        phases["total"] = time.perf_counter() - tool_start
+        _record_timings(current_task_id, phases)
+        return payload
     except Exception as e:
         return json.dumps({
             "error": f"Failed to execute action: {e}",
@@ -172,12 +285,102 @@ async def execute_browser_action(action: str) -> str:
 
 
 @ab.tool
-async def evaluate_task_completion() -> str:
+async def evaluate_action_sequence(task_id: str, actions: str, use_cache: bool = True) -> str:
+    """
+    Resets task_id, replays a JSON list of actions and returns the final reward and answer.
+    Identical (task, env versions, actions) runs are served from the result cache unless use_cache=False.
+    Uses the shared env, so it refuses to run (cache hits aside) while a battle is running;
+    concurrent sequences run one after the other.
+    """
+    global env_thread, sequence_running
+
+    try:
+        action_list = json.loads(actions)
+        if not isinstance(action_list, list) or not all(isinstance(a, str) for a in action_list):
+            raise ValueError("expected a JSON list of action strings")
+    except ValueError as e:
+        return json.dumps({"error": f"Invalid action list: {e}"})
+    action_list = action_list[:MAX_STEPS]
+
+    key = result_cache.key("assistantbench", task_id, action_list)
+    if use_cache:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return json.dumps({**cached, "cached": True}, ensure_ascii=False)
+
+    async with env_lock:
+        if battle_active:
+            return json.dumps({"error": "A battle is running on the shared environment; "
+                                        "call evaluate_task_completion first"})
+        sequence_running = True
+        try:
+            if env_thread is None or not env_thread.is_alive():
+                env_thread = threading.Thread(target=_env_worker, daemon=True)
+                env_thread.start()
+            result = await _call_env("reset", (task_id, "text-only"), timeout=60)
+            rewards = []
+            for action in action_list:
+                result = await _call_env("step", action)
+                rewards.append(result["reward"])
+                if result["terminated"] or result["truncated"]:
+                    break
+        except Exception as e:
+            return json.dumps({"error": f"Failed to evaluate actions: {e}"})
+        finally:
+            sequence_running = False
+
+    provided_answer = "N/A (not submitted)"
+    for msg in reversed(result["obs"].get("chat_messages", ())):
+        if msg["role"] == "assistant":
+            provided_answer = msg["message"]
+            break
+
+    final_reward = rewards[-1] if rewards else 0.0
+    evaluation = {
+        "task_id": task_id,
+        "total_steps": len(rewards),
+        "rewards": rewards,
+        "final_reward": final_reward,
+        "success": final_reward > 0.5,
+        "provided_answer": provided_answer,
+    }
+    result_cache.put(key, evaluation)
+    return json.dumps({**evaluation, "cached": False}, ensure_ascii=False, default=str)
+
+
+@ab.tool
+async def get_latency_metrics(format: str = "json") -> str:
+    """Returns per task / phase latency histograms, as a "json" summary or "prometheus" text.
+    The same data is served on GREEN_AGENT_METRICS_PORT (/metrics, /metrics.json) after the first reset."""
+    if format == "prometheus":
+        return latency_metrics.prometheus()
+    return json.dumps(latency_metrics.json())
+
+
+@ab.tool
+async def get_startup_report() -> str:
+    """Returns cold-start timings in seconds since this module started loading."""
+    return json.dumps(startup_timings)
+
+
+@ab.tool
+async def get_observation_profile_report() -> str:
+    """Returns the mean observation capture time per profile over all resets/steps so far."""
+    return json.dumps({
+        profile: {"count": t["count"], "mean_seconds": round(t["total"] / t["count"], 4)}
+        for profile, t in observation_timings.items() if t["count"]
+    })
+
+
+@ab.tool
+async def evaluate_task_completion(include_timings: bool = False) -> str:
     """
     Call this after the task is terminated. Returns a final JSON report
-    summarizing the task performance.
+    summarizing the task performance (with seconds spent per phase if include_timings).
     """
-    global current_task_id, step_count, final_reward, gold_answer, current_obs
+    global current_task_id, step_count, final_reward, gold_answer, current_obs, battle_active
+
+    battle_active = False
 
     provided_answer = "N/A (not submitted)"
     if current_obs and current_obs.get("chat_messages"):
@@ -194,5 +397,7 @@ async def evaluate_task_completion() -> str:
         "expected_answer": gold_answer,
         "provided_answer": provided_answer,
     }
+    if include_timings:
+        evaluation["phase_seconds"] = {phase: round(t, 4) for phase, t in phase_totals.items()}
 
     return json.dumps(evaluation, ensure_ascii=False, indent=2, default=str)
@@ -0,0 +1,68 @@
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+sys.path.insert(0, ROOT)  # green_common
+pytest.importorskip("agentbeats")
+# the module starts importing browsergym in a background thread, which may not be installed
+pytestmark = pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+
+
+@pytest.fixture(scope="module")
+def module():
+    # loaded from its path: other scenarios' green agents have a `tools` module as well
+    spec = importlib.util.spec_from_file_location(
+        "assistantbench_tools", os.path.join(ROOT, "scenario4assistantbench", "green_agent", "tools.py"))
+    tools = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tools)
+    return tools
+
+
+@pytest.fixture
+def tools(module, monkeypatch):
+    monkeypatch.setattr(module, "env_thread", type("Alive", (), {"is_alive": lambda self: True})())
+    return module
+
+
+def _fake_env(tools, monkeypatch):
+    """Replaces the env thread: records (command, args) and yields to the loop on every command."""
+    log = []
+
+    async def call_env(command, args=None, timeout=30):
+        log.append((command, args))
+        await asyncio.sleep(0.01)
+        return {"obs": {"chat_messages": ()}, "info": {}, "reward": 0.0, "terminated": False,
+                "truncated": False, "timings": {}}
+
+    monkeypatch.setattr(tools, "_call_env", call_env)
+    return log
+
+
+def test_sequences_do_not_interleave_and_block_reset(tools, monkeypatch):
+    log = _fake_env(tools, monkeypatch)
+
+    async def run():
+        first = asyncio.create_task(tools.evaluate_action_sequence("task-a", json.dumps(["a1", "a2", "a3"])))
+        second = asyncio.create_task(tools.evaluate_action_sequence("task-b", json.dumps(["b1", "b2"])))
+        await asyncio.sleep(0.015)  # first sequence is mid-run
+        reset = await tools.reset_assistantbench_env("text-only")
+        return await first, await second, reset
+
+    first, second, reset = asyncio.run(run())
+    assert json.loads(first)["total_steps"] == 3 and json.loads(second)["total_steps"] == 2
+    assert "evaluate_action_sequence is running" in json.loads(reset)["error"]
+    assert log == [("reset", ("task-a", "text-only")), ("step", "a1"), ("step", "a2"), ("step", "a3"),
+                   ("reset", ("task-b", "text-only")), ("step", "b1"), ("step", "b2")]
+    assert tools.sequence_running is False and tools.battle_active is False
+
+
+def test_sequence_refuses_during_a_battle(tools, monkeypatch):
+    log = _fake_env(tools, monkeypatch)
+    monkeypatch.setattr(tools, "battle_active", True)
+    result = json.loads(asyncio.run(tools.evaluate_action_sequence("task-a", json.dumps(["a1"]), use_cache=False)))
+    assert "battle is running" in result["error"] and log == []